@@ -0,0 +1,161 @@
+# core/audit.py
+
+"""
+Buffered AuditLog writer.
+
+Entries are queued in-process and written with a single bulk_create by a
+background thread, either when `AUDIT_LOG_BATCH_SIZE` entries are waiting or
+every `AUDIT_LOG_FLUSH_INTERVAL` seconds. Whatever is left is flushed when
+the worker process exits. With `AUDIT_LOG_SYNC = True` entries are written
+immediately instead.
+
+If the bulk insert fails, the batch is saved row by row, so one bad entry
+doesn't lose the rest. Rows that fail because the database is locked or
+busy are queued again for the next flush, up to `AUDIT_LOG_MAX_RETRIES`
+times each; other failures, and rows that run out of retries, are logged
+and dropped.
+"""
+
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction, OperationalError
+from django.utils import timezone
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogBuffer:
+
+    def __init__(self):
+        self._entries = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 100)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+
+    @property
+    def max_retries(self):
+        return getattr(settings, 'AUDIT_LOG_MAX_RETRIES', 5)
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            pending = len(self._entries)
+        self._ensure_thread()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Writes every queued entry with one bulk_create, falling back to one
+        INSERT per entry when that fails. Returns the number written.
+        """
+        with self._lock:
+            entries, self._entries = self._entries, []
+        if not entries:
+            return 0
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create(entries, batch_size=500)
+        except Exception:
+            # Audit logging must never take the worker down with it.
+            logger.exception("Failed to bulk write %d audit log entries; saving them one by one.", len(entries))
+            return self._save_each(entries)
+        return len(entries)
+
+    def _save_each(self, entries):
+        written, retry, expired = 0, [], 0
+        for entry in entries:
+            # bulk_create may have assigned ids before its transaction rolled back.
+            entry.pk = None
+            entry._state.adding = True
+            try:
+                with transaction.atomic():
+                    entry.save()
+            except OperationalError as exc:
+                if not _is_lock_error(exc):
+                    logger.exception("Dropped audit log entry %r (%s).", entry.action, entry.details)
+                    continue
+                entry._audit_retries = getattr(entry, '_audit_retries', 0) + 1
+                if entry._audit_retries > self.max_retries:
+                    expired += 1
+                else:
+                    retry.append(entry)
+            except Exception:
+                logger.exception("Dropped audit log entry %r (%s).", entry.action, entry.details)
+            else:
+                written += 1
+        if expired:
+            logger.error("Database still locked; dropped %d audit log entries after %d retries.", expired, self.max_retries)
+        if retry:
+            logger.error("Database locked; %d audit log entries queued for the next flush.", len(retry))
+            with self._lock:
+                self._entries[:0] = retry
+        return written
+
+    def _ensure_thread(self):
+        # Started lazily, and again after a fork, since threads don't survive fork().
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._thread is None:
+                # Write what is still queued when the process exits; forked children inherit this.
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+def _is_lock_error(exc):
+    # Contention: SQLite's "database is locked" / "database table is locked", or a busy database.
+    message = str(exc).lower()
+    return 'locked' in message or 'busy' in message
+
+
+_buffer = AuditLogBuffer()
+
+
+def write_audit_log(action, details=None, user=None, user_id=None):
+    """
+    Records an AuditLog entry without adding an INSERT to the current request.
+    Pass either the user instance or just its id.
+    """
+    entry = AuditLog(action=action, details=details, timestamp=timezone.now())
+    if user is not None:
+        entry.user = user
+    else:
+        entry.user_id = user_id
+    if getattr(settings, 'AUDIT_LOG_SYNC', False):
+        entry.save()
+    else:
+        _buffer.add(entry)
+
+
+def flush_audit_log():
+    """
+    Writes any buffered entries right away.
+    """
+    return _buffer.flush()
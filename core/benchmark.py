@@ -0,0 +1,191 @@
+# core/benchmark.py
+
+"""
+View benchmark used by `manage.py benchmark_views`.
+
+Requests every named URL in core/urls.py and posts/urls.py through the test
+client as a super admin, an admin and a client, and records p50/p95 latency
+and the query count. Everything runs in one transaction that is rolled back,
+so views that write on GET leave the database as it was.
+"""
+
+import contextlib
+import datetime
+import math
+import time
+
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core import urls as core_urls
+from core.instrumentation import RequestStats
+from core.models import Notification
+from posts import urls as posts_urls
+from posts.models import Post
+from users.models import User
+
+URLCONFS = [core_urls, posts_urls]
+
+# Never requested: they end the session or stream until the client disconnects.
+SKIPPED_URLS = {'core:admin_logout', 'core:client_logout', 'core:notification_stream'}
+
+
+def _query_strings():
+    today = timezone.localdate()
+    return {
+        'core:calendar_events': '?start={}&end={}'.format(
+            today.replace(day=1) - datetime.timedelta(days=7),
+            today.replace(day=1) + datetime.timedelta(days=42),
+        ),
+        'posts:search': '?q=sale',
+    }
+
+
+def benchmark_users():
+    """
+    One user per role: the first super admin, the admin with the most
+    clients and the client with the most posts.
+    """
+    users = {
+        'super_admin': User.objects.filter(role=User.Role.SUPER_ADMIN).order_by('pk').first(),
+        'admin': User.objects.filter(role=User.Role.ADMIN).annotate(
+            clients=Count('assigned_clients')
+        ).order_by('-clients', 'pk').first(),
+        'client': User.objects.filter(
+            role=User.Role.CLIENT, client_profile__isnull=False
+        ).annotate(posts=Count('client_profile__posts')).order_by('-posts', 'pk').first(),
+    }
+    return {role: user for role, user in users.items() if user is not None}
+
+
+def benchmark_urls():
+    """
+    (URL name, converter names) for every named route, minus SKIPPED_URLS.
+    """
+    seen = set()
+    for urlconf in URLCONFS:
+        for pattern in urlconf.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            name = f"{urlconf.app_name}:{pattern.name}"
+            if name in SKIPPED_URLS or name in seen:
+                continue
+            seen.add(name)
+            yield name, list(pattern.pattern.converters)
+
+
+def _url_kwargs(converters, user):
+    """
+    Sample values for a route's parameters, or None if one can't be filled.
+    Objects the user may see are preferred, so the real page gets measured.
+    """
+    kwargs = {}
+    for converter in converters:
+        if converter == 'post_id':
+            value = (
+                Post.objects.visible_to(user).order_by('-pk').values_list('pk', flat=True).first()
+                or Post.objects.order_by('-pk').values_list('pk', flat=True).first()
+            )
+        elif converter == 'notif_id':
+            value = Notification.objects.filter(recipient=user).values_list('pk', flat=True).first()
+        elif converter == 'uidb64':
+            value = urlsafe_base64_encode(force_bytes(user.pk))
+        elif converter == 'token':
+            value = default_token_generator.make_token(user)
+        else:
+            value = None
+        if value is None:
+            return None
+        kwargs[converter] = value
+    return kwargs
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile.
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def _timed_get(client, url):
+    stats = RequestStats()
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+    return response, elapsed, stats.queries
+
+
+def run_benchmark(iterations=10, warmup=1, roles=None):
+    """
+    Returns {"<role> <url name>": {url, status, p50_ms, p95_ms, queries}}.
+    """
+    users = benchmark_users()
+    if roles:
+        users = {role: user for role, user in users.items() if role in roles}
+    urls = list(benchmark_urls())
+    query_strings = _query_strings()
+    results = {}
+
+    with override_settings(ALLOWED_HOSTS=['testserver'], AUDIT_LOG_SYNC=True, INSTRUMENTATION_SAMPLE_RATE=0.0):
+        with transaction.atomic():
+            for role, user in users.items():
+                client = Client(raise_request_exception=False)
+                for name, converters in urls:
+                    kwargs = _url_kwargs(converters, user)
+                    if kwargs is None:
+                        continue
+                    url = reverse(name, kwargs=kwargs) + query_strings.get(name, '')
+
+                    timings = []
+                    for run in range(warmup + iterations):
+                        # Some pages log out a user of the wrong role.
+                        if '_auth_user_id' not in client.session:
+                            client.force_login(user)
+                        response, elapsed, queries = _timed_get(client, url)
+                        if run >= warmup:
+                            timings.append(elapsed * 1000)
+
+                    results[f"{role} {name}"] = {
+                        'url': url,
+                        'status': response.status_code,
+                        'p50_ms': round(percentile(timings, 50), 2),
+                        'p95_ms': round(percentile(timings, 95), 2),
+                        'queries': queries,
+                    }
+            transaction.set_rollback(True)
+    return results
+
+
+def compare(results, baseline, tolerance=0.5, min_slowdown_ms=5.0):
+    """
+    Regressions against a baseline: more queries, a different status code,
+    or a p50 more than `tolerance` (and `min_slowdown_ms`) slower. p50 is
+    compared rather than p95, which with few iterations is a single sample.
+    Entries missing from either side are ignored.
+    """
+    regressions = []
+    for key, expected in sorted(baseline.items()):
+        actual = results.get(key)
+        if actual is None:
+            continue
+        if actual['status'] != expected['status']:
+            regressions.append(f"{key}: status {expected['status']} -> {actual['status']}")
+        if actual['queries'] > expected['queries']:
+            regressions.append(f"{key}: {expected['queries']} -> {actual['queries']} queries")
+        slowdown = actual['p50_ms'] - expected['p50_ms']
+        if slowdown > min_slowdown_ms and actual['p50_ms'] > expected['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p50 {expected['p50_ms']}ms -> {actual['p50_ms']}ms")
+    return regressions
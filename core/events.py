@@ -0,0 +1,61 @@
+# core/events.py
+
+"""
+In-process publish/subscribe for live notifications.
+
+Each open notification stream (see `notification_stream_view`) subscribes
+with an asyncio queue for its user. `publish()` may be called from any thread
+(e.g. a sync view running a signal handler) and hands the payload to the
+subscriber's event loop.
+
+Subscribers only receive events published in the same process, so pages
+keep a slow polling fallback for multi-process deployments.
+"""
+
+import asyncio
+import threading
+
+# user_id -> set of (event loop, queue)
+_subscribers = {}
+_lock = threading.Lock()
+
+QUEUE_SIZE = 50
+
+
+def subscribe(user_id):
+    """
+    Registers a new subscriber for `user_id` and returns its queue.
+    Must be called from inside a running event loop.
+    """
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    entry = (asyncio.get_running_loop(), queue)
+    with _lock:
+        _subscribers.setdefault(user_id, set()).add(entry)
+    return queue
+
+
+def unsubscribe(user_id, queue):
+    with _lock:
+        entries = _subscribers.get(user_id, set())
+        entries.difference_update({entry for entry in entries if entry[1] is queue})
+        if not entries:
+            _subscribers.pop(user_id, None)
+
+
+def _put(queue, payload):
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        # A stalled tab shouldn't grow memory; it resyncs on its next page load.
+        pass
+
+
+def publish(user_id, payload):
+    """
+    Sends `payload` to every open stream of `user_id`.
+    """
+    with _lock:
+        entries = list(_subscribers.get(user_id, ()))
+    for loop, queue in entries:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(_put, queue, payload)
@@ -141,4 +141,32 @@ class ClientPasswordChangeForm(PasswordChangeForm):
     new_password2 = forms.CharField(
         label="Confirm New Password",
         widget=forms.PasswordInput(attrs={'class': 'form-control', 'autocomplete': 'new-password'})
-    )
\ No newline at end of file
+    )
+
+class DateRangeForm(forms.Form):
+    """
+    Optional, inclusive start/end dates for the report pages (?start=&end=).
+    """
+    start = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'})
+    )
+    end = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError("The start date must be on or before the end date.")
+        return cleaned_data
+
+    def get_range(self):
+        """
+        Returns (start, end); (None, None) means all time.
+        """
+        if not self.is_valid():
+            return None, None
+        return self.cleaned_data['start'], self.cleaned_data['end']
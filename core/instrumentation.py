@@ -0,0 +1,175 @@
+# core/instrumentation.py
+
+"""
+Per-request performance records.
+
+For a sampled request (INSTRUMENTATION_SAMPLE_RATE), RequestStatsMiddleware
+collects:
+- the number of queries and total SQL time, across every database alias
+- template render time (it includes any SQL run by lazy querysets in the template)
+- peak Python allocations, when INSTRUMENTATION_TRACE_MEMORY is on. tracemalloc
+  hooks every allocation in the process, so concurrent requests are slowed
+  too while one is traced; it is off by default outside DEBUG.
+
+It also flags N+1 patterns, i.e. the same query shape run
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD or more times. Each record is logged
+as one JSON line to the 'posttrack.requests' logger (a rotating file; see
+LOGGING) and, when INSTRUMENTATION_HEADER is on, summarised in a
+Server-Timing response header.
+
+Unsampled requests only pay for one random() call.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import random
+import re
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+request_log = logging.getLogger('posttrack.requests')
+
+# Stats of the request being handled in this thread/task, if it is sampled.
+_current = contextvars.ContextVar('request_stats', default=None)
+
+# tracemalloc is process-wide, so only one request at a time measures memory.
+_memory_lock = threading.Lock()
+
+# "IN (%s)", "IN (%s, %s, %s)" and "IN (?, ?)" are one shape whatever the length.
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)')
+
+
+def query_shape(sql):
+    return _PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper (see connection.execute_wrapper()).
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated_queries(self, threshold):
+        return [
+            {'sql': shape[:500], 'count': count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def _install_render_timer():
+    """
+    Wraps the Django template backend's render() (called once per top-level
+    render(), not for includes) to add its duration to the current request.
+    """
+    if getattr(Template.render, '_timed', False):
+        return
+    render = Template.render
+
+    @functools.wraps(render)
+    def timed_render(self, *args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats.render_time += time.perf_counter() - start
+
+    timed_render._timed = True
+    Template.render = timed_render
+
+
+class RequestStatsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_render_timer()
+
+    def __call__(self, request):
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        trace_memory = settings.INSTRUMENTATION_TRACE_MEMORY and _memory_lock.acquire(blocking=False)
+        try:
+            if trace_memory:
+                tracemalloc.start()
+            wrappers = [connection.execute_wrapper(stats) for connection in connections.all()]
+            for wrapper in wrappers:
+                wrapper.__enter__()
+            try:
+                response = self.get_response(request)
+            finally:
+                for wrapper in reversed(wrappers):
+                    wrapper.__exit__(None, None, None)
+            peak = None
+            if trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+                _memory_lock.release()
+            _current.reset(token)
+
+        self.record(request, response, stats, peak)
+        return response
+
+    def record(self, request, response, stats, peak):
+        duration = time.perf_counter() - stats.started
+        repeated = stats.repeated_queries(settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD)
+        match = request.resolver_match
+        entry = {
+            'timestamp': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': stats.queries,
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'render_ms': round(stats.render_time * 1000, 2),
+            'peak_kb': round(peak / 1024, 1) if peak is not None else None,
+            'n_plus_one': repeated,
+        }
+        request_log.info(json.dumps(entry))
+        if repeated:
+            logger.warning(
+                "Possible N+1 in %s: %s", entry['view'] or request.path,
+                '; '.join(f"{item['count']}x {item['sql'][:120]}" for item in repeated)
+            )
+
+        if settings.INSTRUMENTATION_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={entry["sql_ms"]};desc="{stats.queries} queries"',
+                f'render;dur={entry["render_ms"]}',
+                f'total;dur={entry["duration_ms"]}',
+            ])
+            if repeated:
+                response['X-N-Plus-One'] = str(len(repeated))
@@ -0,0 +1,157 @@
+# core/management/commands/benchmark_sqlite.py
+
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# SQLite's own defaults, i.e. what the stock Django backend runs with.
+STOCK_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'busy_timeout': 5000,
+}
+
+CLIENTS = 50
+
+
+def _connect(path, pragmas):
+    connection = sqlite3.connect(path, timeout=pragmas['busy_timeout'] / 1000, isolation_level=None)
+    for name, value in pragmas.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    return connection
+
+
+def _create_schema(path, pragmas):
+    connection = _connect(path, pragmas)
+    connection.executescript("""
+        CREATE TABLE bench_event (
+            id INTEGER PRIMARY KEY, client_id INTEGER NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL
+        );
+        CREATE INDEX bench_event_client ON bench_event (client_id, created_at);
+        CREATE TABLE bench_counter (client_id INTEGER PRIMARY KEY, total INTEGER NOT NULL);
+    """)
+    connection.executemany(
+        "INSERT INTO bench_counter (client_id, total) VALUES (?, 0)", [(i,) for i in range(CLIENTS)]
+    )
+    connection.close()
+
+
+def _writer(path, pragmas, worker, start_at, stop_at, results):
+    """
+    One write transaction per loop, shaped like a post save: a new row plus
+    a counter upsert, committed under BEGIN IMMEDIATE as the app does.
+    """
+    connection = _connect(path, pragmas)
+    done = failed = 0
+    time.sleep(max(start_at - time.time(), 0))
+    while time.time() < stop_at:
+        client_id = (worker + done) % CLIENTS
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT INTO bench_event (client_id, payload, created_at) VALUES (?, ?, ?)",
+                (client_id, 'x' * 200, time.time())
+            )
+            connection.execute("UPDATE bench_counter SET total = total + 1 WHERE client_id = ?", (client_id,))
+            connection.execute("COMMIT")
+            done += 1
+        except sqlite3.OperationalError:
+            # "database is locked" after the busy timeout
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            failed += 1
+    connection.close()
+    results.put(('write', done, failed))
+
+
+def _reader(path, pragmas, worker, start_at, stop_at, results):
+    """
+    Dashboard-style reads: the top counters and one client's recent rows.
+    """
+    connection = _connect(path, pragmas)
+    done = failed = 0
+    time.sleep(max(start_at - time.time(), 0))
+    while time.time() < stop_at:
+        try:
+            connection.execute("SELECT client_id, total FROM bench_counter ORDER BY total DESC LIMIT 10").fetchall()
+            connection.execute(
+                "SELECT id, created_at FROM bench_event WHERE client_id = ? ORDER BY created_at DESC LIMIT 20",
+                ((worker + done) % CLIENTS,)
+            ).fetchall()
+            done += 1
+        except sqlite3.OperationalError:
+            failed += 1
+    connection.close()
+    results.put(('read', done, failed))
+
+
+def run_profile(pragmas, writers, readers, duration):
+    """
+    Runs the writer and reader processes against a fresh database file.
+    Returns {'write': (done, failed), 'read': (done, failed)}.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        _create_schema(path, pragmas)
+
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1  # let every process connect first
+        stop_at = start_at + duration
+        processes = [
+            multiprocessing.Process(target=target, args=(path, pragmas, worker, start_at, stop_at, results))
+            for target, count in ((_writer, writers), (_reader, readers))
+            for worker in range(count)
+        ]
+        for process in processes:
+            process.start()
+
+        totals = {'write': [0, 0], 'read': [0, 0]}
+        for _ in processes:
+            kind, done, failed = results.get()
+            totals[kind][0] += done
+            totals[kind][1] += failed
+        for process in processes:
+            process.join()
+    return totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures concurrent write/read throughput on a scratch SQLite file with the "
+        "configured SQLITE_PRAGMAS profile against SQLite's defaults."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help="Concurrent writer processes.")
+        parser.add_argument('--readers', type=int, default=4, help="Concurrent reader processes.")
+        parser.add_argument('--duration', type=float, default=5.0, help="Seconds per profile.")
+
+    def handle(self, *args, **options):
+        profiles = [('stock', STOCK_PRAGMAS), ('tuned', settings.SQLITE_PRAGMAS)]
+        duration = options['duration']
+        self.stdout.write(
+            f"{options['writers']} writer(s), {options['readers']} reader(s), {duration:g}s per profile"
+        )
+
+        throughput = {}
+        for name, pragmas in profiles:
+            totals = run_profile(pragmas, options['writers'], options['readers'], duration)
+            writes, write_errors = totals['write']
+            reads, read_errors = totals['read']
+            throughput[name] = (writes / duration, reads / duration)
+            self.stdout.write(
+                f"{name:>6}: {writes / duration:9.1f} writes/s  {reads / duration:9.1f} reads/s  "
+                f"{write_errors + read_errors} locked error(s)  "
+                f"[{', '.join(f'{key}={value}' for key, value in pragmas.items())}]"
+            )
+
+        stock, tuned = throughput['stock'], throughput['tuned']
+        if stock[0] and stock[1]:
+            self.stdout.write(self.style.SUCCESS(
+                f"tuned profile: {tuned[0] / stock[0]:.1f}x writes, {tuned[1] / stock[1]:.1f}x reads"
+            ))
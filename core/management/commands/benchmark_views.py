@@ -0,0 +1,66 @@
+# core/management/commands/benchmark_views.py
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.benchmark import run_benchmark, compare
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests every core and posts URL as a super admin, an admin and a client, and reports "
+        "p50/p95 latency and query counts. Run it against a seeded copy of the database "
+        "(see seed_scale); the writes it causes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help="Timed requests per URL and role.")
+        parser.add_argument('--warmup', type=int, default=1, help="Untimed requests before measuring.")
+        parser.add_argument(
+            '--role', action='append', choices=['super_admin', 'admin', 'client'],
+            help="Only benchmark these roles (repeatable)."
+        )
+        parser.add_argument('--save', metavar='PATH', help="Write the results as a JSON baseline.")
+        parser.add_argument('--check', metavar='PATH', help="Fail if the results regress against this baseline.")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help="Allowed p50 slowdown as a fraction of the baseline (default 0.5 = 50%%)."
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+
+        results = run_benchmark(options['iterations'], options['warmup'], options['role'])
+        if not results:
+            raise CommandError("No users to benchmark with; run seed_scale first.")
+
+        width = max(len(key) for key in results)
+        self.stdout.write(f"{'view':<{width}}  status    p50 ms    p95 ms  queries")
+        for key, result in sorted(results.items()):
+            self.stdout.write(
+                f"{key:<{width}}  {result['status']:>6}  {result['p50_ms']:>8.2f}  "
+                f"{result['p95_ms']:>8.2f}  {result['queries']:>7}"
+            )
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump({
+                    'created_at': timezone.now().isoformat(),
+                    'iterations': options['iterations'],
+                    'results': results,
+                }, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['save']}."))
+
+        if options['check']:
+            try:
+                with open(options['check']) as f:
+                    baseline = json.load(f)['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Could not read the baseline: {exc}")
+            regressions = compare(results, baseline, tolerance=options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
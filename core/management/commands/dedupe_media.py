@@ -0,0 +1,141 @@
+# core/management/commands/dedupe_media.py
+
+import hashlib
+import os
+import shutil
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import StoredBlob
+from core.storage import content_storage, content_name, is_content_addressed
+from posts.models import Post
+from posts.renditions import rendition_name, RENDITIONS, FORMATS
+from reports.models import GeneratedReport
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves existing post images and reports into content-addressed storage, "
+        "merging byte-identical files, and rebuilds the blob reference counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report what would be moved and merged."
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        references = [
+            (Post, 'image', set(Post.objects.exclude(image='').values_list('image', flat=True))),
+            (GeneratedReport, 'file', set(GeneratedReport.objects.exclude(file='').values_list('file', flat=True))),
+        ]
+
+        moved = merged = reclaimed = 0
+        for model, field, names in references:
+            for old_name in sorted(names):
+                if is_content_addressed(old_name):
+                    continue
+                old_path = content_storage.path(old_name)
+                if not os.path.exists(old_path):
+                    self.stderr.write(f"Missing file, skipped: {old_name}")
+                    continue
+
+                directory, filename = os.path.split(old_name)
+                new_name = content_name(directory, file_digest(old_path), os.path.splitext(filename)[1])
+                new_path = content_storage.path(new_name)
+                duplicate = os.path.exists(new_path)
+                self.stdout.write(f"{old_name} -> {new_name}{' (duplicate)' if duplicate else ''}")
+
+                if duplicate:
+                    merged += 1
+                    reclaimed += os.path.getsize(old_path)
+                else:
+                    moved += 1
+                if dry_run:
+                    continue
+
+                self.move_references(model, field, old_name, new_name)
+
+        if dry_run:
+            self.stdout.write(
+                f"Would move {moved} file(s) and merge {merged} duplicate(s), reclaiming {reclaimed} bytes."
+            )
+            return
+
+        self.rebuild_reference_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} file(s) and merged {merged} duplicate(s), reclaiming {reclaimed} bytes."
+        ))
+        if moved or merged:
+            self.stdout.write("Run `manage.py build_renditions` to rebuild the renditions of moved images.")
+
+    def move_references(self, model, field, old_name, new_name):
+        """
+        Points every row at `new_name`, copying the file there unless it is
+        already stored. The old file (and the renditions named after it) is
+        only deleted once the update has committed.
+        """
+        old_path, new_path = content_storage.path(old_name), content_storage.path(new_name)
+        updates = {field: new_name}
+        if model is Post:
+            # Old renditions are named after the old file; rebuild them with build_renditions.
+            updates['image_renditions'] = {}
+
+        def delete_old_files():
+            content_storage.delete(old_name)
+            if model is Post:
+                for size in RENDITIONS:
+                    for fmt in FORMATS:
+                        content_storage.delete(rendition_name(old_name, size, fmt))
+
+        copied = False
+        try:
+            with transaction.atomic():
+                # Same locking as core/storage.py, so a concurrent release can't delete the blob we reuse.
+                StoredBlob.objects.lock(new_name)
+                if not os.path.exists(new_path):
+                    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                    shutil.copy2(old_path, new_path)
+                    copied = True
+                updated = model.objects.filter(**{field: old_name}).update(**updates)
+                # Counted now rather than only by rebuild_reference_counts(), so the blob is never unreferenced.
+                for _ in range(updated):
+                    StoredBlob.objects.retain(new_name)
+                transaction.on_commit(delete_old_files)
+        except BaseException:
+            if copied:
+                os.remove(new_path)
+            raise
+
+    def rebuild_reference_counts(self):
+        counts = Counter()
+        counts.update(Post.objects.exclude(image='').values_list('image', flat=True))
+        counts.update(GeneratedReport.objects.exclude(file='').values_list('file', flat=True))
+        counts = {name: n for name, n in counts.items() if is_content_addressed(name)}
+
+        with transaction.atomic():
+            StoredBlob.objects.exclude(name__in=counts).delete()
+            existing = {blob.name: blob for blob in StoredBlob.objects.all()}
+            to_update = []
+            for name, n in counts.items():
+                blob = existing.get(name)
+                if blob and blob.ref_count != n:
+                    blob.ref_count = n
+                    to_update.append(blob)
+            StoredBlob.objects.bulk_update(to_update, ['ref_count'], batch_size=500)
+            StoredBlob.objects.bulk_create(
+                [StoredBlob(name=name, ref_count=n) for name, n in counts.items() if name not in existing],
+                batch_size=500
+            )
@@ -0,0 +1,37 @@
+# core/management/commands/refresh_replica.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.replica import snapshot_replica
+
+
+class Command(BaseCommand):
+    help = "Snapshots the primary database into the read-only replica used by the report views."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Take one snapshot and exit."
+        )
+        parser.add_argument(
+            '--interval', type=int, default=settings.REPLICA_REFRESH_INTERVAL,
+            help="Seconds between snapshots."
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            snapshot_replica()
+            self.stdout.write(self.style.SUCCESS(f"Replica written to {settings.SQLITE_REPLICA_PATH}."))
+            return
+
+        self.stdout.write("Replica refresher started. Press Ctrl+C to stop.")
+        try:
+            while True:
+                started = time.monotonic()
+                snapshot_replica()
+                time.sleep(max(options['interval'] - (time.monotonic() - started), 0))
+        except KeyboardInterrupt:
+            self.stdout.write("Replica refresher stopped.")
@@ -0,0 +1,281 @@
+# core/management/commands/seed_scale.py
+
+import contextlib
+import datetime
+import io
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Notification, AuditLog
+from posts.models import Post, Feedback, Rating, PostRequest
+from users.models import User, ClientProfile
+
+# Share of generated posts in each status.
+STATUS_WEIGHTS = {
+    Post.Status.DRAFT: 10,
+    Post.Status.PENDING: 15,
+    Post.Status.APPROVED: 15,
+    Post.Status.REJECTED: 10,
+    Post.Status.PUBLISHED: 45,
+    Post.Status.ARCHIVED: 5,
+}
+
+WORDS = (
+    "launch sale festive diwali holi summer monsoon winter offer discount new collection "
+    "behind the scenes team story customer review giveaway contest tips guide update event "
+    "webinar announcement product feature spotlight weekend flash limited edition brand"
+).split()
+
+FEEDBACK = [
+    "Please change the colours to match our brand.",
+    "The caption is too long, can we shorten it?",
+    "Use the other product photo instead.",
+    "Looks good but fix the typo in the second line.",
+    "Can we add our website link?",
+]
+
+AUDIT_ACTIONS = ['user_login', 'post_created', 'post_approved', 'post_rejected', 'post_published', 'feedback_added']
+
+
+@contextlib.contextmanager
+def manual_timestamps(*models):
+    """
+    Lets bulk_create keep the generated created_at/updated_at/timestamp values
+    instead of overwriting them with now().
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generates realistic data for load testing: admins, clients, posts in every status, "
+        "feedback, ratings, requests, notifications and audit logs, then rebuilds the counters "
+        "and daily rollup. Every generated user has the password given by --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--admins', type=int, default=10)
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000, help="Total posts, spread across the clients.")
+        parser.add_argument('--requests-per-client', type=int, default=20)
+        parser.add_argument('--notifications', type=int, default=100000)
+        parser.add_argument('--audit-logs', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=365, help="How far back the generated history goes.")
+        parser.add_argument('--prefix', default='seed', help="Username/company prefix for generated tenants.")
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None, help="Random seed, for repeatable data.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.verbosity = options['verbosity']
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+        prefix = options['prefix']
+
+        if User.objects.filter(username__startswith=f"{prefix}_").exists():
+            raise CommandError(f"Users with the prefix '{prefix}_' already exist; pick another --prefix.")
+        if options['admins'] < 1 or options['clients'] < 1:
+            raise CommandError("Need at least one admin and one client.")
+
+        with manual_timestamps(Post, Feedback, Rating, PostRequest, Notification):
+            admins, clients = self.create_tenants(prefix, options['admins'], options['clients'], options['password'])
+            self.create_posts(admins, clients, options['posts'])
+            self.create_requests(clients, options['requests_per_client'])
+            users = admins + [client.user for client in clients]
+            self.create_notifications(users, options['notifications'])
+            self.create_audit_logs(users, options['audit_logs'])
+
+        self.stdout.write("Rebuilding counters and the daily rollup...")
+        # reconcile_counters lists every client it corrects; only keep its summary
+        output = io.StringIO()
+        call_command('reconcile_counters', stdout=output)
+        self.stdout.write(output.getvalue().strip().splitlines()[-1])
+        call_command('backfill_daily_stats', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Seeding finished."))
+
+    # --- helpers ---
+
+    def random_time(self, after=None):
+        start = after or self.now - datetime.timedelta(days=self.days)
+        span = max((self.now - start).total_seconds(), 1)
+        return start + datetime.timedelta(seconds=self.random.random() * span)
+
+    def sentence(self, words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words)).capitalize()
+
+    def batches(self, items):
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # --- generators ---
+
+    def create_tenants(self, prefix, admin_count, client_count, password):
+        hashed = make_password(password)  # hashing once keeps this fast
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=f"{prefix}_super", role=User.Role.SUPER_ADMIN, password=hashed)
+            ])
+            admins = User.objects.bulk_create([
+                User(username=f"{prefix}_admin_{n}", role=User.Role.ADMIN, password=hashed,
+                     email=f"{prefix}_admin_{n}@example.com")
+                for n in range(admin_count)
+            ])
+            client_users = User.objects.bulk_create([
+                User(username=f"{prefix}_client_{n}", role=User.Role.CLIENT, password=hashed,
+                     email=f"{prefix}_client_{n}@example.com")
+                for n in range(client_count)
+            ])
+            clients = ClientProfile.objects.bulk_create([
+                ClientProfile(user=user, company_name=f"{prefix.title()} Client {n}")
+                for n, user in enumerate(client_users)
+            ])
+            # Each client gets one or two admins.
+            Assignment = ClientProfile.assigned_admins.through
+            assignments = set()
+            for client in clients:
+                for admin in self.random.sample(admins, min(len(admins), self.random.choice([1, 2]))):
+                    assignments.add((client.pk, admin.pk))
+            Assignment.objects.bulk_create([
+                Assignment(clientprofile_id=client_id, user_id=admin_id) for client_id, admin_id in assignments
+            ])
+        self.stdout.write(f"Created 1 super admin, {len(admins)} admin(s) and {len(clients)} client(s).")
+        self.admins_of = {}
+        for client_id, admin_id in assignments:
+            self.admins_of.setdefault(client_id, []).append(admin_id)
+        return admins, clients
+
+    def create_posts(self, admins, clients, total):
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+
+        def posts():
+            for _ in range(total):
+                client = self.random.choice(clients)
+                created_at = self.random_time()
+                status = self.random.choices(statuses, weights)[0]
+                scheduled = None
+                if status != Post.Status.DRAFT or self.random.random() < 0.5:
+                    scheduled = created_at + datetime.timedelta(hours=self.random.randint(24, 24 * 30))
+                yield Post(
+                    title=self.sentence(4),
+                    caption=self.sentence(self.random.randint(15, 40)),
+                    image='post_images/seed.jpg',
+                    status=status,
+                    scheduled_datetime=scheduled,
+                    created_by_id=self.random.choice(self.admins_of[client.pk]),
+                    assigned_client=client,
+                    created_at=created_at,
+                    updated_at=self.random_time(after=created_at),
+                )
+
+        created = feedback_count = rating_count = 0
+        for batch in self.batches(posts()):
+            with transaction.atomic():
+                Post.objects.bulk_create(batch)
+                feedback = []
+                ratings = []
+                for post in batch:
+                    rounds = 0
+                    if post.status == Post.Status.REJECTED:
+                        rounds = self.random.randint(1, 3)
+                    elif post.status != Post.Status.DRAFT and self.random.random() < 0.2:
+                        rounds = 1
+                    for _ in range(rounds):
+                        feedback.append(Feedback(
+                            post=post, user_id=post.assigned_client_id,
+                            comment=self.random.choice(FEEDBACK),
+                            created_at=self.random_time(after=post.created_at),
+                        ))
+                    if post.status == Post.Status.PUBLISHED and self.random.random() < 0.6:
+                        ratings.append(Rating(
+                            post=post, user_id=post.assigned_client_id,
+                            score=self.random.choices([1, 2, 3, 4, 5], [1, 2, 5, 10, 12])[0],
+                            comment=self.random.choice([None, "Great post!", "Nice work.", "Could be better."]),
+                            created_at=self.random_time(after=post.updated_at),
+                        ))
+                Feedback.objects.bulk_create(feedback)
+                Rating.objects.bulk_create(ratings)
+            created += len(batch)
+            feedback_count += len(feedback)
+            rating_count += len(ratings)
+            if self.verbosity > 1:
+                self.stdout.write(f"  {created}/{total} posts")
+        self.stdout.write(f"Created {created} post(s), {feedback_count} feedback and {rating_count} rating(s).")
+
+    def create_requests(self, clients, per_client):
+        statuses = list(PostRequest.Status)
+
+        def requests():
+            for client in clients:
+                for _ in range(per_client):
+                    created_at = self.random_time()
+                    yield PostRequest(
+                        client=client,
+                        request_details=self.sentence(self.random.randint(10, 30)),
+                        desired_date=(created_at + datetime.timedelta(days=self.random.randint(3, 30))).date(),
+                        status=self.random.choice(statuses),
+                        created_at=created_at,
+                    )
+
+        count = 0
+        for batch in self.batches(requests()):
+            PostRequest.objects.bulk_create(batch)
+            count += len(batch)
+        self.stdout.write(f"Created {count} post request(s).")
+
+    def create_notifications(self, users, total):
+        def notifications():
+            for _ in range(total):
+                yield Notification(
+                    recipient=self.random.choice(users),
+                    message=f"Post \"{self.sentence(4)}\" was updated.",
+                    is_read=self.random.random() < 0.8,
+                    timestamp=self.random_time(),
+                )
+
+        count = 0
+        for batch in self.batches(notifications()):
+            Notification.objects.bulk_create(batch)
+            count += len(batch)
+        self.stdout.write(f"Created {count} notification(s).")
+
+    def create_audit_logs(self, users, total):
+        def entries():
+            for _ in range(total):
+                user = self.random.choice(users)
+                yield AuditLog(
+                    user=user,
+                    action=self.random.choice(AUDIT_ACTIONS),
+                    details=f"Generated by seed_scale for {user.username}",
+                    timestamp=self.random_time(),
+                )
+
+        count = 0
+        for batch in self.batches(entries()):
+            AuditLog.objects.bulk_create(batch)
+            count += len(batch)
+        self.stdout.write(f"Created {count} audit log entries.")
@@ -0,0 +1,391 @@
+# core/metrics.py
+
+"""
+Prometheus metrics, served in the text exposition format at /metrics.
+
+Counters and histograms are kept in memory by each process. A background
+thread writes them to that process's own JSON file in METRICS_DIR every
+METRICS_FLUSH_INTERVAL seconds, and once more at exit. A scrape adds up the
+files of every process, so web workers, the publish scheduler and report
+workers all report into the same totals. Files of processes that have exited
+keep counting until METRICS_DIR is cleared, which should be done whenever the
+whole service restarts. With METRICS_DIR = None each process only reports
+its own numbers.
+
+Gauges describing the database (unread notifications, overdue posts, report
+jobs, database size) are read at scrape time.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from core.models import Notification
+from posts.models import Post
+from reports.models import GeneratedReport
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PUBLISH_DELAY_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 900, 1800, 3600)
+REPORT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def key(self, labels):
+        # JSON so the key survives the round trip through the process files.
+        return json.dumps([str(labels[name]) for name in self.labelnames])
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        registry.add(self.name, self.key(labels), amount)
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def render(self, values):
+        lines = self.header()
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, json.loads(key))} {_number(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        # Stored as [per-bucket counts..., +Inf count, sum]; buckets are made cumulative when rendered.
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        registry.observe(self.name, self.key(labels), index, value, len(self.buckets) + 2)
+
+    def merge(self, total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def render(self, values):
+        lines = self.header()
+        for key, value in sorted(values.items()):
+            label_values = json.loads(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), value[:-1]):
+                cumulative += count
+                le = _labels(self.labelnames, label_values, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _labels(self.labelnames, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(value[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(Metric):
+    """
+    A value read at scrape time: `collect()` returns {label values tuple: value}.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, collect, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def render(self, values=None):
+        lines = self.header()
+        for label_values, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, label_values)} {_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.metrics = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps an older snapshot from overwriting a newer one
+        self._thread = None
+        self._pid = None
+        self._path = None
+        self._dirty = False
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def _series(self, name):
+        self._ensure_process()
+        self._dirty = True
+        return self._values.setdefault(name, {})
+
+    def add(self, name, key, amount):
+        with self._lock:
+            series = self._series(name)
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, key, index, value, size):
+        with self._lock:
+            series = self._series(name)
+            buckets = series.get(key)
+            if buckets is None:
+                buckets = series[key] = [0] * (size - 1) + [0.0]
+            buckets[index] += 1
+            buckets[-1] += value
+
+    def _ensure_process(self):
+        # Called with the lock held. After a fork the child starts from zero
+        # with its own file and writer thread; the parent's numbers stay in its file.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._values = {}
+        self._path = None
+        if settings.METRICS_DIR:
+            directory = Path(settings.METRICS_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            self._path = directory / f"{self._pid}-{uuid.uuid4().hex[:8]}.json"
+            self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """
+        Writes this process's values to its file, if anything changed.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty or self._path is None or self._pid != os.getpid():
+                    return
+                payload = json.dumps(self._values)
+                self._dirty = False
+            tmp_path = self._path.with_suffix('.tmp')
+            try:
+                tmp_path.write_text(payload)
+                os.replace(tmp_path, self._path)
+            except OSError:
+                logger.exception("Failed to write metrics to %s.", self._path)
+
+    def collect(self):
+        """
+        {metric name: {label key: value}} summed over every process.
+        """
+        if not settings.METRICS_DIR:
+            with self._lock:
+                return json.loads(json.dumps(self._values))
+
+        self.flush()
+        totals = {}
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            try:
+                values = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # Deleted or half-written by a process that just exited.
+                continue
+            for name, series in values.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                merged = totals.setdefault(name, {})
+                for key, value in series.items():
+                    merged[key] = metric.merge(merged.get(key), value)
+        return totals
+
+    def render(self):
+        values = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            try:
+                lines.extend(metric.render(values.get(name, {})))
+            except Exception:
+                # One failing gauge shouldn't take the whole scrape down.
+                logger.exception("Failed to collect metric %s.", name)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+# --- REQUESTS AND DATABASE ---
+
+REQUESTS = Counter(
+    'posttrack_requests_total', "Requests handled, by URL name, role and status code.",
+    ['view', 'role', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'posttrack_request_duration_seconds', "Request latency, by URL name and role.",
+    ['view', 'role'],
+)
+DB_QUERIES = Counter(
+    'posttrack_db_queries_total', "SQL queries run by requests, by URL name.", ['view'],
+)
+DB_QUERY_SECONDS = Counter(
+    'posttrack_db_query_seconds_total', "Time spent in SQL queries by requests, by URL name.", ['view'],
+)
+
+
+# --- JOBS ---
+
+PUBLISH_DELAY = Histogram(
+    'posttrack_publish_delay_seconds',
+    "How long after its scheduled_datetime the scheduler published each post.",
+    buckets=PUBLISH_DELAY_BUCKETS,
+)
+REPORT_DURATION = Histogram(
+    'posttrack_report_duration_seconds', "Report generation time, by report type and outcome.",
+    ['report_type', 'status'], buckets=REPORT_BUCKETS,
+)
+
+
+# --- DATABASE GAUGES (read at scrape time) ---
+
+def _unread_notifications():
+    return {(): Notification.objects.filter(is_read=False).count()}
+
+
+def _overdue_posts():
+    return Post.objects.filter(
+        status=Post.Status.APPROVED, scheduled_datetime__lte=timezone.now()
+    ).aggregate(count=Count('id'), oldest=Min('scheduled_datetime'))
+
+
+def _scheduler_backlog():
+    return {(): _overdue_posts()['count']}
+
+
+def _scheduler_lag():
+    oldest = _overdue_posts()['oldest']
+    return {(): (timezone.now() - oldest).total_seconds() if oldest else 0.0}
+
+
+def _report_jobs():
+    counts = dict(GeneratedReport.objects.values_list('status').annotate(Count('id')).order_by())
+    return {(status,): counts.get(status, 0) for status in GeneratedReport.Status.values}
+
+
+def _database_size():
+    connection = connections[DEFAULT_DB_ALIAS]
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA page_count")
+        pages = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        page_size = cursor.fetchone()[0]
+    sizes = {('main',): pages * page_size}
+    wal = f"{connection.settings_dict['NAME']}-wal"
+    if os.path.exists(wal):
+        sizes[('wal',)] = os.path.getsize(wal)
+    return sizes
+
+
+Gauge('posttrack_notifications_unread', "Unread notifications across all users.", _unread_notifications)
+Gauge(
+    'posttrack_scheduler_overdue_posts', "APPROVED posts whose scheduled time has passed but are not published yet.",
+    _scheduler_backlog,
+)
+Gauge(
+    'posttrack_scheduler_lag_seconds', "How overdue the oldest unpublished APPROVED post is (0 when none are).",
+    _scheduler_lag,
+)
+Gauge('posttrack_report_jobs', "Report jobs by status.", _report_jobs, ['status'])
+Gauge('posttrack_db_size_bytes', "Size of the SQLite database and its WAL file.", _database_size, ['file'])
+
+
+# --- MIDDLEWARE ---
+
+class _QueryTimer:
+    """
+    Execute wrapper that only counts and times queries.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    """
+    Records every request's latency, status and SQL usage. The view label is
+    the URL name (or "unmatched"), so unknown paths can't blow up the series count.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        wrappers = [connection.execute_wrapper(timer) for connection in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        role = getattr(getattr(request, 'user', None), 'role', None) or 'anonymous'
+        REQUESTS.inc(view=view, role=role, status=response.status_code)
+        REQUEST_DURATION.observe(duration, view=view, role=role)
+        DB_QUERIES.inc(timer.queries, view=view)
+        DB_QUERY_SECONDS.inc(timer.seconds, view=view)
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:26
+
+import core.storage
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_storedblob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('view_name', models.CharField(blank=True, max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration', models.DurationField()),
+                ('trigger', models.CharField(choices=[('HEADER', 'Signed header'), ('SAMPLE', 'Random sample')], max_length=10)),
+                ('file', models.FileField(storage=core.storage.profile_storage, upload_to='requests/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-duration'],
+                'indexes': [models.Index(fields=['duration'], name='request_profile_duration_idx'), models.Index(fields=['created_at'], name='request_profile_created_idx')],
+            },
+        ),
+    ]
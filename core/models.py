@@ -1,8 +1,10 @@
 # core/models.py
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
+from django.utils import timezone
 from posts.models import Post # Import from your new posts app
+from .storage import profile_storage
 
 class Notification(models.Model):
     recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
@@ -17,16 +19,120 @@ class Notification(models.Model):
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.message[:30]}..."
 
+    def as_dict(self):
+        """
+        JSON-friendly representation used by the notification dropdown.
+        """
+        return {
+            'id': self.id,
+            'message': self.message,
+            'time': self.timestamp.strftime("%b %d, %Y %I:%M %p")
+        }
+
 
 class AuditLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     action = models.CharField(max_length=100, help_text="e.g., 'user_login', 'post_edit', 'client_assigned'")
     details = models.TextField(blank=True, null=True, help_text="Extra info, e.g., IP address or object ID")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the entry is queued, not when the buffered writer saves it (see core/audit.py)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-timestamp']
 
     def __str__(self):
         user_str = self.user.username if self.user else "System"
-        return f"[{self.timestamp.strftime('%Y-%m-%d %H:%M')}] {user_str}: {self.action}"
\ No newline at end of file
+        return f"[{self.timestamp.strftime('%Y-%m-%d %H:%M')}] {user_str}: {self.action}"
+
+
+class StoredBlobQuerySet(models.QuerySet):
+
+    def retain(self, name):
+        """
+        Adds a reference to the blob stored under `name`.
+        """
+        with transaction.atomic():
+            if self.filter(name=name).update(ref_count=models.F('ref_count') + 1):
+                return
+            try:
+                with transaction.atomic():
+                    self.create(name=name, ref_count=1)
+            except IntegrityError:
+                self.filter(name=name).update(ref_count=models.F('ref_count') + 1)
+
+    def release(self, name):
+        """
+        Drops a reference to the blob stored under `name`.
+        Returns True when that was the last one; the row stays at 0 until
+        collect() deletes it together with the file.
+        """
+        with transaction.atomic():
+            if not self.filter(name=name).update(ref_count=models.F('ref_count') - 1):
+                return False
+            return self.filter(name=name, ref_count__lte=0).exists()
+
+    def lock(self, name):
+        """
+        Write-locks the blob row of `name` (on SQLite, the whole database)
+        until the surrounding transaction ends, so collect() can't delete the
+        file while a new reference to it is being saved.
+        """
+        self.filter(name=name).update(ref_count=models.F('ref_count'))
+
+    def collect(self, name, delete_file):
+        """
+        Deletes the blob and calls `delete_file(name)` if it is still
+        unreferenced. Runs after the releasing transaction has committed, so
+        the count is checked again: a save that reused the file in between
+        keeps it. Returns True when the file was deleted.
+        """
+        with transaction.atomic():
+            deleted, _ = self.filter(name=name, ref_count__lte=0).delete()
+            if deleted:
+                delete_file(name)
+        return bool(deleted)
+
+
+class StoredBlob(models.Model):
+    """
+    Reference count for a file kept by the content-addressed storage (core/storage.py).
+    """
+    name = models.CharField(max_length=500, unique=True)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StoredBlobQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+
+class RequestProfile(models.Model):
+    """
+    A cProfile capture of one request, recorded by core/profiling.py.
+    The .prof file opens in pstats, snakeviz and similar tools.
+    """
+
+    class Trigger(models.TextChoices):
+        HEADER = 'HEADER', 'Signed header'
+        SAMPLE = 'SAMPLE', 'Random sample'
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration = models.DurationField()
+    trigger = models.CharField(max_length=10, choices=Trigger.choices)
+    file = models.FileField(upload_to='requests/', storage=profile_storage)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-duration']
+        indexes = [
+            models.Index(fields=['duration'], name='request_profile_duration_idx'),
+            models.Index(fields=['created_at'], name='request_profile_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration.total_seconds():.2f}s)"
@@ -0,0 +1,89 @@
+# core/notification_cache.py
+
+"""
+Per-user unread-notification counter and "latest 5" list kept in Django's cache.
+
+The summary is cached under a per-user version number. Creating or reading a
+notification bumps the version instead of editing the cached summary, and the
+next read rebuilds it from the database. A rebuild stores its result with
+cache.add() under the version it started from, so a rebuild that raced with a
+newer notification lands on a version nobody reads any more instead of
+overwriting fresher data.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+
+LATEST_LIMIT = 5
+
+
+def _version_key(user_id):
+    return f"notifications:unread_version:{user_id}"
+
+
+def _summary_key(user_id, version):
+    return f"notifications:unread_summary:{user_id}:{version}"
+
+
+def _timeout():
+    return getattr(settings, 'NOTIFICATION_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Start from the clock rather than 0, so summaries cached under an
+        # evicted version number are never read again.
+        cache.add(_version_key(user_id), time.time_ns(), _timeout())
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def _build(user_id):
+    unread = Notification.objects.filter(recipient_id=user_id, is_read=False)
+    return {
+        'count': unread.count(),
+        'notifications': [notif.as_dict() for notif in unread[:LATEST_LIMIT]],
+    }
+
+
+def get_unread_summary(user_id):
+    """
+    Returns {'count': n, 'notifications': [...]} for the user's unread notifications.
+    """
+    key = _summary_key(user_id, _version(user_id))
+    summary = cache.get(key)
+    if summary is None:
+        summary = _build(user_id)
+        cache.add(key, summary, _timeout())
+    return summary
+
+
+def invalidate(user_id):
+    """
+    Makes the next read rebuild the user's summary. Call after the change commits.
+    """
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        # No version yet, so nothing is cached for this user.
+        pass
+
+
+def notification_created(notification):
+    """
+    Invalidates the recipient's summary when a new unread notification is committed.
+    """
+    if not notification.is_read:
+        invalidate(notification.recipient_id)
+
+
+def notification_read(notification):
+    """
+    Invalidates the recipient's summary after a notification is marked as read.
+    """
+    invalidate(notification.recipient_id)
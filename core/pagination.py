@@ -0,0 +1,135 @@
+# core/pagination.py
+
+"""
+Keyset (cursor) pagination.
+
+A page is selected with WHERE (key) < (last key seen) ORDER BY key LIMIT n + 1
+instead of COUNT(*) + OFFSET, so page 500 costs the same as page 1 as long as
+an index matches the ordering. Cursors are opaque, URL-safe strings that hold
+the key of the row a page starts after and the direction to read in.
+"""
+
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    One page of results, iterable like a Paginator page.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates `queryset` by `ordering`, e.g. ('-updated_at', '-id').
+    The ordering must be unique (end with the primary key) and its fields
+    must not be NULL.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in ordering]
+
+    # --- Cursors ---
+
+    def _encode(self, obj, direction):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'d': direction, 'k': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def _decode(self, cursor):
+        """
+        Returns (direction, key values), or ('next', None) for the first page
+        or a cursor that can't be read.
+        """
+        if not cursor:
+            return 'next', None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            direction, raw_values = payload['d'], payload['k']
+            if direction not in ('next', 'previous') or len(raw_values) != len(self.fields):
+                raise ValueError
+            model = self.queryset.model
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, raw_values)
+            ]
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            # A tampered or stale cursor just starts over at the first page.
+            return 'next', None
+        return direction, values
+
+    # --- Queries ---
+
+    def _beyond(self, values, backwards):
+        """
+        Q for the rows after `values` in the ordering (before them if `backwards`).
+        """
+        condition = Q()
+        equal_so_far = Q()
+        for name, field, value in zip(self.ordering, self.fields, values):
+            descending = name.startswith('-')
+            lookup = 'gt' if descending == backwards else 'lt'
+            condition |= equal_so_far & Q(**{f'{field}__{lookup}': value})
+            equal_so_far &= Q(**{field: value})
+        return condition
+
+    def get_page(self, cursor=None):
+        direction, values = self._decode(cursor)
+        backwards = direction == 'previous'
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._beyond(values, backwards))
+        if backwards:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows)
+
+        # Going forwards there is a previous page unless this is the first;
+        # going backwards there is always a next page (the one we came from).
+        has_next = has_more if not backwards else True
+        has_previous = (values is not None) if not backwards else has_more
+        return KeysetPage(
+            rows,
+            next_cursor=self._encode(rows[-1], 'next') if has_next else None,
+            previous_cursor=self._encode(rows[0], 'previous') if has_previous else None,
+        )
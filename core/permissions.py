@@ -0,0 +1,72 @@
+# core/permissions.py
+
+"""
+Which clients an admin may work on.
+
+An admin's assigned client IDs are loaded once per request (memoized on
+the user object) as a frozenset, so repeated checks are set lookups.
+They are also kept in Django's cache for CLIENT_PERMISSION_CACHE_TIMEOUT
+seconds, so later requests usually need no query at all, and dropped
+whenever the assignments change (see core/signals.py).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import User, ClientProfile
+
+Assignment = ClientProfile.assigned_admins.through
+
+
+def _cache_key(user_id):
+    return f"permissions:assigned_clients:{user_id}"
+
+
+def _timeout():
+    return getattr(settings, 'CLIENT_PERMISSION_CACHE_TIMEOUT', 60)
+
+
+def assigned_client_ids(user):
+    """
+    Frozenset of the client IDs assigned to this admin, from the request's
+    memo, then the shared cache, then the database.
+    """
+    client_ids = getattr(user, '_assigned_client_ids', None)
+    if client_ids is None and _timeout():
+        client_ids = cache.get(_cache_key(user.pk))
+        if client_ids is not None:
+            user._assigned_client_ids = client_ids
+    if client_ids is None:
+        client_ids = frozenset(
+            Assignment.objects.filter(user_id=user.pk).values_list('clientprofile_id', flat=True)
+        )
+        user._assigned_client_ids = client_ids
+        if _timeout():
+            cache.set(_cache_key(user.pk), client_ids, _timeout())
+    return client_ids
+
+
+def can_access_client(user, client_id):
+    """
+    True if the user may work on the given client's posts and requests.
+    Super admins may access every client and clients only themselves.
+    """
+    if client_id is None:
+        return False
+    if user.role == User.Role.SUPER_ADMIN:
+        return True
+    if user.role == User.Role.CLIENT:
+        return client_id == user.pk
+    return client_id in assigned_client_ids(user)
+
+
+def invalidate_assigned_clients(user_ids):
+    """
+    Drops the cached assignments of the given admins now and again once the
+    current transaction commits, so a request that read the old assignments
+    meanwhile can't keep them cached.
+    """
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,133 @@
+# core/profiling.py
+
+"""
+Opt-in cProfile capture of production requests.
+
+A request is profiled when either:
+- it carries a valid PROFILING_HEADER token, which super admins can copy
+  from the Profiles page (profile_token() signs it; it expires after
+  PROFILING_TOKEN_MAX_AGE), or
+- it is picked for the 1-in-PROFILING_SAMPLE_EVERY random sample. Those
+  profiles are only kept when the request was slower than PROFILING_MIN_DURATION.
+
+The profiler runs on the request's thread for everything below this
+middleware: the view, the signal handlers it fires and template rendering.
+Each profile is stored as a RequestProfile with its .prof file under
+PROFILE_ROOT, and only the newest PROFILING_MAX_PROFILES are kept. For
+streaming responses only the work done before the first chunk is captured.
+"""
+
+import cProfile
+import datetime
+import io
+import logging
+import marshal
+import pstats
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+SIGNING_SALT = 'posttrack.profiling'
+
+_profiler_lock = threading.Lock()
+
+
+def profile_token():
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('profile')
+
+
+def has_valid_token(request):
+    token = request.headers.get(settings.PROFILING_HEADER)
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def profile_summary(profile, sort='cumulative', limit=60):
+    """
+    pstats text report of a RequestProfile's top `limit` functions.
+    """
+    output = io.StringIO()
+    stats = pstats.Stats(profile.file.path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if has_valid_token(request):
+            trigger = RequestProfile.Trigger.HEADER
+        elif settings.PROFILING_SAMPLE_EVERY and random.randrange(settings.PROFILING_SAMPLE_EVERY) == 0:
+            trigger = RequestProfile.Trigger.SAMPLE
+        else:
+            return self.get_response(request)
+
+        # From Python 3.12 cProfile uses the interpreter-wide sys.monitoring hook, so
+        # only one request per process is profiled at a time; the others run unprofiled.
+        if not _profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another tool, such as a debugger, already holds the hook.
+                logger.warning("Could not profile %s: another profiler is active.", request.path)
+                return self.get_response(request)
+            start = time.perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+        finally:
+            _profiler_lock.release()
+
+        if trigger == RequestProfile.Trigger.HEADER or duration >= settings.PROFILING_MIN_DURATION:
+            try:
+                self.save(request, response, profiler, duration, trigger)
+            except Exception:
+                # Profiling must never break the request it measured.
+                logger.exception("Failed to save the profile of %s.", request.path)
+        return response
+
+    def save(self, request, response, profiler, duration, trigger):
+        profiler.create_stats()
+        match = request.resolver_match
+        user = getattr(request, 'user', None)
+        profile = RequestProfile(
+            method=request.method,
+            path=request.path[:500],
+            view_name=match.view_name if match else '',
+            user=user if user is not None and user.is_authenticated else None,
+            status_code=response.status_code,
+            duration=datetime.timedelta(seconds=duration),
+            trigger=trigger,
+        )
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{(profile.view_name or 'unmatched').replace(':', '-')}.prof"
+        profile.file.save(name, ContentFile(marshal.dumps(profiler.stats)), save=False)
+        profile.save()
+
+        # Keep only the newest PROFILING_MAX_PROFILES; deleting removes the files too.
+        stale_ids = list(
+            RequestProfile.objects.order_by('-created_at', '-id')
+            .values_list('pk', flat=True)[settings.PROFILING_MAX_PROFILES:]
+        )
+        if stale_ids:
+            RequestProfile.objects.filter(pk__in=stale_ids).delete()
@@ -0,0 +1,142 @@
+# core/replica.py
+
+"""
+Read replica for the heavy report and dashboard queries.
+
+The replica is a read-only SQLite snapshot of the primary database, refreshed
+by `manage.py refresh_replica`. Reads go to it only inside views decorated
+with @read_from_replica (or a `replica_reads()` block); everything else,
+and every write, stays on the primary.
+
+Fallbacks to the primary:
+- The replica is used only while its snapshot is younger than REPLICA_MAX_LAG.
+- After a user's POST, the ReadYourWritesMiddleware pins that browser to the
+  primary for REPLICA_PIN_SECONDS, so the user never reads a snapshot taken
+  before their own change.
+"""
+
+import contextlib
+import contextvars
+import functools
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias that reads go to in the current request/thread; None means the primary.
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica inside replica_reads(); writes and
+    migrations always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def replica_lag():
+    """
+    Age of the replica snapshot in seconds, or None if there is no snapshot.
+    """
+    try:
+        return time.time() - os.path.getmtime(settings.SQLITE_REPLICA_PATH)
+    except OSError:
+        return None
+
+
+def replica_is_usable():
+    if not settings.REPLICA_ENABLED or REPLICA_DB_ALIAS not in settings.DATABASES:
+        return False
+    lag = replica_lag()
+    return lag is not None and lag <= settings.REPLICA_MAX_LAG
+
+
+@contextlib.contextmanager
+def replica_reads():
+    """
+    Routes the reads made inside the block to the replica, if it is usable.
+    """
+    if not replica_is_usable():
+        yield
+        return
+    token = _read_alias.set(REPLICA_DB_ALIAS)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def read_from_replica(view_func):
+    """
+    Serves a read-only view from the replica unless the request is a write
+    or the browser is pinned to the primary after its own write.
+    Place it below the auth decorators so the user is loaded from the primary.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+            return view_func(request, *args, **kwargs)
+        with replica_reads():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins a browser to the primary for a while after it sends a write, so the
+    next pages show the change even before the replica is refreshed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and settings.REPLICA_ENABLED:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+
+def snapshot_replica(using=DEFAULT_DB_ALIAS):
+    """
+    Copies the primary into the replica file with SQLite's online backup,
+    then swaps the new file in atomically. Readers holding the old file keep
+    a consistent view until they reconnect.
+    """
+    path = settings.SQLITE_REPLICA_PATH
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = connections[using]
+    connection.ensure_connection()
+    target = sqlite3.connect(tmp_path)
+    try:
+        connection.connection.backup(target)
+        # The replica is opened read-only, which needs a rollback journal, not WAL.
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+    os.replace(tmp_path, path)
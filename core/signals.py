@@ -1,98 +1,416 @@
 # core/signals.py
 
-from django.db.models.signals import post_save
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.urls import reverse
-from posts.models import Post, Feedback, Rating
-from .models import Notification, AuditLog
+from django.utils import timezone
+from posts.models import Post, PostStatusEvent, Feedback, Rating, ClientPostStats, ClientDailyStats
+from posts.renditions import generate_renditions, rendition_name, RENDITIONS, FORMATS
+from reports.models import GeneratedReport
+from users.models import User, ClientProfile
+from .models import Notification, StoredBlob, RequestProfile
+from .storage import content_storage, is_content_addressed
+from .audit import write_audit_log
+from . import events, notification_cache, permissions, user_cache
 from django.contrib.auth.signals import user_logged_in
 
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
     """
-    Create an AuditLog entry when a user logs in.
+    Record an AuditLog entry when a user logs in.
     """
-    AuditLog.objects.create(
+    write_audit_log(
         user=user,
         action="user_login",
         details=f"User {user.username} logged in."
     )
 
+def _post_author(post):
+    """
+    Returns (id, username) of the post's creator, using the cached relation
+    when the view already has it and one narrow query otherwise.
+    """
+    if not post.created_by_id:
+        return None, None
+    if Post.created_by.is_cached(post):
+        return post.created_by.id, post.created_by.username
+    username = User.objects.filter(pk=post.created_by_id).values_list('username', flat=True).first()
+    return post.created_by_id, username
+
+def _is_status_transition(post, created):
+    """
+    True when a save created the post or changed its status. Instances that were
+    not loaded from the database have no known previous status and count as no change.
+    """
+    if created:
+        return True
+    return post._loaded_status is not None and post._loaded_status != post.status
+
 @receiver(post_save, sender=Post)
 def post_save_receiver(sender, instance, created, **kwargs):
     """
-    Create Notifications and AuditLog entries for Post updates.
+    Create Notifications and record AuditLog entries when a post is created
+    or its status actually changes. Saves that leave the status alone do nothing.
     """
     post = instance
-    
+    if not _is_status_transition(post, created):
+        return
+
+    # ClientProfile's primary key is its user, so the client's user id needs no lookup.
+    admin_id = post.created_by_id
+    client_user_id = post.assigned_client_id
+    short_title = post.title[:30]
+
     # --- Audit Log Logic ---
     if created:
-        AuditLog.objects.create(
-            user=post.created_by,
+        admin_id, admin_username = _post_author(post)
+        audit_entry = dict(
+            user_id=admin_id,
             action="post_create",
-            details=f"Admin {post.created_by.username} created post '{post.title}'."
+            details=f"Admin {admin_username} created post '{post.title}'."
         )
     else:
-        AuditLog.objects.create(
-            user=instance.created_by,
+        audit_entry = dict(
+            user_id=admin_id,
             action="post_edit",
             details=f"Post '{post.title}' was updated. New status: {post.get_status_display()}."
         )
 
     # --- Notification Logic ---
-    
+    notification = None
+
     # Notify ADMIN when REJECTED
-    if post.status == Post.Status.REJECTED and post.created_by:
-        message = f"Client rejected post: '{post.title[:30]}...'"
-        Notification.objects.create(recipient=post.created_by, message=message, related_post=post)
-    
+    if post.status == Post.Status.REJECTED and admin_id:
+        notification = (admin_id, f"Client rejected post: '{short_title}...'")
+
     # Notify ADMIN when APPROVED
-    if post.status == Post.Status.APPROVED and post.created_by:
-        message = f"Client approved post: '{post.title[:30]}...'"
-        Notification.objects.create(recipient=post.created_by, message=message, related_post=post)
+    elif post.status == Post.Status.APPROVED and admin_id:
+        notification = (admin_id, f"Client approved post: '{short_title}...'")
 
     # Notify CLIENT when PENDING
-    if post.status == Post.Status.PENDING:
-        client_user = post.assigned_client.user
-        message = f"New post ready for review: '{post.title[:30]}...'"
-        Notification.objects.create(recipient=client_user, message=message, related_post=post)
-        
-    # === NEW: Notify CLIENT when PUBLISHED ===
-    if post.status == Post.Status.PUBLISHED:
-        # Check if it was *just* published (we don't want to notify every time it's saved)
-        if kwargs.get('update_fields') and 'status' in kwargs['update_fields']:
-            client_user = post.assigned_client.user
-            message = f"Your post '{post.title[:30]}...' has been published!"
-            Notification.objects.create(recipient=client_user, message=message, related_post=post)
+    elif post.status == Post.Status.PENDING:
+        notification = (client_user_id, f"New post ready for review: '{short_title}...'")
+
+    # Notify CLIENT when PUBLISHED
+    elif post.status == Post.Status.PUBLISHED:
+        notification = (client_user_id, f"Your post '{short_title}...' has been published!")
+
+    def side_effects():
+        write_audit_log(**audit_entry)
+        if notification:
+            recipient_id, message = notification
+            Notification.objects.create(recipient_id=recipient_id, message=message, related_post_id=post.pk)
+
+    # Only notify about changes that were actually committed
+    transaction.on_commit(side_effects)
+
+@receiver(post_save, sender=Post)
+def queue_image_renditions(sender, instance, created, **kwargs):
+    """
+    Render the thumb/feed/full renditions whenever a new image is uploaded.
+    """
+    post = instance
+    if not getattr(settings, 'IMAGE_RENDITIONS_ON_UPLOAD', True) or not post.image:
+        return
+    if not created and post.image.name == post._loaded_image:
+        return
+    post_id, image_name = post.pk, post.image.name
+    transaction.on_commit(lambda: generate_renditions(post_id, image_name))
 
 @receiver(post_save, sender=Feedback)
 def create_feedback_notification_and_log(sender, instance, created, **kwargs):
     if created:
-        admin_user = instance.post.created_by
+        admin_user_id = instance.post.created_by_id
         
-        AuditLog.objects.create(
+        write_audit_log(
             user=instance.user,
             action="post_feedback",
             details=f"Client {instance.user.username} left feedback on '{instance.post.title}'."
         )
         
         # Notify ADMIN (but not if it was part of a rejection)
-        if admin_user and instance.post.status != Post.Status.REJECTED:
+        if admin_user_id and instance.post.status != Post.Status.REJECTED:
             message = f"Client left feedback on '{instance.post.title[:30]}...'"
-            Notification.objects.create(recipient=admin_user, message=message, related_post=instance.post)
+            Notification.objects.create(recipient_id=admin_user_id, message=message, related_post=instance.post)
 
 @receiver(post_save, sender=Rating)
 def create_rating_notification_and_log(sender, instance, created, **kwargs):
     if created:
-        admin_user = instance.post.created_by
+        admin_user_id = instance.post.created_by_id
         
-        AuditLog.objects.create(
+        write_audit_log(
             user=instance.user,
             action="post_rating",
             details=f"Client {instance.user.username} rated '{instance.post.title}' {instance.score} stars."
         )
         
         # Notify ADMIN
-        if admin_user:
+        if admin_user_id:
             message = f"Client rated '{instance.post.title[:30]}...' {instance.score} stars."
-            Notification.objects.create(recipient=admin_user, message=message, related_post=instance.post)
\ No newline at end of file
+            Notification.objects.create(recipient_id=admin_user_id, message=message, related_post=instance.post)
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    """
+    Push new notifications to the recipient's open notification streams
+    once the surrounding transaction has committed.
+    """
+    if created:
+        payload = instance.as_dict()
+        transaction.on_commit(lambda: events.publish(instance.recipient_id, payload))
+
+@receiver(post_save, sender=Notification)
+def update_unread_cache(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: notification_cache.notification_created(instance))
+
+
+# --- POST STATUS EVENTS ---
+
+@receiver(post_save, sender=Post)
+def record_status_event(sender, instance, created, **kwargs):
+    """
+    Append a PostStatusEvent for the initial status and every status change,
+    in the same transaction as the save (Post.save is atomic).
+    """
+    post = instance
+    if not _is_status_transition(post, created):
+        return
+    actor = post._status_actor
+    PostStatusEvent.objects.create(
+        post_id=post.pk,
+        from_status='' if created else post._loaded_status,
+        to_status=post.status,
+        actor_id=actor.pk if actor else None
+    )
+
+
+# --- CLIENT POST COUNTERS ---
+
+@receiver(post_save, sender=Post)
+def update_post_counters(sender, instance, created, **kwargs):
+    """
+    Move the post between status counters when its status or client changes.
+    """
+    post = instance
+    if created:
+        ClientPostStats.objects.adjust(post.assigned_client_id, **{ClientPostStats.status_field(post.status): 1})
+        return
+
+    # Instances that were not loaded from the DB have no known previous state;
+    # leave those to `reconcile_counters` rather than double counting.
+    if post._loaded_status is None:
+        return
+    if post._loaded_status == post.status and post._loaded_client_id == post.assigned_client_id:
+        return
+
+    ClientPostStats.objects.adjust(post._loaded_client_id, **{ClientPostStats.status_field(post._loaded_status): -1})
+    ClientPostStats.objects.adjust(post.assigned_client_id, **{ClientPostStats.status_field(post.status): 1})
+
+@receiver(post_delete, sender=Post)
+def remove_post_counters(sender, instance, **kwargs):
+    status = instance._loaded_status or instance.status
+    client_id = instance._loaded_client_id or instance.assigned_client_id
+    ClientPostStats.objects.adjust(client_id, create=False, **{ClientPostStats.status_field(status): -1})
+
+@receiver(post_save, sender=Feedback)
+def update_feedback_counters(sender, instance, created, **kwargs):
+    if created:
+        ClientPostStats.objects.adjust(instance.post.assigned_client_id, feedback_count=1)
+
+@receiver(post_delete, sender=Feedback)
+def remove_feedback_counters(sender, instance, **kwargs):
+    ClientPostStats.objects.filter(client__posts=instance.post_id).update(
+        feedback_count=F('feedback_count') - 1,
+        updated_at=timezone.now()
+    )
+
+@receiver(post_save, sender=Rating)
+def update_rating_counters(sender, instance, created, **kwargs):
+    if created:
+        ClientPostStats.objects.adjust(
+            instance.post.assigned_client_id,
+            rating_sum=instance.score,
+            rating_count=1
+        )
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_counters(sender, instance, **kwargs):
+    ClientPostStats.objects.filter(client__posts=instance.post_id).update(
+        rating_sum=F('rating_sum') - instance.score,
+        rating_count=F('rating_count') - 1,
+        updated_at=timezone.now()
+    )
+
+
+# --- CLIENT DAILY ROLLUP ---
+
+@receiver(post_save, sender=Post)
+def update_daily_post_stats(sender, instance, created, **kwargs):
+    """
+    Count new posts on the day they were created, and status changes
+    (submitted, approved, rejected, published) on the day they happen.
+    """
+    post = instance
+    if not _is_status_transition(post, created):
+        return
+    deltas = {'posts_created': 1} if created else {}
+
+    transition_field = ClientDailyStats.TRANSITION_FIELDS.get(post.status)
+    if transition_field:
+        deltas[transition_field] = 1
+    ClientDailyStats.objects.adjust(post.assigned_client_id, timezone.localdate(), **deltas)
+
+@receiver(pre_delete, sender=Post)
+def remove_daily_post_stats(sender, instance, **kwargs):
+    """
+    Take a deleted post out of every day it was counted on: its creation and
+    each of its transitions, read from its status events before they cascade.
+    This is the same rule as `backfill_daily_stats`, which only sees the rows
+    that are left, so both give the same rollup.
+    """
+    post = instance
+    deltas = defaultdict(lambda: defaultdict(int))
+    deltas[timezone.localdate(post.created_at)]['posts_created'] -= 1
+
+    transitions = list(post.status_events.values_list('to_status', 'timestamp'))
+    if not transitions:
+        # Posts from before the event log count their current status on the day they were last updated.
+        transitions = [(post.status, post.updated_at)]
+    for status, timestamp in transitions:
+        field = ClientDailyStats.TRANSITION_FIELDS.get(status)
+        if field:
+            deltas[timezone.localdate(timestamp)][field] -= 1
+
+    client_id = post._loaded_client_id or post.assigned_client_id
+    for date, counters in deltas.items():
+        ClientDailyStats.objects.adjust(client_id, date, create=False, **counters)
+
+@receiver(post_save, sender=Feedback)
+def update_daily_feedback_stats(sender, instance, created, **kwargs):
+    if created:
+        ClientDailyStats.objects.adjust(
+            instance.post.assigned_client_id, timezone.localdate(instance.created_at), feedback_count=1
+        )
+
+@receiver(post_delete, sender=Feedback)
+def remove_daily_feedback_stats(sender, instance, **kwargs):
+    ClientDailyStats.objects.filter(
+        client__posts=instance.post_id, date=timezone.localdate(instance.created_at)
+    ).update(feedback_count=F('feedback_count') - 1, updated_at=timezone.now())
+
+@receiver(post_save, sender=Rating)
+def update_daily_rating_stats(sender, instance, created, **kwargs):
+    if created:
+        ClientDailyStats.objects.adjust(
+            instance.post.assigned_client_id,
+            timezone.localdate(instance.created_at),
+            rating_sum=instance.score,
+            rating_count=1
+        )
+
+@receiver(post_delete, sender=Rating)
+def remove_daily_rating_stats(sender, instance, **kwargs):
+    ClientDailyStats.objects.filter(
+        client__posts=instance.post_id, date=timezone.localdate(instance.created_at)
+    ).update(
+        rating_sum=F('rating_sum') - instance.score,
+        rating_count=F('rating_count') - 1,
+        updated_at=timezone.now()
+    )
+
+
+# --- CONTENT-ADDRESSED MEDIA ---
+
+def _delete_post_image(name):
+    content_storage.delete(name)
+    for size in RENDITIONS:
+        for fmt in FORMATS:
+            content_storage.delete(rendition_name(name, size, fmt))
+
+def _swap_blob_reference(old_name, new_name, delete_file):
+    """
+    Move one reference from `old_name` to `new_name`, deleting the old
+    file (after commit) once nothing refers to it.
+    """
+    if old_name == new_name:
+        return
+    if is_content_addressed(new_name):
+        StoredBlob.objects.retain(new_name)
+    if is_content_addressed(old_name) and StoredBlob.objects.release(old_name):
+        transaction.on_commit(lambda: StoredBlob.objects.collect(old_name, delete_file))
+
+@receiver(post_save, sender=Post)
+def track_post_image(sender, instance, created, **kwargs):
+    if not created and instance._loaded_image is None:
+        return
+    old_name = None if created else instance._loaded_image
+    _swap_blob_reference(old_name, instance.image.name, _delete_post_image)
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    _swap_blob_reference(instance.image.name, None, _delete_post_image)
+
+@receiver(post_save, sender=GeneratedReport)
+def track_report_file(sender, instance, created, **kwargs):
+    if not created and instance._loaded_file is None:
+        return
+    old_name = None if created else instance._loaded_file
+    _swap_blob_reference(old_name, instance.file.name, content_storage.delete)
+
+@receiver(post_delete, sender=GeneratedReport)
+def release_report_file(sender, instance, **kwargs):
+    _swap_blob_reference(instance.file.name, None, content_storage.delete)
+
+
+# --- CLIENT ASSIGNMENTS ---
+
+@receiver(m2m_changed, sender=ClientProfile.assigned_admins.through)
+def invalidate_client_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drops the cached client IDs of every admin whose assignments changed.
+    """
+    if reverse:
+        # admin.assigned_clients.add(...) and friends
+        admin_ids = {instance.pk}
+    elif action == 'pre_clear':
+        admin_ids = set(instance.assigned_admins.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        admin_ids = pk_set
+    else:
+        return
+    if admin_ids:
+        permissions.invalidate_assigned_clients(admin_ids)
+
+
+# --- CACHED USERS ---
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Profile, password and role changes all save the User row.
+    """
+    user_cache.invalidate_user(instance.pk)
+
+@receiver(post_save, sender=ClientProfile)
+@receiver(post_delete, sender=ClientProfile)
+def invalidate_cached_client_user(sender, instance, **kwargs):
+    # The cached user carries their client_profile.
+    user_cache.invalidate_user(instance.user_id)
+
+# --- REQUEST PROFILES ---
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_file(sender, instance, **kwargs):
+    """
+    Removes the .prof file once its RequestProfile is gone.
+    """
+    if instance.file:
+        transaction.on_commit(lambda: instance.file.storage.delete(instance.file.name))
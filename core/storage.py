@@ -0,0 +1,97 @@
+# core/storage.py
+
+"""
+Content-addressed media storage.
+
+Files are stored under their SHA-256, e.g. post_images/3f/3fa9...c1.jpg, so
+uploading the same bytes twice stores them once. References are counted in
+the StoredBlob table (see core/signals.py) and a blob is only deleted once
+nothing points at it any more.
+
+Files must be saved inside the transaction that adds their reference (the
+model saves do this). The blob row stays locked from the moment a file is
+found to already exist until that transaction commits, so a concurrent
+release can't delete a file that has just been reused.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# <upload dir>/<2 hex>/<64 hex>.<ext>
+CONTENT_NAME_RE = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}(\.[^/]*)?$')
+
+
+def is_content_addressed(name):
+    return bool(name and CONTENT_NAME_RE.search(name))
+
+
+def content_name(directory, digest, extension):
+    return os.path.join(directory, digest[:2], f"{digest}{extension.lower()}")
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names every file after the hash of its content.
+    The upload directory and extension of the requested name are kept.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content, so never add a random suffix.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1]
+
+        staging_dir = self.path(directory)
+        os.makedirs(staging_dir, exist_ok=True)
+
+        # Hash while streaming the upload to a temporary file in the same
+        # directory, so the final rename is atomic.
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=staging_dir, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            final_name = content_name(directory, digest.hexdigest(), extension).replace('\\', '/')
+            final_path = self.path(final_name)
+            # Imported here: core.models imports this module.
+            from .models import StoredBlob
+            StoredBlob.objects.lock(final_name)
+            if os.path.exists(final_path):
+                # Same bytes already stored; keep the existing blob.
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return final_name
+
+
+content_storage = ContentAddressedStorage()
+
+
+def profile_storage():
+    """
+    Storage for request profiles (core/profiling.py). It sits next to
+    MEDIA_ROOT rather than inside it, so profiles are never served publicly.
+    """
+    return FileSystemStorage(location=settings.PROFILE_ROOT)
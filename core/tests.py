@@ -1,3 +1,847 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, DatabaseError, OperationalError
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core import events, metrics, notification_cache, profiling
+from core.audit import AuditLogBuffer
+from core.instrumentation import RequestStatsMiddleware
+from core.replica import read_from_replica, ReadYourWritesMiddleware, PIN_COOKIE
+from core.benchmark import run_benchmark, compare
+from core.pagination import KeysetPaginator
+from core.permissions import can_access_client
+from core.models import Notification, AuditLog, RequestProfile, StoredBlob
+from core.storage import content_storage, is_content_addressed
+from core.user_cache import CachedModelBackend
+from posts.models import Post, PostRequest
+from users.models import User, ClientProfile
+
+
+@override_settings(AUDIT_LOG_SYNC=True, IMAGE_RENDITIONS_ON_UPLOAD=False)
+class PostSignalTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pass', role=User.Role.ADMIN)
+        client_user = User.objects.create_user('client', password='pass', role=User.Role.CLIENT)
+        self.client_profile = ClientProfile.objects.create(user=client_user, company_name='Acme')
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                title='Launch', caption='Caption', image='post_images/sale.jpg',
+                created_by=self.admin, assigned_client=self.client_profile,
+                status=Post.Status.DRAFT
+            )
+        # Reload so the relations are not cached, like a post fetched in a view
+        self.post = Post.objects.get(title='Launch')
+
+    def test_status_change_costs_bounded_queries(self):
+        self.post.status = Post.Status.PENDING
+        # UPDATE post, INSERT status event, two counter updates and one daily
+        # rollup update (each in a savepoint), INSERT audit log (AUDIT_LOG_SYNC),
+        # INSERT notification, all inside the save's own savepoint. No lazy loads
+        # of created_by or the client's user.
+        with self.assertNumQueries(15):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.save()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient_id, self.client_profile.user_id)
+        self.assertEqual(notification.related_post, self.post)
+
+    def test_save_without_status_change_does_nothing(self):
+        audit_count = AuditLog.objects.count()
+        self.post.caption = 'New caption'
+        # Only the UPDATE itself, in the save's savepoint
+        with self.assertNumQueries(3):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.post.save()
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(AuditLog.objects.count(), audit_count)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_save_of_an_instance_not_loaded_from_the_database_does_nothing(self):
+        audit_count = AuditLog.objects.count()
+        post = Post(pk=self.post.pk, status=Post.Status.PENDING)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            post.save(update_fields=['status'])
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(AuditLog.objects.count(), audit_count)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_each_transition_notifies_once(self):
+        for status in [Post.Status.PENDING, Post.Status.PENDING, Post.Status.APPROVED]:
+            self.post.status = status
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.save()
+
+        self.assertEqual(
+            list(Notification.objects.order_by('id').values_list('recipient_id', flat=True)),
+            [self.client_profile.user_id, self.admin.id]
+        )
+
+
+class BenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_scale', admins=2, clients=3, posts=60, requests_per_client=2,
+            notifications=20, audit_logs=20, seed=1, stdout=io.StringIO()
+        )
+
+    def test_every_page_renders_for_every_role(self):
+        results = run_benchmark(iterations=1, warmup=0)
+
+        self.assertEqual({key.split()[0] for key in results}, {'super_admin', 'admin', 'client'})
+        errors = [key for key, result in results.items() if result['status'] >= 500]
+        self.assertEqual(errors, [])
+
+    def test_compare_flags_extra_queries(self):
+        results = run_benchmark(iterations=1, warmup=0, roles=['admin'])
+        self.assertEqual(compare(results, results), [])
+
+        key = 'admin posts:post_list'
+        baseline = {key: dict(results[key], queries=results[key]['queries'] - 1)}
+        self.assertEqual(len(compare(results, baseline)), 1)
+
+
+class MetricsTests(TestCase):
+
+    def test_scrape_adds_up_every_process(self):
+        key = json.dumps(['core:dashboard', 'ADMIN', '200'])
+        with tempfile.TemporaryDirectory() as directory:
+            for pid, count in [(1, 2), (2, 3)]:
+                with open(os.path.join(directory, f'{pid}-test.json'), 'w') as f:
+                    json.dump({'posttrack_requests_total': {key: count}}, f)
+            with self.settings(METRICS_DIR=directory):
+                output = metrics.registry.render()
+
+        self.assertIn('posttrack_requests_total{view="core:dashboard",role="ADMIN",status="200"} 5', output)
+        self.assertIn('# TYPE posttrack_request_duration_seconds histogram', output)
+        self.assertIn('posttrack_scheduler_overdue_posts 0', output)
+
+    def test_metrics_need_super_admin_or_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posttrack_notifications_unread 0', response.content.decode())
+
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        self.super_admin = User.objects.create_user('super', password='pass', role=User.Role.SUPER_ADMIN)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = RequestProfile._meta.get_field('file').storage
+        patcher = mock.patch.object(storage, 'location', directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_signed_header_profiles_the_request(self):
+        self.client.force_login(self.super_admin)
+        self.client.get('/dashboard/', HTTP_X_PROFILE_TOKEN='forged')
+        self.assertFalse(RequestProfile.objects.exists())
+
+        self.client.get('/dashboard/', HTTP_X_PROFILE_TOKEN=profiling.profile_token())
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.view_name, 'core:dashboard')
+        self.assertEqual(profile.trigger, RequestProfile.Trigger.HEADER)
+
+        response = self.client.get(f'/profiles/{profile.id}/')
+        self.assertContains(response, 'dashboard_view')
+
+    def test_only_newest_profiles_are_kept(self):
+        with self.settings(PROFILING_MAX_PROFILES=1, PROFILING_SAMPLE_EVERY=1, PROFILING_MIN_DURATION=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get('/admin-login/')
+                self.client.get('/register/')
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.view_name, 'core:client_register')
+        storage = profile.file.storage
+        self.assertEqual(storage.listdir('requests')[1], [profile.file.name.rsplit('/', 1)[-1]])
+
+    def test_request_is_served_when_the_profiler_cannot_start(self):
+        self.client.force_login(self.super_admin)
+        error = ValueError("Another profiling tool is already active")
+        with mock.patch.object(profiling.cProfile.Profile, 'enable', side_effect=error):
+            response = self.client.get('/dashboard/', HTTP_X_PROFILE_TOKEN=profiling.profile_token())
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(RequestProfile.objects.exists())
+
+        with profiling._profiler_lock:
+            response = self.client.get('/dashboard/', HTTP_X_PROFILE_TOKEN=profiling.profile_token())
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(RequestProfile.objects.exists())
+
+
+@override_settings(USER_CACHE_TIMEOUT=60, AUDIT_LOG_SYNC=True)
+class CachedUserTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('client', password='pass', role=User.Role.CLIENT)
+        self.client_profile = ClientProfile.objects.create(user=self.user, company_name='Acme')
+
+    def test_cached_user_costs_no_queries(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+
+        with self.assertNumQueries(0):
+            user = backend.get_user(self.user.pk)
+            self.assertEqual(user.role, User.Role.CLIENT)
+            self.assertEqual(user.client_profile.company_name, 'Acme')
+
+    def test_saving_the_profile_refreshes_the_cached_user(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+
+        self.client_profile.company_name = 'Acme Ltd'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_profile.save()
+        self.assertEqual(backend.get_user(self.user.pk).client_profile.company_name, 'Acme Ltd')
+
+        self.user.role = User.Role.ADMIN
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(backend.get_user(self.user.pk).role, User.Role.ADMIN)
+
+    def test_sessions_from_before_the_cached_backend_stay_signed_in(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get('/client/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_new_logins_use_the_cached_backend(self):
+        self.client.login(username='client', password='pass')
+        self.assertEqual(
+            self.client.session['_auth_user_backend'], 'core.user_cache.CachedModelBackend'
+        )
+
+
+@override_settings(CLIENT_PERMISSION_CACHE_TIMEOUT=60, AUDIT_LOG_SYNC=True)
+class ClientPermissionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.super_admin = User.objects.create_user('super', password='pass', role=User.Role.SUPER_ADMIN)
+        self.admin = User.objects.create_user('admin', password='pass', role=User.Role.ADMIN)
+        self.acme = ClientProfile.objects.create(
+            user=User.objects.create_user('acme', password='pass', role=User.Role.CLIENT), company_name='Acme'
+        )
+        self.globex = ClientProfile.objects.create(
+            user=User.objects.create_user('globex', password='pass', role=User.Role.CLIENT), company_name='Globex'
+        )
+        self.acme.assigned_admins.add(self.admin)
+
+    def test_checks_in_one_request_share_one_load(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(can_access_client(self.admin, self.acme.pk))
+            self.assertFalse(can_access_client(self.admin, self.globex.pk))
+            self.assertTrue(can_access_client(self.admin, self.acme.pk))
+
+    def test_later_requests_read_the_cache(self):
+        can_access_client(self.admin, self.acme.pk)
+
+        # A fresh user object, as the next request would load
+        admin = User.objects.get(pk=self.admin.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(can_access_client(admin, self.acme.pk))
+            self.assertFalse(can_access_client(admin, self.globex.pk))
+
+    def test_reassigning_clients_invalidates_the_cache(self):
+        self.assertFalse(can_access_client(self.admin, self.globex.pk))
+
+        self.client.force_login(self.super_admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/client-assignments/', {'client_id': self.globex.pk, 'admin_ids': [self.admin.pk]})
+
+        admin = User.objects.get(pk=self.admin.pk)
+        self.assertTrue(can_access_client(admin, self.globex.pk))
+        self.assertTrue(can_access_client(admin, self.acme.pk))
+
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class ContentAddressedMediaTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        # Rendering needs real images and the process pool; not under test here
+        patcher = mock.patch('core.signals.generate_renditions')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.admin = User.objects.create_user('admin', password='pass', role=User.Role.ADMIN)
+        client_user = User.objects.create_user('client', password='pass', role=User.Role.CLIENT)
+        self.client_profile = ClientProfile.objects.create(user=client_user, company_name='Acme')
+
+    def create_post(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                title='Launch', caption='Caption', image=image,
+                created_by=self.admin, assigned_client=self.client_profile
+            )
+        return Post.objects.get(pk=post.pk)
+
+    def upload(self, content):
+        return ContentFile(content, name='photo.jpg')
+
+    def ref_count(self, name):
+        return StoredBlob.objects.filter(name=name).values_list('ref_count', flat=True).first()
+
+    def test_identical_uploads_share_one_file_until_the_last_reference_goes(self):
+        first = self.create_post(self.upload(b'same bytes'))
+        second = self.create_post(self.upload(b'same bytes'))
+        name = first.image.name
+        self.assertTrue(is_content_addressed(name))
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(self.ref_count(name), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(self.ref_count(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(content_storage.exists(name))
+        self.assertIsNone(self.ref_count(name))
+
+    def test_replacing_an_image_releases_the_old_file(self):
+        post = self.create_post(self.upload(b'old bytes'))
+        old_name = post.image.name
+
+        post.image = self.upload(b'new bytes')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+
+        self.assertFalse(content_storage.exists(old_name))
+        self.assertTrue(content_storage.exists(post.image.name))
+        self.assertEqual(self.ref_count(post.image.name), 1)
+
+    def test_file_reused_before_the_release_runs_is_kept(self):
+        post = self.create_post(self.upload(b'same bytes'))
+        name = post.image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.delete()
+
+        # The same bytes are uploaded again before the delete callback runs
+        self.create_post(self.upload(b'same bytes'))
+        for callback in callbacks:
+            callback()
+
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(self.ref_count(name), 1)
+
+    def write_legacy_file(self, name, content):
+        path = content_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def test_dedupe_media_moves_and_merges_legacy_files(self):
+        self.write_legacy_file('post_images/a.jpg', b'same bytes')
+        self.write_legacy_file('post_images/b.jpg', b'same bytes')
+        first, second = self.create_post('post_images/a.jpg'), self.create_post('post_images/b.jpg')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dedupe_media', stdout=io.StringIO())
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(is_content_addressed(first.image.name))
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertTrue(content_storage.exists(first.image.name))
+        self.assertFalse(content_storage.exists('post_images/a.jpg'))
+        self.assertFalse(content_storage.exists('post_images/b.jpg'))
+        self.assertEqual(self.ref_count(first.image.name), 2)
+
+    def test_dedupe_media_keeps_the_old_file_when_the_update_fails(self):
+        self.write_legacy_file('post_images/a.jpg', b'legacy bytes')
+        post = self.create_post('post_images/a.jpg')
+
+        with mock.patch.object(Post.objects, 'filter', side_effect=DatabaseError("database is locked")):
+            with self.assertRaises(DatabaseError):
+                call_command('dedupe_media', stdout=io.StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, 'post_images/a.jpg')
+        self.assertTrue(content_storage.exists('post_images/a.jpg'))
+        stored = [name for _, _, names in os.walk(content_storage.location) for name in names]
+        self.assertEqual(stored, ['a.jpg'])
+        self.assertFalse(StoredBlob.objects.exists())
+
+
+@override_settings(AUDIT_LOG_SYNC=False, AUDIT_LOG_BATCH_SIZE=2)
+class AuditLogBufferTests(TestCase):
+
+    def setUp(self):
+        # The writer thread would flush on its own connection; tests flush by hand
+        patcher = mock.patch.object(AuditLogBuffer, '_run')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = AuditLogBuffer()
+
+    def entry(self, action='post_edit'):
+        return AuditLog(action=action, details='Edited a post.')
+
+    def test_full_batch_wakes_the_writer(self):
+        with mock.patch('core.audit.atexit.register'):
+            self.buffer.add(self.entry())
+            self.assertFalse(self.buffer._wakeup.is_set())
+            self.buffer.add(self.entry())
+        self.assertTrue(self.buffer._wakeup.is_set())
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    def test_queued_entries_are_written_at_exit(self):
+        with mock.patch('core.audit.atexit.register') as register:
+            self.buffer.add(self.entry())
+            self.buffer.add(self.entry('user_login'))
+            self.buffer.add(self.entry('post_delete'))
+        register.assert_called_once_with(self.buffer.flush)
+
+        exit_hook = register.call_args.args[0]
+        self.assertEqual(exit_hook(), 3)
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_failed_batch_is_saved_row_by_row(self):
+        self.buffer._entries = [self.entry(), self.entry(action=None), self.entry('user_login')]
+
+        with self.assertLogs('core.audit', 'ERROR') as logs:
+            self.assertEqual(self.buffer.flush(), 2)
+
+        self.assertEqual(sorted(AuditLog.objects.values_list('action', flat=True)), ['post_edit', 'user_login'])
+        self.assertIn('Dropped audit log entry None', '\n'.join(logs.output))
+        self.assertEqual(self.buffer._entries, [])
+
+    def test_entries_are_requeued_while_the_database_is_unavailable(self):
+        self.buffer._entries = [self.entry(), self.entry('user_login')]
+
+        locked = OperationalError("database is locked")
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=locked), \
+                mock.patch.object(AuditLog, 'save', side_effect=locked), self.assertLogs('core.audit', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer._entries), 2)
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    @override_settings(AUDIT_LOG_MAX_RETRIES=2)
+    def test_entries_are_dropped_after_too_many_retries(self):
+        self.buffer._entries = [self.entry(), self.entry('user_login')]
+
+        locked = OperationalError("database is locked")
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=locked), \
+                mock.patch.object(AuditLog, 'save', side_effect=locked), self.assertLogs('core.audit', 'ERROR') as logs:
+            for _ in range(3):
+                self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(self.buffer._entries, [])
+        self.assertIn('dropped 2 audit log entries after 2 retries', logs.output[-1])
+
+    def test_other_database_errors_are_not_retried(self):
+        self.buffer._entries = [self.entry()]
+
+        missing = OperationalError("no such table: core_auditlog")
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=missing), \
+                mock.patch.object(AuditLog, 'save', side_effect=missing), self.assertLogs('core.audit', 'ERROR') as logs:
+            self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(self.buffer._entries, [])
+        self.assertIn("Dropped audit log entry 'post_edit'", '\n'.join(logs.output))
+
+
+@override_settings(
+    INSTRUMENTATION_SAMPLE_RATE=1.0, INSTRUMENTATION_N_PLUS_ONE_THRESHOLD=3,
+    INSTRUMENTATION_HEADER=True, INSTRUMENTATION_TRACE_MEMORY=False
+)
+class RequestStatsTests(TestCase):
+
+    def view(self, request):
+        # One query per user: the N+1 shape the middleware should flag
+        for user_id in range(3):
+            list(User.objects.filter(pk=user_id))
+        list(ClientProfile.objects.all())
+        return HttpResponse('ok')
+
+    def test_repeated_query_shape_is_flagged_and_logged(self):
+        middleware = RequestStatsMiddleware(self.view)
+
+        with self.assertLogs('posttrack.requests', 'INFO') as records, \
+                self.assertLogs('core.instrumentation', 'WARNING') as warnings:
+            response = middleware(RequestFactory().get('/dashboard/'))
+
+        entry = json.loads(records.records[0].getMessage())
+        self.assertEqual(entry['path'], '/dashboard/')
+        self.assertEqual(entry['queries'], 4)
+        self.assertIsNone(entry['peak_kb'])
+        self.assertEqual([item['count'] for item in entry['n_plus_one']], [3])
+        self.assertIn('users_user', entry['n_plus_one'][0]['sql'])
+        self.assertIn('Possible N+1 in /dashboard/', warnings.output[0])
+        self.assertEqual(response['X-N-Plus-One'], '1')
+
+    def test_memory_is_traced_only_when_enabled(self):
+        middleware = RequestStatsMiddleware(self.view)
+
+        with self.settings(INSTRUMENTATION_TRACE_MEMORY=True), \
+                self.assertLogs('posttrack.requests', 'INFO') as records, \
+                self.assertLogs('core.instrumentation', 'WARNING'):
+            middleware(RequestFactory().get('/dashboard/'))
+
+        self.assertIsNotNone(json.loads(records.records[0].getMessage())['peak_kb'])
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+@override_settings(REPLICA_ENABLED=True, REPLICA_MAX_LAG=300, REPLICA_PIN_SECONDS=60)
+class ReplicaTests(TestCase):
+
+    def setUp(self):
+        snapshot = tempfile.NamedTemporaryFile(suffix='.sqlite3')
+        self.addCleanup(snapshot.close)
+        self.snapshot_path = snapshot.name
+        replica_path = override_settings(SQLITE_REPLICA_PATH=snapshot.name)
+        replica_path.enable()
+        self.addCleanup(replica_path.disable)
+
+    @staticmethod
+    @read_from_replica
+    def view(request):
+        # The alias this view's queries are sent to
+        return HttpResponse(Post.objects.all().db)
+
+    def read_alias(self, request):
+        return self.view(request).content.decode()
+
+    def test_get_reads_from_the_replica(self):
+        self.assertEqual(self.read_alias(RequestFactory().get('/dashboard/')), 'replica')
+
+    def test_post_reads_from_the_primary(self):
+        self.assertEqual(self.read_alias(RequestFactory().post('/dashboard/')), 'default')
+
+    def test_pinned_browser_reads_from_the_primary(self):
+        request = RequestFactory().get('/dashboard/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.read_alias(request), 'default')
+
+    def test_stale_snapshot_falls_back_to_the_primary(self):
+        ten_minutes_ago = time.time() - 600
+        os.utime(self.snapshot_path, (ten_minutes_ago, ten_minutes_ago))
+        self.assertEqual(self.read_alias(RequestFactory().get('/dashboard/')), 'default')
+
+        os.remove(self.snapshot_path)
+        self.assertEqual(self.read_alias(RequestFactory().get('/dashboard/')), 'default')
+        # Recreate it so the temp file's own cleanup succeeds
+        open(self.snapshot_path, 'wb').close()
+
+    def test_writes_pin_the_browser_to_the_primary(self):
+        middleware = ReadYourWritesMiddleware(lambda request: HttpResponse())
+
+        self.assertNotIn(PIN_COOKIE, middleware(RequestFactory().get('/dashboard/')).cookies)
+        cookie = middleware(RequestFactory().post('/dashboard/')).cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 60)
+
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class NotificationStreamTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('client', password='pass', role=User.Role.CLIENT)
+        self.addCleanup(events._subscribers.pop, self.user.pk, None)
+
+    def test_wsgi_requests_fall_back_to_polling(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/notifications/stream/').status_code, 204)
+
+    def test_new_notification_is_published_after_commit(self):
+        with mock.patch.object(events, 'publish') as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                notification = Notification.objects.create(recipient=self.user, message='Post approved')
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        publish.assert_called_once_with(self.user.pk, notification.as_dict())
+
+    async def test_stream_pushes_published_notifications(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/notifications/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        # Published from another thread, as a sync view's on_commit hook would
+        await asyncio.to_thread(events.publish, self.user.pk, {'id': 1, 'message': 'Post approved'})
+        self.assertEqual(
+            await asyncio.wait_for(anext(stream), timeout=5),
+            b'event: notification\ndata: {"id": 1, "message": "Post approved"}\n\n'
+        )
+
+    async def test_full_queue_drops_events_instead_of_growing(self):
+        queue = events.subscribe(self.user.pk)
+        for n in range(events.QUEUE_SIZE + 10):
+            events.publish(self.user.pk, {'id': n})
+        await asyncio.sleep(0)
+
+        self.assertEqual(queue.qsize(), events.QUEUE_SIZE)
+        events.unsubscribe(self.user.pk, queue)
+        self.assertNotIn(self.user.pk, events._subscribers)
+
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class NotificationCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('client', password='pass', role=User.Role.CLIENT)
+
+    def notify(self, message):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(recipient=self.user, message=message)
+
+    def test_summary_is_built_once_then_served_from_cache(self):
+        self.notify('Post approved')
+
+        with self.assertNumQueries(2):
+            summary = notification_cache.get_unread_summary(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(notification_cache.get_unread_summary(self.user.pk), summary)
+        self.assertEqual(summary['count'], 1)
+
+    def test_new_notifications_invalidate_the_cached_summary(self):
+        notification_cache.get_unread_summary(self.user.pk)
+        for n in range(notification_cache.LATEST_LIMIT + 1):
+            self.notify(f'Update {n}')
+
+        with self.assertNumQueries(2):
+            summary = notification_cache.get_unread_summary(self.user.pk)
+        self.assertEqual(summary['count'], notification_cache.LATEST_LIMIT + 1)
+        self.assertEqual(
+            [item['message'] for item in summary['notifications']],
+            [f'Update {n}' for n in range(notification_cache.LATEST_LIMIT, 0, -1)]
+        )
+
+    def test_rebuild_racing_a_new_notification_is_not_served(self):
+        build = notification_cache._build
+
+        def build_then_notify(user_id):
+            summary = build(user_id)
+            self.notify('Arrived mid-rebuild')
+            return summary
+
+        with mock.patch.object(notification_cache, '_build', side_effect=build_then_notify):
+            stale = notification_cache.get_unread_summary(self.user.pk)
+        self.assertEqual(stale['count'], 0)
+
+        summary = notification_cache.get_unread_summary(self.user.pk)
+        self.assertEqual(summary['count'], 1)
+        self.assertEqual([item['message'] for item in summary['notifications']], ['Arrived mid-rebuild'])
+
+    def test_reading_a_notification_invalidates_the_cached_entries(self):
+        first = self.notify('Post approved')
+        self.notify('Post published')
+        notification_cache.get_unread_summary(self.user.pk)
+
+        self.client.force_login(self.user)
+        self.client.get(f'/notifications/read/{first.pk}/')
+
+        summary = self.client.get('/notifications/get-unread/').json()
+        self.assertEqual(summary['count'], 1)
+        self.assertEqual([item['message'] for item in summary['notifications']], ['Post published'])
+
+
+@override_settings(AUDIT_LOG_SYNC=True, IMAGE_RENDITIONS_ON_UPLOAD=False)
+class CalendarFeedTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pass', role=User.Role.ADMIN)
+        self.client_user = User.objects.create_user('client', password='pass', role=User.Role.CLIENT)
+        client_profile = ClientProfile.objects.create(user=self.client_user, company_name='Acme')
+        client_profile.assigned_admins.add(self.admin)
+        day = datetime.datetime(2026, 3, 10, 9, 0, tzinfo=datetime.timezone.utc)
+        for title, status, scheduled in [
+            ('Launch', Post.Status.APPROVED, day),
+            ('Teaser', Post.Status.DRAFT, day + datetime.timedelta(days=1)),
+            ('Next month', Post.Status.APPROVED, day + datetime.timedelta(days=40)),
+        ]:
+            with self.captureOnCommitCallbacks(execute=True):
+                Post.objects.create(
+                    title=title, caption='Caption', image='post_images/sale.jpg', status=status,
+                    created_by=self.admin, assigned_client=client_profile, scheduled_datetime=scheduled
+                )
+        self.url = '/calendar/events/?start=2026-03-01&end=2026-04-01'
+
+    def test_feed_covers_only_the_window_and_what_the_user_may_see(self):
+        self.client.force_login(self.admin)
+        events = self.client.get(self.url).json()
+        self.assertEqual([event['title'] for event in events], ['Launch', 'Teaser'])
+        self.assertTrue(events[0]['url'].endswith(f"/{events[0]['id']}/"))
+
+        self.client.force_login(self.client_user)
+        events = self.client.get(self.url).json()
+        self.assertEqual([event['title'] for event in events], ['Launch'])
+        self.assertNotIn('url', events[0])
+
+    def test_missing_or_oversized_window_is_rejected(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/calendar/events/').status_code, 400)
+        self.assertEqual(self.client.get('/calendar/events/?start=2026-01-01&end=2028-01-01').status_code, 400)
+
+    def test_unchanged_window_answers_not_modified(self):
+        self.client.force_login(self.admin)
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        post = Post.objects.get(title='Launch')
+        post.title = 'Launch day'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.get(title='Teaser').delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_differs_per_user(self):
+        self.client.force_login(self.admin)
+        admin_etag = self.client.get(self.url)['ETag']
+
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=admin_etag).status_code, 200)
+
+
+class KeysetPaginatorTests(TestCase):
+
+    def setUp(self):
+        client_user = User.objects.create_user('client', password='pass', role=User.Role.CLIENT)
+        client_profile = ClientProfile.objects.create(user=client_user, company_name='Acme')
+        start = datetime.datetime(2026, 3, 1, tzinfo=datetime.timezone.utc)
+        # Pairs of requests share a created_at, so the id has to break ties
+        for n in range(7):
+            PostRequest.objects.create(
+                client=client_profile, request_details=f'Request {n}',
+                created_at=start + datetime.timedelta(hours=n // 2)
+            )
+        self.requests = PostRequest.objects.all()
+        self.expected = list(self.requests.order_by('-created_at', '-id'))
+
+    def paginator(self, ordering=('-created_at', '-id')):
+        return KeysetPaginator(self.requests, ordering, per_page=3)
+
+    def test_next_cursors_walk_every_row_once_in_order(self):
+        paginator = self.paginator()
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([row for page in pages for row in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_previous_cursors_walk_back_to_the_first_page(self):
+        paginator = self.paginator()
+        first = paginator.get_page()
+        last = paginator.get_page(paginator.get_page(first.next_cursor).next_cursor)
+
+        middle = paginator.get_page(last.previous_cursor)
+        self.assertEqual(list(middle), self.expected[3:6])
+        self.assertTrue(middle.has_next())
+        back_to_first = paginator.get_page(middle.previous_cursor)
+        self.assertEqual(list(back_to_first), self.expected[:3])
+        self.assertFalse(back_to_first.has_previous())
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        paginator = self.paginator()
+        first = paginator.get_page()
+        PostRequest.objects.create(client=self.expected[0].client, request_details='Newest')
+
+        self.assertEqual(list(paginator.get_page(first.next_cursor)), self.expected[3:6])
+
+    def test_ascending_ordering(self):
+        paginator = self.paginator(('created_at', 'id'))
+        second = paginator.get_page(paginator.get_page().next_cursor)
+        self.assertEqual(list(second), list(reversed(self.expected))[3:6])
+
+    def test_unreadable_cursor_starts_at_the_first_page(self):
+        for cursor in ['garbage', 'eyJkIjoibmV4dCJ9', 'eyJkIjoibmV4dCIsImsiOlsieCIsMV19']:
+            self.assertEqual(list(self.paginator().get_page(cursor)), self.expected[:3])
+
+    def test_page_queries_use_no_count(self):
+        with self.assertNumQueries(1):
+            page = self.paginator().get_page()
+        self.assertTrue(page.has_other_pages())
+
+
+class SQLiteSettingsTests(TestCase):
+
+    def manage(self, code, **env):
+        # A fresh process, as a developer would run it, not the test runner
+        environ = {key: value for key, value in os.environ.items() if key != 'SQLITE_JOURNAL_MODE'}
+        result = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'shell', '--no-imports', '-c', code],
+            env={**environ, **env}, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+
+    def test_connections_apply_the_pragma_profile(self):
+        synchronous = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(synchronous[cursor.fetchone()[0]], settings.SQLITE_PRAGMAS['synchronous'])
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_manage_py_runs_in_wal_mode_unless_opted_out(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        code = "from django.db import connection; connection.ensure_connection()"
+
+        wal = os.path.join(directory.name, 'wal.sqlite3')
+        self.manage(code, SQLITE_PATH=wal)
+        with closing(sqlite3.connect(wal)) as db:
+            self.assertEqual(db.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+
+        # A development checkout keeps its committed database in rollback-journal mode
+        rollback = os.path.join(directory.name, 'rollback.sqlite3')
+        self.manage(code, SQLITE_PATH=rollback, SQLITE_JOURNAL_MODE='DELETE')
+        with closing(sqlite3.connect(rollback)) as db:
+            self.assertEqual(db.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+        self.assertNotIn('rollback.sqlite3-wal', os.listdir(directory.name))
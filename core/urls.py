@@ -52,13 +52,20 @@ urlpatterns = [
     path('client/logout/', auth_views.LogoutView.as_view(next_page='core:client_login'), name='client_logout'),    
     
     
-    path('admin-calendar/', views.admin_calendar_view, name='admin_calendar'),    
+    path('admin-calendar/', views.admin_calendar_view, name='admin_calendar'),
+    path('calendar/events/', views.calendar_events_view, name='calendar_events'),    
     path('reports/rejection/', views.rejection_report_view, name='report_rejection'),
     path('reports/activity/', views.client_activity_report_view, name='report_activity'),
     
     # --- NOTIFICATION URLS ---
     path('notifications/get-unread/', views.get_unread_notifications, name='get_unread'),
+    path('notifications/stream/', views.notification_stream_view, name='notification_stream'),
     path('notifications/read/<int:notif_id>/', views.mark_notification_as_read, name='mark_as_read'),
+
+    # --- MONITORING ---
+    path('metrics', views.metrics_view, name='metrics'),
+    path('profiles/', views.request_profiles_view, name='request_profiles'),
+    path('profiles/<int:profile_id>/', views.request_profile_detail_view, name='request_profile_detail'),
     
     path('client/calendar/', views.client_calendar_view, name='client_calendar'),
     
@@ -0,0 +1,62 @@
+# core/user_cache.py
+
+"""
+Cached lookup of the signed-in user.
+
+AuthenticationMiddleware loads the user through the session's backend on
+every request. CachedModelBackend answers that from Django's cache: the
+User row, with its client_profile already attached, is kept for
+USER_CACHE_TIMEOUT seconds. Together with the cached_db session engine an
+authenticated request runs no queries before its view. Entries are dropped
+when the user or their client profile is saved or deleted (see
+core/signals.py), which covers profile, password and role changes.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import User
+
+
+def _cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def load_user(user_id):
+    """
+    The user with their client_profile (or its absence) loaded, or None.
+    """
+    timeout = settings.USER_CACHE_TIMEOUT
+    if timeout:
+        user = cache.get(_cache_key(user_id))
+        if user is not None:
+            return user
+    try:
+        user = User._default_manager.select_related('client_profile').get(pk=user_id)
+    except User.DoesNotExist:
+        return None
+    if timeout:
+        cache.set(_cache_key(user_id), user, timeout)
+    return user
+
+
+def invalidate_user(user_id):
+    """
+    Drops the cached user now and again once the current transaction
+    commits, so a request that read the old row meanwhile can't keep it cached.
+    """
+    key = _cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose per-request user lookup goes through the cache.
+    """
+
+    def get_user(self, user_id):
+        user = load_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -1,10 +1,10 @@
 # core/views.py
 
 # Standard library imports
-import json
-import csv
-import io
+import asyncio
 import datetime
+import hashlib
+import json
 
 # Django imports
 from django.shortcuts import render, redirect, get_object_or_404
@@ -12,24 +12,35 @@ from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.core.files.base import ContentFile
-from django.core.paginator import Paginator
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import condition
 
 # App-specific model imports
 from users.models import User, ClientProfile
-from posts.models import Post, Feedback, Rating
+from posts.models import Post, PostStatusEvent, Feedback, Rating, ClientPostStats, ClientDailyStats
+from posts import analytics
 from reports.models import GeneratedReport
+from reports import builders as report_builders, jobs as report_jobs
 from core.models import *
 from posts.models import *
 
 # Import for complex queries
-from django.db.models import Q, Count, F, Avg
+from django.db.models import Q, Count, F, Avg, Max
+
+from . import events, notification_cache
+from .pagination import KeysetPaginator
+from .replica import read_from_replica
+from . import metrics, profiling
 
 # Forms
-from .forms import ClientRegistrationForm, ClientProfileUpdateForm, ClientPasswordChangeForm
+from .forms import ClientRegistrationForm, ClientProfileUpdateForm, ClientPasswordChangeForm, DateRangeForm
 
 # --- ADMIN & SUPER ADMIN VIEWS ---
 
@@ -123,6 +134,7 @@ def change_password_view(request):
     return redirect('core:profile')
 
 @user_passes_test(is_admin_or_superadmin, login_url='core:login_admin')
+@read_from_replica
 def dashboard_view(request):
     """
     Dashboard view for Admin and Super Admin users.
@@ -130,50 +142,34 @@ def dashboard_view(request):
     Super Admin: sees overall platform metrics.
     """
 
-    # Auto-update approved posts that reached their scheduled time
-    Post.objects.filter(
-        status=Post.Status.APPROVED, 
-        scheduled_datetime__lte=timezone.now()
-    ).update(status=Post.Status.PUBLISHED)
-
     user = request.user
 
-    # Base query: depends on role
-    if user.role == User.Role.SUPER_ADMIN:
-        all_posts = Post.objects.all()
-        recent_feedback = Feedback.objects.all().order_by('-created_at')[:5]
-    else:
-        admin_clients = ClientProfile.objects.filter(assigned_admins=user)
-        all_posts = Post.objects.filter(assigned_client__in=admin_clients)
-        recent_feedback = Feedback.objects.filter(
-            post__in=all_posts
-        ).order_by('-created_at')[:5]
-
-    # Basic counts
-    pending_count = all_posts.filter(status=Post.Status.PENDING).count()
-    rejected_count = all_posts.filter(status=Post.Status.REJECTED).count()
-    approved_count = all_posts.filter(status=Post.Status.APPROVED).count()
-    published_count = all_posts.filter(status=Post.Status.PUBLISHED).count()
-    draft_count = all_posts.filter(status=Post.Status.DRAFT).count()
+    # Base query: scoped to the user's role
+    all_posts = Post.objects.visible_to(user)
+    client_stats = ClientPostStats.objects.visible_to(user)
+    recent_feedback = Feedback.objects.visible_to(user).for_list().order_by('-created_at')[:5]
+
+    # Basic counts (summed from the per-client counters)
+    status_counts = client_stats.status_counts()
 
     context = {
-        'pending_count': pending_count,
-        'rejected_count': rejected_count,
-        'approved_count': approved_count,
-        'published_count': published_count,
-        'draft_count': draft_count,
+        'pending_count': status_counts[Post.Status.PENDING],
+        'rejected_count': status_counts[Post.Status.REJECTED],
+        'approved_count': status_counts[Post.Status.APPROVED],
+        'published_count': status_counts[Post.Status.PUBLISHED],
+        'draft_count': status_counts[Post.Status.DRAFT],
         'recent_feedback': recent_feedback,
     }
 
     # Role-based extras
     if user.role == User.Role.ADMIN:
-        context['rejected_posts'] = all_posts.filter(
+        context['rejected_posts'] = all_posts.for_list().filter(
             status=Post.Status.REJECTED
         ).prefetch_related('feedback')
 
     elif user.role == User.Role.SUPER_ADMIN:
         context.update({
-            'total_posts': Post.objects.count(),
+            'total_posts': status_counts['ALL'],
             'total_clients': ClientProfile.objects.count(),
             'total_admins': User.objects.filter(role=User.Role.ADMIN).count(),
         })
@@ -237,65 +233,53 @@ def client_dashboard_view(request):
     """
     Displays the main client landing page/dashboard.
     """
-    # Auto-update scheduled posts
-    Post.objects.filter(
-        assigned_client=request.user.client_profile,
-        status=Post.Status.APPROVED, 
-        scheduled_datetime__lte=timezone.now()
-    ).update(status=Post.Status.PUBLISHED)
-    
     client_profile = request.user.client_profile
     
     # 1. Get Posts for "Pending Approval"
-    pending_posts = Post.objects.filter(
-        assigned_client=client_profile,
+    pending_posts = Post.objects.visible_to(request.user).filter(
         status=Post.Status.PENDING
     ).order_by('scheduled_datetime')
     pending_posts_preview = pending_posts[:4] # Preview list
     
-    # 2. Get Stats
-    approved_count = Post.objects.filter(assigned_client=client_profile, status=Post.Status.APPROVED).count()
-    scheduled_count = Post.objects.filter(
-        assigned_client=client_profile, 
-        status__in=[Post.Status.APPROVED, Post.Status.PUBLISHED],
-        scheduled_datetime__gte=timezone.now()
-    ).count()
-    rejected_count = Post.objects.filter(assigned_client=client_profile, status=Post.Status.REJECTED).count()
+    # 2. Get Stats (one query for every status + the scheduled count)
+    status_counts = Post.objects.visible_to(request.user).status_counts(
+        scheduled=Count('pk', filter=Q(
+            status__in=[Post.Status.APPROVED, Post.Status.PUBLISHED],
+            scheduled_datetime__gte=timezone.now()
+        ))
+    )
 
     # 3. Get Other Sections
     recent_activity = AuditLog.objects.filter(user=request.user).order_by('-timestamp')[:3]
-    upcoming_posts = Post.objects.filter(
-        assigned_client=client_profile,
+    upcoming_posts = Post.objects.visible_to(request.user).filter(
         status__in=[Post.Status.APPROVED, Post.Status.PUBLISHED],
         scheduled_datetime__gte=timezone.now()
     ).order_by('scheduled_datetime')[:3]
     
     # --- 4. THIS SECTION IS UPDATED ---
     # Get Published Post Feed (Preview)
-    published_posts_query = Post.objects.filter(
-        assigned_client=client_profile, 
+    published_posts_query = Post.objects.visible_to(request.user).filter(
         status=Post.Status.PUBLISHED
     ).annotate(
         avg_rating=Avg('ratings__score')
     ).order_by('-scheduled_datetime')
 
     published_posts_preview = published_posts_query[:3] # Get first 3 for preview
-    published_posts_count = published_posts_query.count() # Get total count
 
     context = {
         'company_name': client_profile.company_name,
         'pending_posts': pending_posts,             # Full list for modals
         'pending_posts_preview': pending_posts_preview, # Limited list for card
-        'pending_count': pending_posts.count(),
-        'scheduled_count': scheduled_count,
-        'approved_count': approved_count,
-        'rejected_count': rejected_count,
+        'pending_count': status_counts[Post.Status.PENDING],
+        'scheduled_count': status_counts['scheduled'],
+        'approved_count': status_counts[Post.Status.APPROVED],
+        'rejected_count': status_counts[Post.Status.REJECTED],
         'recent_activity': recent_activity,
         'upcoming_posts': upcoming_posts,
         
         # --- THESE ARE THE UPDATED CONTEXT VARIABLES ---
         'published_posts': published_posts_preview,  # Pass the preview list
-        'published_posts_count': published_posts_count,  # Pass the total count
+        'published_posts_count': status_counts[Post.Status.PUBLISHED],  # Pass the total count
     }
     return render(request, 'core/client_dashboard.html', context)
 
@@ -326,176 +310,244 @@ def client_assignment_view(request):
 
 @user_passes_test(is_admin_or_superadmin, login_url='core:login_admin')
 def admin_calendar_view(request):
-    user = request.user
-    
-    if user.role == User.Role.SUPER_ADMIN:
-        all_posts = Post.objects.all()
-    else:
-        admin_clients = ClientProfile.objects.filter(assigned_admins=user)
-        all_posts = Post.objects.filter(assigned_client__in=admin_clients)
-
-    calendar_events = []
-    for post in all_posts.filter(scheduled_datetime__isnull=False):
-        if post.status == Post.Status.DRAFT:
-            className = 'bg-secondary'
-        elif post.status == Post.Status.PENDING:
-            className = 'bg-warning'
-        elif post.status == Post.Status.REJECTED:
-            className = 'bg-danger'
-        elif post.status == Post.Status.APPROVED:
-            className = 'bg-success'
-        elif post.status == Post.Status.PUBLISHED:
-            className = 'bg-primary'
-        else:
-            className = 'bg-dark'
-
-        calendar_events.append({
-            'title': post.title,
-            'start': post.scheduled_datetime.isoformat(),
-            'className': f'{className} text-white',
-            'id': post.id,
-            'url': reverse('posts:edit_post', args=[post.id])
-        })
-
-    context = {
-        'calendar_events_json': json.dumps(calendar_events)
-    }
-    return render(request, 'core/admin_calendar.html', context)
+    # Events are fetched month by month from calendar_events_view
+    return render(request, 'core/admin_calendar.html')
 
 @user_passes_test(is_admin_or_superadmin, login_url='core:login_admin')
+@read_from_replica
 def rejection_report_view(request):
     user = request.user
-    
-    if user.role == User.Role.SUPER_ADMIN:
-        all_clients = ClientProfile.objects.all()
-    else:
-        all_clients = ClientProfile.objects.filter(assigned_admins=user)
-        
-    all_posts = Post.objects.filter(assigned_client__in=all_clients)
-
-    reviewable_posts = all_posts.filter(status__in=[
-        Post.Status.PENDING, 
-        Post.Status.APPROVED, 
-        Post.Status.REJECTED, 
-        Post.Status.PUBLISHED
-    ])
-    total_reviewable_count = reviewable_posts.count()
-    total_rejected_count = all_posts.filter(status=Post.Status.REJECTED).count()
-
-    if total_reviewable_count > 0:
-        overall_rejection_rate = (total_rejected_count / total_reviewable_count) * 100
+    all_clients = ClientProfile.objects.visible_to(user)
+    all_posts = Post.objects.visible_to(user)
+
+    # Totals come from the daily rollup, so any date range costs the same
+    date_range = DateRangeForm(request.GET or None)
+    start, end = date_range.get_range()
+    totals = ClientDailyStats.objects.visible_to(user).between(start, end).totals()
+    total_reviewed_count = totals['posts_approved'] + totals['posts_rejected']
+    total_rejected_count = totals['posts_rejected']
+
+    if total_reviewed_count > 0:
+        overall_rejection_rate = (total_rejected_count / total_reviewed_count) * 100
     else:
         overall_rejection_rate = 0
 
-    most_rejected_posts = all_posts.annotate(
-        rejection_count=Count('feedback')
-    ).filter(rejection_count__gt=0).order_by('-rejection_count')[:10]
+    most_rejected_posts = analytics.most_rejected_posts(all_posts, start, end)
+
+    # Review-cycle metrics from one pass over the status event log
+    cycle_stats = analytics.review_cycle_stats(
+        PostStatusEvent.objects.visible_to(user).between(start, end)
+    )
+    median_time_to_approval = analytics.median_duration(cycle_stats['time_to_approval'])
+    revision_rounds = list(cycle_stats['revision_rounds'].values())
+    average_revision_rounds = sum(revision_rounds) / len(revision_rounds) if revision_rounds else 0
+    admin_turnaround = analytics.admin_turnaround(cycle_stats['turnaround'])
 
-    clients_by_rejection = all_clients.annotate(
-        total_posts=Count('posts'),
-        rejected_posts=Count('posts', filter=Q(posts__status=Post.Status.REJECTED))
-    ).filter(total_posts__gt=0).annotate(
-        rejection_rate= (F('rejected_posts') * 100.0 / F('total_posts'))
-    ).order_by('-rejection_rate')
+    clients_by_rejection = report_builders.clients_by_rejection(all_clients, start, end)
 
     if request.method == 'POST':
-        csv_buffer = io.StringIO()
-        writer = csv.writer(csv_buffer)
-        writer.writerow(['Client Name', 'Rejection Rate (%)', 'Rejected Posts', 'Total Posts'])
-        
-        for client in clients_by_rejection:
-            writer.writerow([
-                client.company_name,
-                f"{client.rejection_rate:.1f}",
-                client.rejected_posts,
-                client.total_posts
-            ])
-            
-        csv_buffer.seek(0)
-        
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d-%H%M")
-        filename = f"rejection_report_{timestamp}.csv"
-        
-        report_file = ContentFile(csv_buffer.getvalue().encode('utf-8'))
-        
-        report = GeneratedReport(
-            title=f"Rejection Report - {timestamp}",
-            report_type="rejection_rates",
-            generated_by=request.user
+        # The CSV is built by a background job; the page polls for the file.
+        report, reused = report_jobs.submit_report(
+            'rejection_rates',
+            report_builders.RejectionRatesReport.parameters_for(request),
+            user
         )
-        report.file.save(filename, report_file)
-        report.save()
-        
-        response = HttpResponse(csv_buffer.getvalue(), content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        if reused:
+            messages.info(request, "No changes since the last report was generated, so it is being reused.")
+        query = request.GET.copy()
+        query['report'] = report.id
+        return redirect(f"{reverse('core:report_rejection')}?{query.urlencode()}")
+
+    report_job = None
+    if request.GET.get('report', '').isdigit():
+        report_job = GeneratedReport.objects.visible_to(user).filter(pk=request.GET['report']).first()
 
     context = {
         'total_rejected_count': total_rejected_count,
         'overall_rejection_rate': overall_rejection_rate,
         'most_rejected_posts': most_rejected_posts,
         'clients_by_rejection': clients_by_rejection,
+        'report_job': report_job,
+        'date_range': date_range,
+        'median_time_to_approval': median_time_to_approval,
+        'median_hours_to_approval': median_time_to_approval.total_seconds() / 3600 if median_time_to_approval else None,
+        'average_revision_rounds': average_revision_rounds,
+        'admin_turnaround': admin_turnaround,
     }
     return render(request, 'core/rejection_report.html', context)
 
 @user_passes_test(is_admin_or_superadmin, login_url='core:login_admin')
+@read_from_replica
 def client_activity_report_view(request):
     user = request.user
-    
-    if user.role == User.Role.SUPER_ADMIN:
-        all_clients = ClientProfile.objects.all()
-    else:
-        all_clients = ClientProfile.objects.filter(assigned_admins=user)
+    all_clients = ClientProfile.objects.visible_to(user)
+
+    date_range = DateRangeForm(request.GET or None)
+    start, end = date_range.get_range()
 
     clients_by_feedback = all_clients.annotate(
-        feedback_count=Count('user__feedback')
+        feedback_count=ClientDailyStats.sum_between('feedback_count', start, end)
     ).filter(feedback_count__gt=0).order_by('-feedback_count')[:10]
 
     clients_by_rating = all_clients.annotate(
-        average_rating=Avg('user__rating__score')
-    ).filter(average_rating__isnull=False).order_by('-average_rating')[:10]
-    
-    client_posts = Post.objects.filter(assigned_client__in=all_clients)
+        rating_count=ClientDailyStats.sum_between('rating_count', start, end),
+        rating_sum=ClientDailyStats.sum_between('rating_sum', start, end)
+    ).filter(rating_count__gt=0).annotate(
+        average_rating=F('rating_sum') * 1.0 / F('rating_count')
+    ).order_by('-average_rating')[:10]
     
-    recent_feedback = Feedback.objects.filter(
-        post__in=client_posts
-    ).order_by('-created_at')[:10]
-    
-    recent_ratings = Rating.objects.filter(
-        post__in=client_posts
-    ).order_by('-created_at')[:10]
+    recent_feedback = Feedback.objects.visible_to(user).for_list()
+    recent_ratings = Rating.objects.visible_to(user).for_list()
+    if start:
+        recent_feedback = recent_feedback.filter(created_at__date__gte=start)
+        recent_ratings = recent_ratings.filter(created_at__date__gte=start)
+    if end:
+        recent_feedback = recent_feedback.filter(created_at__date__lte=end)
+        recent_ratings = recent_ratings.filter(created_at__date__lte=end)
+    recent_feedback = recent_feedback.order_by('-created_at')[:10]
+    recent_ratings = recent_ratings.order_by('-created_at')[:10]
 
     context = {
         'clients_by_feedback': clients_by_feedback,
         'clients_by_rating': clients_by_rating,
         'recent_feedback': recent_feedback,
         'recent_ratings': recent_ratings,
+        'date_range': date_range,
     }
     return render(request, 'core/report_activity.html', context)
 
 
+# --- CALENDAR EVENTS FEED ---
+
+CALENDAR_STATUS_CLASSES = {
+    Post.Status.DRAFT: 'bg-secondary',
+    Post.Status.PENDING: 'bg-warning',
+    Post.Status.REJECTED: 'bg-danger',
+    Post.Status.APPROVED: 'bg-success',
+    Post.Status.PUBLISHED: 'bg-primary',
+}
+
+# Longest window one request may ask for; a month view asks for about six weeks.
+CALENDAR_MAX_WINDOW = datetime.timedelta(days=400)
+
+
+def _parse_calendar_bound(value):
+    """
+    Parses FullCalendar's start/end parameter (a date or an ISO datetime).
+    Returns an aware datetime, or None if it can't be parsed.
+    """
+    value = (value or '').replace(' ', '+')  # '+' in the offset arrives as a space
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _calendar_window(request):
+    """
+    The posts the user may see on the calendar, scheduled within the
+    requested [start, end) window. None if the window is missing or invalid.
+    """
+    start = _parse_calendar_bound(request.GET.get('start'))
+    end = _parse_calendar_bound(request.GET.get('end'))
+    if not start or not end or not (start < end <= start + CALENDAR_MAX_WINDOW):
+        return None
+
+    posts = Post.objects.visible_to(request.user)
+    return posts.filter(scheduled_datetime__gte=start, scheduled_datetime__lt=end)
+
+
+def _calendar_etag(request):
+    posts = _calendar_window(request)
+    if posts is None:
+        return None
+    # Any edit bumps updated_at; the count catches deletions.
+    version = posts.aggregate(last_change=Max('updated_at'), total=Count('pk'))
+    return '"{}-{}-{}-{}"'.format(
+        request.user.pk,
+        hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:12],
+        version['last_change'].timestamp() if version['last_change'] else 0,
+        version['total'],
+    )
+
+
+@login_required
+@condition(etag_func=_calendar_etag)
+def calendar_events_view(request):
+    """
+    JSON event feed for the admin and client calendars, limited to the
+    visible date range (?start=&end=). Answers 304 when nothing changed.
+    """
+    posts = _calendar_window(request)
+    if posts is None:
+        return JsonResponse({'error': 'Valid start and end parameters are required.'}, status=400)
+
+    # Admins click through to the edit page; build the links from one reverse()
+    edit_url = None
+    if request.user.role != User.Role.CLIENT:
+        edit_url = reverse('posts:edit_post', args=[0]).replace('/0/', '/{}/')
+
+    events = []
+    for post in posts.values('id', 'title', 'status', 'scheduled_datetime').order_by('scheduled_datetime'):
+        event = {
+            'id': post['id'],
+            'title': post['title'],
+            'start': post['scheduled_datetime'].isoformat(),
+            'className': f"{CALENDAR_STATUS_CLASSES.get(post['status'], 'bg-dark')} text-white",
+        }
+        if edit_url:
+            event['url'] = edit_url.format(post['id'])
+        events.append(event)
+
+    response = JsonResponse(events, safe=False)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # --- NOTIFICATION VIEWS ---
 
 @login_required
 def get_unread_notifications(request):
-    notifications = Notification.objects.filter(
-        recipient=request.user, 
-        is_read=False
-    )
-    count = notifications.count()
-    
-    notif_list = []
-    for notif in notifications[:5]:
-        notif_list.append({
-            'id': notif.id,
-            'message': notif.message,
-            'time': notif.timestamp.strftime("%b %d, %Y %I:%M %p")
-        })
+    # Answered from cache; rebuilt from the database only when the cache is cold
+    return JsonResponse(notification_cache.get_unread_summary(request.user.pk))
+
+@login_required
+async def notification_stream_view(request):
+    """
+    Server-Sent Events stream that pushes new notifications to the user
+    as soon as they are created. Only available when served over ASGI;
+    under WSGI it answers 204 so the page falls back to polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
 
-    return JsonResponse({
-        'count': count,
-        'notifications': notif_list
-    })
+    user = await request.auser()
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 20)
+
+    async def event_stream():
+        queue = events.subscribe(user.pk)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: notification\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            events.unsubscribe(user.pk, queue)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @login_required
 def mark_notification_as_read(request, notif_id):
@@ -508,8 +560,10 @@ def mark_notification_as_read(request, notif_id):
         recipient=request.user
     )
     
-    notification.is_read = True
-    notification.save()
+    if not notification.is_read:
+        notification.is_read = True
+        notification.save()
+        notification_cache.notification_read(notification)
     
     # --- THIS IS THE UPDATED LOGIC ---
     if notification.related_post:
@@ -536,85 +590,53 @@ def mark_notification_as_read(request, notif_id):
 def client_calendar_view(request):
     """
     Displays the client-side calendar page.
+    Events are fetched month by month from calendar_events_view.
     """
-    client_profile = request.user.client_profile
-
-    # 1. Get all posts for this client that have a date
-    all_posts = Post.objects.filter(
-        assigned_client=client_profile,
-        scheduled_datetime__isnull=False
-    ).exclude(status=Post.Status.DRAFT) # Exclude drafts
-
-    # 2. Format Posts into Calendar Events
-    calendar_events = []
-    for post in all_posts:
-        # Assign a color based on status
-        if post.status == Post.Status.PENDING:
-            className = 'bg-warning'
-        elif post.status == Post.Status.REJECTED:
-            className = 'bg-danger'
-        elif post.status == Post.Status.APPROVED:
-            className = 'bg-success'
-        elif post.status == Post.Status.PUBLISHED:
-            className = 'bg-primary'
-        else:
-            className = 'bg-dark' # Fallback for Archived
-
-        calendar_events.append({
-            'title': post.title,
-            'start': post.scheduled_datetime.isoformat(),
-            'className': f'{className} text-white',
-            'id': post.id
-        })
-
-    context = {
-        'calendar_events_json': json.dumps(calendar_events)
-    }
-
-    return render(request, 'core/client_calendar.html', context)
+    return render(request, 'core/client_calendar.html')
 
 @user_passes_test(is_client, login_url='core:client_login')
 def client_post_history_view(request):
     """
     Displays a complete history of all posts for the client.
     """
-    client_profile = request.user.client_profile
-    
-    # Get all posts for this client, excluding drafts, ordered by last update
-    all_posts = Post.objects.filter(
-        assigned_client=client_profile
-    ).exclude(
-        status=Post.Status.DRAFT
-    ).order_by('-updated_at')
+    # Clients never see drafts; newest update first
+    all_posts = Post.objects.visible_to(request.user)
+    history_page = KeysetPaginator(
+        all_posts, ('-updated_at', '-id'), per_page=25
+    ).get_page(request.GET.get('cursor'))
 
     context = {
-        'posts_history': all_posts
+        'posts_history': history_page
     }
     
     return render(request, 'core/client_post_history.html', context)
 
 @user_passes_test(is_client, login_url='core:client_login')
+@read_from_replica
 def client_analytics_view(request):
     """
     Displays an analytics dashboard for the client.
     """
-    client_profile = request.user.client_profile
-    
-    # Get all posts for this client, excluding drafts
-    all_posts = Post.objects.filter(
-        assigned_client=client_profile
-    ).exclude(status=Post.Status.DRAFT)
-
-    # --- 1. Get Key Stats ---
-    total_posts_count = all_posts.count()
-    published_count = all_posts.filter(status=Post.Status.PUBLISHED).count()
-    
+    # Get all posts for this client (drafts are never visible to clients)
+    all_posts = Post.objects.visible_to(request.user)
+
+    # --- 1. Get Key Stats from the daily rollup, for any date range ---
+    date_range = DateRangeForm(request.GET or None)
+    start, end = date_range.get_range()
+    totals = ClientDailyStats.objects.visible_to(request.user).between(start, end).totals()
+    submitted_count = totals['posts_submitted']
+    published_count = totals['posts_published']
+
     # --- 2. Get Rating Stats [cite: 25] ---
-    # We filter ratings by the user (client)
-    client_ratings = Rating.objects.filter(user=request.user)
-    total_ratings_count = client_ratings.count()
-    
-    avg_rating = client_ratings.aggregate(avg_score=Avg('score'))['avg_score'] or 0
+    total_ratings_count = totals['rating_count']
+    if total_ratings_count:
+        avg_rating = totals['rating_sum'] / total_ratings_count
+    else:
+        avg_rating = 0
+
+    # Current status of every post, from the per-client counters
+    status_counts = ClientPostStats.objects.visible_to(request.user).status_counts()
+    total_posts_count = status_counts['ALL'] - status_counts[Post.Status.DRAFT]
 
     # --- 3. Get Top Rated Posts ---
     top_rated_posts = all_posts.annotate(
@@ -628,14 +650,15 @@ def client_analytics_view(request):
     
     # --- 5. Data for Chart.js  ---
     status_distribution = {
-        'published': published_count,
-        'approved': all_posts.filter(status=Post.Status.APPROVED).count(),
-        'rejected': all_posts.filter(status=Post.Status.REJECTED).count(),
-        'pending': all_posts.filter(status=Post.Status.PENDING).count(),
+        'published': status_counts[Post.Status.PUBLISHED],
+        'approved': status_counts[Post.Status.APPROVED],
+        'rejected': status_counts[Post.Status.REJECTED],
+        'pending': status_counts[Post.Status.PENDING],
     }
 
     context = {
         'total_posts_count': total_posts_count,
+        'submitted_count': submitted_count,
         'published_count': published_count,
         'total_ratings_count': total_ratings_count,
         'avg_rating': avg_rating,
@@ -643,6 +666,7 @@ def client_analytics_view(request):
         'most_discussed_posts': most_discussed_posts,
         'status_distribution_json': json.dumps(list(status_distribution.values())),
         'status_labels_json': json.dumps(list(status_distribution.keys())),
+        'date_range': date_range,
     }
     
     return render(request, 'core/client_analytics.html', context)
@@ -714,20 +738,18 @@ def client_feed_view(request):
     Displays a paginated, Instagram-style feed of all the client's
     published posts.
     """
-    client_profile = request.user.client_profile
-    
     # Get all PUBLISHED posts for this client
-    published_posts_query = Post.objects.filter(
-        assigned_client=client_profile, 
-        status=Post.Status.PUBLISHED
+    published_posts_query = Post.objects.visible_to(request.user).filter(
+        status=Post.Status.PUBLISHED,
+        scheduled_datetime__isnull=False
     ).annotate(
         avg_rating=Avg('ratings__score')
-    ).order_by('-scheduled_datetime') # Newest first
+    )
 
-    # Paginate the results (e.g., 9 posts per page for a 3x3 grid)
-    paginator = Paginator(published_posts_query, 9) 
-    page_number = request.GET.get('page')
-    published_posts_page = paginator.get_page(page_number)
+    # Cursor pagination, newest first (9 posts per page for a 3x3 grid)
+    published_posts_page = KeysetPaginator(
+        published_posts_query, ('-scheduled_datetime', '-id'), per_page=9
+    ).get_page(request.GET.get('cursor'))
 
     context = {
         'published_posts': published_posts_page,
@@ -742,11 +764,8 @@ def client_pending_approval_view(request):
     """
     Displays a dedicated page for all posts pending client approval.
     """
-    client_profile = request.user.client_profile
-    
     # Get all posts for this client that are 'PENDING'
-    pending_posts = Post.objects.filter(
-        assigned_client=client_profile,
+    pending_posts = Post.objects.visible_to(request.user).filter(
         status=Post.Status.PENDING
     ).order_by('scheduled_datetime')
 
@@ -754,4 +773,79 @@ def client_pending_approval_view(request):
         'pending_posts': pending_posts,
     }
     
-    return render(request, 'core/client_pending_approval.html', context)
\ No newline at end of file
+    return render(request, 'core/client_pending_approval.html', context)
+
+
+# --- METRICS VIEW ---
+
+@never_cache
+def metrics_view(request):
+    """
+    Prometheus metrics (see core/metrics.py), for super admins or a scraper
+    sending the METRICS_TOKEN as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    has_token = token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (has_token or is_superadmin(request.user)):
+        return HttpResponse("Forbidden", status=403, content_type='text/plain')
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# --- REQUEST PROFILE VIEWS ---
+
+PROFILE_SORTS = {
+    'cumulative': 'Cumulative time',
+    'tottime': 'Own time',
+    'ncalls': 'Calls',
+}
+
+@user_passes_test(is_superadmin, login_url='core:login_admin')
+def request_profiles_view(request):
+    """
+    Lists the slowest captured request profiles (see core/profiling.py),
+    optionally for one URL name, and hands out a profiling token.
+    """
+    profiles = RequestProfile.objects.select_related('user').order_by('-duration')
+    selected_view = request.GET.get('view', '')
+    if selected_view:
+        profiles = profiles.filter(view_name=selected_view)
+
+    context = {
+        'profiles': profiles[:100],
+        'view_names': RequestProfile.objects.order_by('view_name').values_list('view_name', flat=True).distinct(),
+        'selected_view': selected_view,
+        'profile_header': settings.PROFILING_HEADER,
+        'profile_token': profiling.profile_token(),
+        'token_minutes': settings.PROFILING_TOKEN_MAX_AGE // 60,
+        'sample_every': settings.PROFILING_SAMPLE_EVERY,
+        'min_duration': settings.PROFILING_MIN_DURATION,
+    }
+    return render(request, 'core/request_profiles.html', context)
+
+@user_passes_test(is_superadmin, login_url='core:login_admin')
+def request_profile_detail_view(request, profile_id):
+    """
+    Shows the top functions of one profile, or downloads its .prof file.
+    """
+    profile = get_object_or_404(RequestProfile.objects.select_related('user'), pk=profile_id)
+    if 'download' in request.GET:
+        return FileResponse(
+            profile.file.open('rb'), as_attachment=True, filename=profile.file.name.rsplit('/', 1)[-1]
+        )
+
+    sort = request.GET.get('sort')
+    if sort not in PROFILE_SORTS:
+        sort = 'cumulative'
+    try:
+        summary = profiling.profile_summary(profile, sort)
+    except OSError:
+        summary = None
+        messages.error(request, "The profile file is missing.")
+
+    context = {
+        'profile': profile,
+        'summary': summary,
+        'sort': sort,
+        'sorts': PROFILE_SORTS,
+    }
+    return render(request, 'core/request_profile_detail.html', context)
@@ -0,0 +1,107 @@
+# posts/analytics.py
+
+"""
+Review-cycle metrics computed from PostStatusEvent.
+
+Every metric comes from a single scan of the events, ordered by
+(post, timestamp) so the post_status_event_post_idx index serves it,
+instead of parsing AuditLog text.
+"""
+
+import statistics
+from collections import defaultdict
+
+from django.db.models import Count, Q
+
+from users.models import User
+from .models import Post, PostStatusEvent
+
+
+def review_cycle_stats(events=None):
+    """
+    Walks the events once, post by post, and returns:
+
+    - time_to_approval: timedeltas from each post's first submission (-> PENDING)
+      to its first approval after that
+    - revision_rounds: {post_id: number of rejections}
+    - turnaround: {actor_id: [timedeltas]} from a rejection to the resubmission
+      made by that admin
+    """
+    if events is None:
+        events = PostStatusEvent.objects.all()
+    rows = events.order_by('post_id', 'timestamp', 'id').values_list(
+        'post_id', 'to_status', 'actor_id', 'timestamp'
+    )
+
+    time_to_approval = []
+    revision_rounds = defaultdict(int)
+    turnaround = defaultdict(list)
+
+    current_post = None
+    submitted_at = rejected_at = None
+    approved = False
+    for post_id, to_status, actor_id, timestamp in rows.iterator(chunk_size=2000):
+        if post_id != current_post:
+            current_post = post_id
+            submitted_at = rejected_at = None
+            approved = False
+
+        if to_status == Post.Status.PENDING:
+            if submitted_at is None:
+                submitted_at = timestamp
+            if rejected_at is not None:
+                turnaround[actor_id].append(timestamp - rejected_at)
+                rejected_at = None
+        elif to_status == Post.Status.REJECTED:
+            revision_rounds[post_id] += 1
+            rejected_at = timestamp
+        elif to_status == Post.Status.APPROVED and submitted_at is not None and not approved:
+            time_to_approval.append(timestamp - submitted_at)
+            approved = True
+
+    return {
+        'time_to_approval': time_to_approval,
+        'revision_rounds': dict(revision_rounds),
+        'turnaround': dict(turnaround),
+    }
+
+
+def median_duration(durations):
+    """
+    Median of a list of timedeltas, or None when it is empty.
+    """
+    if not durations:
+        return None
+    return statistics.median(durations)
+
+
+def admin_turnaround(turnaround):
+    """
+    Rows of {'admin', 'median', 'median_hours', 'count'} from review_cycle_stats()['turnaround'],
+    fastest median first.
+    """
+    usernames = dict(User.objects.filter(pk__in=[pk for pk in turnaround if pk]).values_list('pk', 'username'))
+    rows = [
+        {
+            'admin': usernames.get(actor_id, 'System'),
+            'median': median_duration(durations),
+            'median_hours': median_duration(durations).total_seconds() / 3600,
+            'count': len(durations),
+        }
+        for actor_id, durations in turnaround.items()
+    ]
+    return sorted(rows, key=lambda row: row['median'])
+
+
+def most_rejected_posts(posts, start=None, end=None, limit=10):
+    """
+    Posts with the most rejections between the two dates, counted from the event log.
+    """
+    rejected = Q(status_events__to_status=Post.Status.REJECTED)
+    if start:
+        rejected &= Q(status_events__timestamp__date__gte=start)
+    if end:
+        rejected &= Q(status_events__timestamp__date__lte=end)
+    return posts.annotate(
+        rejection_count=Count('status_events', filter=rejected)
+    ).filter(rejection_count__gt=0).select_related('assigned_client').order_by('-rejection_count')[:limit]
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _ensure_search_index(sender, using, **kwargs):
+    from posts.search import ensure_search_index
+    ensure_search_index(using)
 
 
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        # Later schema changes can rebuild the tables without their triggers.
+        post_migrate.connect(_ensure_search_index, sender=self)
@@ -0,0 +1,101 @@
+# posts/counters.py
+
+from collections import defaultdict
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# Daily rollup counter bumped when a post moves into each status.
+TRANSITION_FIELDS = {
+    'PENDING': 'posts_submitted',
+    'APPROVED': 'posts_approved',
+    'REJECTED': 'posts_rejected',
+    'PUBLISHED': 'posts_published',
+}
+
+
+def compute_client_stats(post_model, feedback_model, rating_model):
+    """
+    Recomputes every client's counters from the raw Post/Feedback/Rating rows
+    with three grouped queries.
+    Returns {client_id: {counter field: value}} for clients that have any posts.
+
+    The models are passed in so data migrations can use historical models.
+    """
+    stats = defaultdict(lambda: defaultdict(int))
+
+    rows = post_model.objects.order_by().values('assigned_client_id', 'status').annotate(n=Count('pk'))
+    for row in rows:
+        stats[row['assigned_client_id']][f"{row['status'].lower()}_count"] += row['n']
+
+    rows = feedback_model.objects.order_by().values('post__assigned_client_id').annotate(n=Count('pk'))
+    for row in rows:
+        stats[row['post__assigned_client_id']]['feedback_count'] = row['n']
+
+    rows = rating_model.objects.order_by().values('post__assigned_client_id').annotate(
+        n=Count('pk'), total=Sum('score')
+    )
+    for row in rows:
+        stats[row['post__assigned_client_id']]['rating_count'] = row['n']
+        stats[row['post__assigned_client_id']]['rating_sum'] = row['total'] or 0
+
+    return stats
+
+
+def _between(queryset, field, start, end):
+    if start:
+        queryset = queryset.filter(**{f'{field}__date__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__date__lte': end})
+    return queryset
+
+
+def compute_daily_stats(post_model, feedback_model, rating_model, start=None, end=None, event_model=None):
+    """
+    Recomputes the per-client, per-day rollup from the raw rows, optionally
+    limited to the dates from `start` to `end`.
+    Returns {(client_id, date): {counter field: value}}.
+
+    Transitions are counted from `event_model` (PostStatusEvent) when given.
+    Posts without events only have their current status, which is counted
+    as a transition on the day the post was last updated.
+    """
+    stats = defaultdict(lambda: defaultdict(int))
+
+    posts = post_model.objects.order_by()
+    rows = _between(posts, 'created_at', start, end).values(
+        'assigned_client_id', day=TruncDate('created_at')
+    ).annotate(n=Count('pk'))
+    for row in rows:
+        stats[row['assigned_client_id'], row['day']]['posts_created'] += row['n']
+
+    posts_without_events = posts
+    if event_model is not None:
+        events = event_model.objects.order_by().filter(to_status__in=TRANSITION_FIELDS)
+        rows = _between(events, 'timestamp', start, end).values(
+            'post__assigned_client_id', 'to_status', day=TruncDate('timestamp')
+        ).annotate(n=Count('pk'))
+        for row in rows:
+            stats[row['post__assigned_client_id'], row['day']][TRANSITION_FIELDS[row['to_status']]] += row['n']
+        posts_without_events = posts.filter(status_events__isnull=True)
+
+    rows = _between(posts_without_events.filter(status__in=TRANSITION_FIELDS), 'updated_at', start, end).values(
+        'assigned_client_id', 'status', day=TruncDate('updated_at')
+    ).annotate(n=Count('pk'))
+    for row in rows:
+        stats[row['assigned_client_id'], row['day']][TRANSITION_FIELDS[row['status']]] += row['n']
+
+    rows = _between(feedback_model.objects.order_by(), 'created_at', start, end).values(
+        'post__assigned_client_id', day=TruncDate('created_at')
+    ).annotate(n=Count('pk'))
+    for row in rows:
+        stats[row['post__assigned_client_id'], row['day']]['feedback_count'] += row['n']
+
+    rows = _between(rating_model.objects.order_by(), 'created_at', start, end).values(
+        'post__assigned_client_id', day=TruncDate('created_at')
+    ).annotate(n=Count('pk'), total=Sum('score'))
+    for row in rows:
+        stats[row['post__assigned_client_id'], row['day']]['rating_count'] += row['n']
+        stats[row['post__assigned_client_id'], row['day']]['rating_sum'] += row['total'] or 0
+
+    return stats
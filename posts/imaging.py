@@ -0,0 +1,57 @@
+# posts/imaging.py
+
+"""
+Image resizing used by the rendition pipeline (see posts/renditions.py).
+
+This module only depends on Pillow so it can be imported by the worker
+processes of the rendition process pool without setting up Django.
+"""
+
+from PIL import Image, ImageOps
+
+
+def _flatten(image):
+    """
+    JPEG has no alpha channel; paste transparent images onto white.
+    """
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_image(source_path, outputs):
+    """
+    Writes every requested rendition of `source_path`.
+
+    `outputs` is a list of dicts with the keys:
+        path     - where to write the file
+        size     - (width, height) bounding box
+        crop     - True to fill the box exactly (centre crop), False to fit inside it
+        format   - Pillow format name, e.g. 'JPEG' or 'WEBP'
+        options  - extra keyword arguments for Image.save()
+
+    Returns the list of paths written, in the same order.
+    """
+    written = []
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+        for output in outputs:
+            if output['crop']:
+                image = ImageOps.fit(original, output['size'], Image.LANCZOS)
+            else:
+                image = original.copy()
+                image.thumbnail(output['size'], Image.LANCZOS)
+
+            if output['format'] == 'JPEG':
+                image = _flatten(image)
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+
+            image.save(output['path'], output['format'], **output['options'])
+            written.append(output['path'])
+    return written
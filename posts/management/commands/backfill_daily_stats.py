@@ -0,0 +1,52 @@
+# posts/management/commands/backfill_daily_stats.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.counters import compute_daily_stats
+from posts.models import Post, PostStatusEvent, Feedback, Rating, ClientDailyStats
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-client daily rollup from the raw post, feedback and rating rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=_date, help="First day to rebuild (YYYY-MM-DD). Defaults to the beginning.")
+        parser.add_argument('--end', type=_date, help="Last day to rebuild (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report how many rows would be written."
+        )
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and end and start > end:
+            raise CommandError("--start must not be after --end.")
+
+        stats = compute_daily_stats(Post, Feedback, Rating, start=start, end=end, event_model=PostStatusEvent)
+        rows = [
+            ClientDailyStats(client_id=client_id, date=date, **counters)
+            for (client_id, date), counters in stats.items()
+        ]
+        existing = ClientDailyStats.objects.between(start, end)
+
+        if options['dry_run']:
+            self.stdout.write(f"{existing.count()} row(s) would be replaced by {len(rows)}.")
+            return
+
+        with transaction.atomic():
+            deleted, _ = existing.delete()
+            ClientDailyStats.objects.bulk_create(rows, batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Daily stats rebuilt: {deleted} row(s) removed, {len(rows)} written."
+        ))
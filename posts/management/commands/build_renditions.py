@@ -0,0 +1,56 @@
+# posts/management/commands/build_renditions.py
+
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.renditions import generate_renditions, generate_renditions_now
+
+
+class Command(BaseCommand):
+    help = "Renders the thumb/feed/full image renditions for existing posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Re-render every post, not only posts without renditions."
+        )
+        parser.add_argument(
+            '--sync', action='store_true',
+            help="Render in this process instead of the process pool."
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(image_renditions={})
+
+        futures = []
+        rendered = failed = 0
+        for post_id, image_name in posts.values_list('id', 'image').iterator():
+            if not options['sync']:
+                future = generate_renditions(post_id, image_name, force=options['all'])
+                if future is None:
+                    rendered += 1
+                else:
+                    futures.append(future)
+                continue
+            try:
+                generate_renditions_now(post_id, image_name)
+                rendered += 1
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f"Post {post_id}: {error}")
+
+        wait(futures)
+        for future in futures:
+            if future.exception():
+                failed += 1
+            else:
+                rendered += 1
+
+        message = f"Rendered {rendered} post image(s)."
+        if failed:
+            message += f" {failed} failed."
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,22 @@
+# posts/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from posts.search import create_search_index, drop_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreates the full-text search tables and triggers and re-indexes every post, feedback and request."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database to rebuild.")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError("Full-text search is only available on SQLite.")
+
+        drop_search_index(connection)
+        create_search_index(connection)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
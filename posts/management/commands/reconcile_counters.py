@@ -0,0 +1,57 @@
+# posts/management/commands/reconcile_counters.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import compute_client_stats
+from posts.models import Post, Feedback, Rating, ClientPostStats
+from users.models import ClientProfile
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-client post counters and reports any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report drift, do not write anything."
+        )
+
+    def handle(self, *args, **options):
+        expected = compute_client_stats(Post, Feedback, Rating)
+        existing = {stats.client_id: stats for stats in ClientPostStats.objects.all()}
+        company_names = dict(ClientProfile.objects.values_list('user_id', 'company_name'))
+
+        to_create = []
+        to_update = []
+        for client_id in set(expected) | set(existing):
+            counters = expected.get(client_id, {})
+            stats = existing.get(client_id)
+            is_new = stats is None
+            if is_new:
+                stats = ClientPostStats(client_id=client_id)
+                to_create.append(stats)
+
+            drift = []
+            for field in ClientPostStats.COUNTER_FIELDS:
+                value = counters.get(field, 0)
+                if getattr(stats, field) != value:
+                    drift.append(f"{field} {getattr(stats, field)} -> {value}")
+                    setattr(stats, field, value)
+
+            if drift and not is_new:
+                to_update.append(stats)
+            if drift:
+                self.stdout.write(f"{company_names.get(client_id, client_id)}: {', '.join(drift)}")
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(to_create) + len(to_update)} client(s) would be updated.")
+            return
+
+        with transaction.atomic():
+            ClientPostStats.objects.bulk_create(to_create, batch_size=500)
+            ClientPostStats.objects.bulk_update(to_update, ClientPostStats.COUNTER_FIELDS, batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Counters reconciled: {len(to_create)} created, {len(to_update)} corrected."
+        ))
@@ -0,0 +1,45 @@
+# posts/management/commands/run_publish_scheduler.py
+
+from django.core.management.base import BaseCommand
+
+from posts.scheduler import PublishScheduler, publish_due_posts
+
+
+class Command(BaseCommand):
+    help = "Publishes APPROVED posts when their scheduled time is reached."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Publish everything that is currently due and exit."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Number of posts published per transaction."
+        )
+        parser.add_argument(
+            '--refresh-interval', type=int, default=60,
+            help="Seconds between reloads of the upcoming-post queue."
+        )
+        parser.add_argument(
+            '--poll-interval', type=int, default=5,
+            help="Seconds between checks for posts approved or rescheduled since the last reload."
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            published = publish_due_posts(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Published {published} post(s)."))
+            return
+
+        scheduler = PublishScheduler(
+            batch_size=options['batch_size'],
+            refresh_interval=options['refresh_interval'],
+            poll_interval=options['poll_interval'],
+            stdout=self.stdout,
+        )
+        self.stdout.write("Publish scheduler started. Press Ctrl+C to stop.")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Publish scheduler stopped.")
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from posts.counters import compute_client_stats
+
+
+def build_client_stats(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Feedback = apps.get_model('posts', 'Feedback')
+    Rating = apps.get_model('posts', 'Rating')
+    ClientPostStats = apps.get_model('posts', 'ClientPostStats')
+
+    stats = compute_client_stats(Post, Feedback, Rating)
+    ClientPostStats.objects.bulk_create([
+        ClientPostStats(client_id=client_id, **counters)
+        for client_id, counters in stats.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_created_from_request'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientPostStats',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='post_stats', serialize=False, to='users.clientprofile')),
+                ('draft_count', models.IntegerField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('approved_count', models.IntegerField(default=0)),
+                ('rejected_count', models.IntegerField(default=0)),
+                ('published_count', models.IntegerField(default=0)),
+                ('archived_count', models.IntegerField(default=0)),
+                ('feedback_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_client_stats, migrations.RunPython.noop),
+    ]
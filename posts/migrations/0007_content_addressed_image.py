@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:48
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(help_text='Image for the post', storage=core.storage.ContentAddressedStorage(), upload_to='post_images/'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from posts.counters import compute_daily_stats
+
+
+def build_daily_stats(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Feedback = apps.get_model('posts', 'Feedback')
+    Rating = apps.get_model('posts', 'Rating')
+    ClientDailyStats = apps.get_model('posts', 'ClientDailyStats')
+
+    stats = compute_daily_stats(Post, Feedback, Rating)
+    ClientDailyStats.objects.bulk_create([
+        ClientDailyStats(client_id=client_id, date=date, **counters)
+        for (client_id, date), counters in stats.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_content_addressed_image'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('posts_created', models.IntegerField(default=0)),
+                ('posts_submitted', models.IntegerField(default=0)),
+                ('posts_approved', models.IntegerField(default=0)),
+                ('posts_rejected', models.IntegerField(default=0)),
+                ('posts_published', models.IntegerField(default=0)),
+                ('feedback_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='users.clientprofile')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('client', 'date'), name='unique_client_daily_stats')],
+            },
+        ),
+        migrations.RunPython(build_daily_stats, migrations.RunPython.noop),
+    ]
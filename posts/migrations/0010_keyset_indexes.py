@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_poststatusevent'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['updated_at', 'id'], name='post_updated_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['assigned_client', 'updated_at', 'id'], name='post_client_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['assigned_client', 'status', 'scheduled_datetime', 'id'], name='post_client_scheduled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postrequest',
+            index=models.Index(fields=['created_at', 'id'], name='postrequest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postrequest',
+            index=models.Index(fields=['client', 'created_at', 'id'], name='postrequest_client_idx'),
+        ),
+    ]
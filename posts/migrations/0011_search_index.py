@@ -0,0 +1,24 @@
+# Creates the SQLite FTS5 search indexes (see posts/search.py).
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from posts.search import create_search_index
+    create_search_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from posts.search import drop_search_index
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
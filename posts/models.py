@@ -1,11 +1,66 @@
 # posts/models.py
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator, MaxValueValidator
-from users.models import ClientProfile # Import from your new users app
+from users.models import User, ClientProfile, ClientScopedQuerySet # Import from your new users app
+from core.storage import content_storage
+from .counters import TRANSITION_FIELDS
 from django.utils import timezone
 
+
+class StatusQuerySet(models.QuerySet):
+    """
+    Shared queryset for models with a `Status` choices class and a `status` field.
+    """
+
+    def status_counts(self, **extra):
+        """
+        Returns {'ALL': n, '<STATUS>': n, ...} from a single aggregate query.
+        Any extra keyword aggregates are computed in the same query.
+        """
+        aggregates = {'ALL': models.Count('pk')}
+        for status in self.model.Status.values:
+            aggregates[status] = models.Count('pk', filter=models.Q(status=status))
+        aggregates.update(extra)
+        return self.order_by().aggregate(**aggregates)
+
+
+class PostQuerySet(ClientScopedQuerySet, StatusQuerySet):
+    client_path = 'assigned_client'
+    list_related = ('assigned_client',)
+    list_fields = (
+        'title', 'caption', 'status', 'scheduled_datetime', 'updated_at',
+        'assigned_client__company_name',
+    )
+
+    def visible_to(self, user):
+        posts = super().visible_to(user)
+        if user.role == User.Role.CLIENT:
+            # Drafts stay with the agency until they are sent for review
+            posts = posts.exclude(status=Post.Status.DRAFT)
+        return posts
+
+
+class PostRequestQuerySet(ClientScopedQuerySet, StatusQuerySet):
+    client_path = 'client'
+    list_related = ('client',)
+    list_fields = ('request_details', 'status', 'desired_date', 'created_at', 'client__company_name')
+
+
+class FeedbackQuerySet(ClientScopedQuerySet):
+    client_path = 'post__assigned_client'
+    list_related = ('post', 'user')
+    list_fields = ('comment', 'created_at', 'post__title', 'user__username')
+
+
+class RatingQuerySet(ClientScopedQuerySet):
+    client_path = 'post__assigned_client'
+    list_related = ('post', 'user')
+    list_fields = ('score', 'comment', 'created_at', 'post__title', 'user__username')
+
+
 class Post(models.Model):
     class Status(models.TextChoices):
         DRAFT = 'DRAFT', 'Draft'            
@@ -17,7 +72,13 @@ class Post(models.Model):
 
     title = models.CharField(max_length=255, help_text="Internal title for this post")
     caption = models.TextField(help_text="The social media post content")
-    image = models.ImageField(upload_to='post_images/', help_text="Image for the post")
+    image = models.ImageField(upload_to='post_images/', storage=content_storage, help_text="Image for the post")
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Resized copies of the image, {size: {format: file name}}. See posts/renditions.py"
+    )
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.DRAFT)
     scheduled_datetime = models.DateTimeField(null=True, blank=True, help_text="When the post is scheduled to go live")
     
@@ -47,10 +108,126 @@ class Post(models.Model):
         help_text="The client request this post was created from, if any."
     )
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        # Keyset pagination (core/pagination.py) orders by these keys
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='post_updated_keyset_idx'),
+            models.Index(fields=['assigned_client', 'updated_at', 'id'], name='post_client_updated_idx'),
+            models.Index(
+                fields=['assigned_client', 'status', 'scheduled_datetime', 'id'],
+                name='post_client_scheduled_idx'
+            ),
+        ]
+
+    # Status, client and image as last loaded from / saved to the database.
+    # Signal handlers compare these with the current values to detect transitions.
+    _loaded_status = None
+    _loaded_client_id = None
+    _loaded_image = None
+    # Who made the pending status change, recorded on its PostStatusEvent.
+    _status_actor = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_client_id = instance.__dict__.get('assigned_client_id')
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The post_save receivers in core/signals.py (status event, counters,
+        # daily rollup) write inside this transaction, so they commit or roll
+        # back together with the post.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_status = self.status
+        self._loaded_client_id = self.assigned_client_id
+        self._loaded_image = self.image.name
+        self._status_actor = None
+
+    def set_status(self, status, actor=None):
+        """
+        Changes the status; the next save() records a PostStatusEvent
+        crediting `actor` (None for system changes such as auto-publishing).
+        """
+        self.status = status
+        self._status_actor = actor
+
     def __str__(self):
         return f"{self.title} for {self.assigned_client.company_name} ({self.get_status_display()})"
 
 
+class PostStatusEventQuerySet(ClientScopedQuerySet):
+    client_path = 'post__assigned_client'
+
+    def update(self, **kwargs):
+        raise ValueError("PostStatusEvent rows are append-only.")
+
+    def delete(self):
+        raise ValueError("PostStatusEvent rows are append-only.")
+
+    def between(self, start=None, end=None):
+        """
+        Events from `start` to `end` (dates, inclusive); either bound may be None.
+        """
+        queryset = self
+        if start:
+            queryset = queryset.filter(timestamp__date__gte=start)
+        if end:
+            queryset = queryset.filter(timestamp__date__lte=end)
+        return queryset
+
+
+class PostStatusEvent(models.Model):
+    """
+    Append-only log of Post status transitions, written by core/signals.py
+    on every save that changes the status, in the same transaction as the
+    save. posts/analytics.py reads it.
+
+    save() on an existing row, delete() and the manager's update()/delete()
+    all refuse. Rows only go away when their post is deleted (CASCADE), and
+    the actor is cleared when that user is deleted (SET_NULL).
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(
+        max_length=20, choices=Post.Status.choices, blank=True,
+        help_text="Empty for the status a post was created with"
+    )
+    to_status = models.CharField(max_length=20, choices=Post.Status.choices)
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='post_status_events',
+        help_text="Who made the change; empty for system changes"
+    )
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = PostStatusEventQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['timestamp', 'id']
+        indexes = [
+            models.Index(fields=['post', 'timestamp'], name='post_status_event_post_idx'),
+            models.Index(fields=['to_status', 'timestamp'], name='post_status_event_to_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("PostStatusEvent rows are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("PostStatusEvent rows are append-only.")
+
+    def __str__(self):
+        return f"{self.post_id}: {self.from_status or '-'} -> {self.to_status}"
+
+
 class Feedback(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feedback') # Refers to Post
     user = models.ForeignKey(
@@ -61,6 +238,13 @@ class Feedback(models.Model):
     comment = models.TextField(help_text="Client's suggestions or rejection reason")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FeedbackQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Commit together with the counter updates made by core/signals.py
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Feedback on {self.post.title} by {self.user.username}"
 
@@ -81,9 +265,16 @@ class Rating(models.Model):
     comment = models.TextField(blank=True, null=True, help_text="Optional comment with rating")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = RatingQuerySet.as_manager()
+
     class Meta:
         unique_together = ('post', 'user')
 
+    def save(self, *args, **kwargs):
+        # Commit together with the counter updates made by core/signals.py
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.score}-star rating for {self.post.title}"
 
@@ -130,5 +321,194 @@ class PostRequest(models.Model):
     )
     created_at = models.DateTimeField(default=timezone.now)
 
+    objects = PostRequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='postrequest_created_idx'),
+            models.Index(fields=['client', 'created_at', 'id'], name='postrequest_client_idx'),
+        ]
+
+    def __str__(self):
+        return f"Request from {self.client.company_name} (Status: {self.status})"
+
+
+def _add_to_counters(queryset, lookup, deltas, create=True):
+    """
+    Atomically adds `deltas` (field name -> int) to the counter row matching
+    `lookup`, creating the row the first time it is needed.
+    """
+    updates = {field: models.F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+    # update() skips auto_now; report jobs use updated_at to detect changes
+    updates['updated_at'] = timezone.now()
+    with transaction.atomic():
+        if queryset.filter(**lookup).update(**updates) or not create:
+            return
+        try:
+            with transaction.atomic():
+                queryset.create(**lookup, **deltas)
+        except IntegrityError:
+            # Another request created the row first.
+            queryset.filter(**lookup).update(**updates)
+
+
+class ClientPostStatsQuerySet(ClientScopedQuerySet):
+    client_path = 'client'
+
+    def adjust(self, client_id, create=True, **deltas):
+        """
+        Atomically adds `deltas` (field name -> int) to a client's counters,
+        creating the row the first time the client needs one.
+        Pass create=False from delete handlers, where the client may be going away too.
+        """
+        _add_to_counters(self, {'client_id': client_id}, deltas, create=create)
+
+    def status_counts(self):
+        """
+        Sums the counters of every row in the queryset.
+        Returns the same {'ALL': n, '<STATUS>': n, ...} shape as Post.objects.status_counts().
+        """
+        totals = self.aggregate(**{
+            status: Coalesce(models.Sum(ClientPostStats.status_field(status)), 0)
+            for status in Post.Status.values
+        })
+        totals['ALL'] = sum(totals.values())
+        return totals
+
+
+class ClientPostStats(models.Model):
+    """
+    Denormalized per-client counters so reports don't have to COUNT(*) posts.
+    Kept up to date by core/signals.py and rebuilt by `manage.py reconcile_counters`.
+    """
+    client = models.OneToOneField(
+        ClientProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='post_stats'
+    )
+    draft_count = models.IntegerField(default=0)
+    pending_count = models.IntegerField(default=0)
+    approved_count = models.IntegerField(default=0)
+    rejected_count = models.IntegerField(default=0)
+    published_count = models.IntegerField(default=0)
+    archived_count = models.IntegerField(default=0)
+    feedback_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ClientPostStatsQuerySet.as_manager()
+
+    COUNTER_FIELDS = [
+        'draft_count', 'pending_count', 'approved_count', 'rejected_count',
+        'published_count', 'archived_count', 'feedback_count', 'rating_sum', 'rating_count',
+    ]
+
+    @staticmethod
+    def status_field(status):
+        """
+        Returns the counter field for a Post status, e.g. 'PENDING' -> 'pending_count'.
+        """
+        return f"{status.lower()}_count"
+
+    @classmethod
+    def total_posts_expression(cls, prefix=''):
+        """
+        Sum of every status counter, usable in annotate()/filter().
+        """
+        fields = [models.F(prefix + cls.status_field(status)) for status in Post.Status.values]
+        total = fields[0]
+        for field in fields[1:]:
+            total = total + field
+        return total
+
+    def __str__(self):
+        return f"Post stats for {self.client.company_name}"
+
+
+class ClientDailyStatsQuerySet(ClientScopedQuerySet):
+    client_path = 'client'
+
+    def adjust(self, client_id, date, create=True, **deltas):
+        """
+        Atomically adds `deltas` to a client's counters for `date`.
+        """
+        _add_to_counters(self, {'client_id': client_id, 'date': date}, deltas, create=create)
+
+    def between(self, start=None, end=None):
+        """
+        Rows from `start` to `end` inclusive; either bound may be None.
+        """
+        queryset = self
+        if start:
+            queryset = queryset.filter(date__gte=start)
+        if end:
+            queryset = queryset.filter(date__lte=end)
+        return queryset
+
+    def totals(self):
+        """
+        Sums every counter over the queryset: {'posts_created': n, ...}.
+        """
+        return self.order_by().aggregate(**{
+            field: Coalesce(models.Sum(field), 0) for field in ClientDailyStats.COUNTER_FIELDS
+        })
+
+
+class ClientDailyStats(models.Model):
+    """
+    Per-client, per-day activity rollup for the date-range reports.
+    Status columns count transitions made that day (e.g. posts_rejected is how
+    many rejections happened), so they don't change when a post moves on later.
+    Deleting a post removes its creation and transitions from the days they
+    were counted on. Kept up to date by core/signals.py and rebuilt by `manage.py backfill_daily_stats`.
+    """
+    client = models.ForeignKey(
+        ClientProfile,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    date = models.DateField()
+    posts_created = models.IntegerField(default=0)
+    posts_submitted = models.IntegerField(default=0)
+    posts_approved = models.IntegerField(default=0)
+    posts_rejected = models.IntegerField(default=0)
+    posts_published = models.IntegerField(default=0)
+    feedback_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ClientDailyStatsQuerySet.as_manager()
+
+    COUNTER_FIELDS = [
+        'posts_created', 'posts_submitted', 'posts_approved', 'posts_rejected',
+        'posts_published', 'feedback_count', 'rating_sum', 'rating_count',
+    ]
+
+    # Counter bumped when a post moves into each status.
+    TRANSITION_FIELDS = TRANSITION_FIELDS
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'date'], name='unique_client_daily_stats'),
+        ]
+        ordering = ['-date']
+
+    @staticmethod
+    def sum_between(field, start=None, end=None, prefix='daily_stats__'):
+        """
+        Sum(`field`) over the rollup rows between two dates, for annotating clients.
+        """
+        condition = models.Q()
+        if start:
+            condition &= models.Q(**{f'{prefix}date__gte': start})
+        if end:
+            condition &= models.Q(**{f'{prefix}date__lte': end})
+        return Coalesce(models.Sum(prefix + field, filter=condition), 0)
+
     def __str__(self):
-        return f"Request from {self.client.company_name} (Status: {self.status})"
\ No newline at end of file
+        return f"{self.client.company_name} on {self.date}"
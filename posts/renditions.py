@@ -0,0 +1,129 @@
+# posts/renditions.py
+
+"""
+Fixed-size renditions (thumb, feed, full) of Post.image in JPEG and WebP.
+
+Renditions are written next to the original upload, e.g.
+post_images/sale.jpg -> post_images/sale.thumb.jpg / post_images/sale.thumb.webp,
+and recorded on Post.image_renditions as {'thumb': {'jpeg': name, 'webp': name}, ...}.
+
+Resizing runs in a process pool so large uploads don't hold up requests.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from core.storage import is_content_addressed
+from .imaging import render_image
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'thumb': {'size': (160, 160), 'crop': True},
+    'feed': {'size': (720, 720), 'crop': False},
+    'full': {'size': (1600, 1600), 'crop': False},
+}
+
+FORMATS = {
+    'jpeg': {'format': 'JPEG', 'ext': 'jpg', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+    'webp': {'format': 'WEBP', 'ext': 'webp', 'options': {'quality': 80, 'method': 4}},
+}
+
+_executor = None
+
+
+def _get_executor(reset=False):
+    global _executor
+    if reset and _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+    if _executor is None:
+        # 'spawn' keeps the workers free of the parent's threads and DB connections.
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 2),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def rendition_name(image_name, size, fmt):
+    """
+    post_images/sale.jpg, 'thumb', 'webp' -> post_images/sale.thumb.webp
+    """
+    stem = os.path.splitext(image_name)[0]
+    return f"{stem}.{size}.{FORMATS[fmt]['ext']}"
+
+
+def _plan(image_name):
+    """
+    Returns (source path, outputs for render_image, renditions dict to record).
+    """
+    outputs = []
+    renditions = {}
+    for size, spec in RENDITIONS.items():
+        renditions[size] = {}
+        for fmt, fmt_spec in FORMATS.items():
+            name = rendition_name(image_name, size, fmt)
+            renditions[size][fmt] = name
+            outputs.append({
+                'path': default_storage.path(name),
+                'size': spec['size'],
+                'crop': spec['crop'],
+                'format': fmt_spec['format'],
+                'options': fmt_spec['options'],
+            })
+    return default_storage.path(image_name), outputs, renditions
+
+
+def _record(post_id, image_name, renditions):
+    # Only record if the post still has the image the renditions were made from.
+    Post.objects.filter(pk=post_id, image=image_name).update(image_renditions=renditions)
+
+
+def generate_renditions(post_id, image_name, force=False):
+    """
+    Renders the renditions of `image_name` in the process pool and records
+    them on the post when done. Returns the Future, or None when there
+    was nothing to render.
+    """
+    source_path, outputs, renditions = _plan(image_name)
+    if not force and is_content_addressed(image_name) and all(os.path.exists(o['path']) for o in outputs):
+        # The same content was uploaded before, so its renditions already exist.
+        _record(post_id, image_name, renditions)
+        return None
+    try:
+        future = _get_executor().submit(render_image, source_path, outputs)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool.
+        future = _get_executor(reset=True).submit(render_image, source_path, outputs)
+
+    def done(future):
+        try:
+            future.result()
+        except Exception:
+            logger.exception("Failed to render image renditions for post %s (%s).", post_id, image_name)
+            return
+        # Runs in the executor's thread, which keeps its own DB connection.
+        close_old_connections()
+        _record(post_id, image_name, renditions)
+
+    future.add_done_callback(done)
+    return future
+
+
+def generate_renditions_now(post_id, image_name):
+    """
+    Synchronous version of generate_renditions(), used by management commands.
+    """
+    source_path, outputs, renditions = _plan(image_name)
+    render_image(source_path, outputs)
+    _record(post_id, image_name, renditions)
+    return renditions
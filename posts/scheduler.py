@@ -0,0 +1,166 @@
+# posts/scheduler.py
+
+import heapq
+import logging
+import time
+import datetime
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from core.metrics import PUBLISH_DELAY
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def publish_due_posts(post_ids=None, now=None, batch_size=100):
+    """
+    Publishes APPROVED posts whose scheduled time has passed.
+    Each batch is saved in one transaction so the post_save signal
+    sends the PUBLISHED notification exactly once per post.
+    Returns the number of posts that were published.
+    """
+    now = now or timezone.now()
+
+    due_posts = Post.objects.filter(
+        status=Post.Status.APPROVED,
+        scheduled_datetime__lte=now
+    )
+    if post_ids is not None:
+        due_posts = due_posts.filter(id__in=post_ids)
+
+    published = 0
+    while True:
+        with transaction.atomic():
+            # Re-check the status inside the transaction so a post that was
+            # edited (or published by another worker) is never published twice.
+            batch = list(
+                due_posts.order_by('scheduled_datetime', 'id')[:batch_size]
+            )
+            for post in batch:
+                # No actor: the event records this as a system change.
+                post.set_status(Post.Status.PUBLISHED)
+                post.save(update_fields=['status', 'updated_at'])
+
+        published_at = timezone.now()
+        for post in batch:
+            PUBLISH_DELAY.observe(max((published_at - post.scheduled_datetime).total_seconds(), 0))
+        published += len(batch)
+        if len(batch) < batch_size:
+            return published
+
+
+class PublishScheduler:
+    """
+    Keeps a time-ordered queue of upcoming APPROVED posts and publishes
+    them when their scheduled_datetime is reached.
+
+    The queue only holds posts due before the next refresh, and it is
+    reloaded every `refresh_interval` seconds. In between, posts approved or
+    rescheduled since the last check are looked up every `poll_interval`
+    seconds, so a post moved earlier is still published on time.
+    """
+
+    # A post saved this long before a poll may only commit after it; look back that far.
+    POLL_OVERLAP = datetime.timedelta(seconds=5)
+
+    def __init__(self, batch_size=100, refresh_interval=60, poll_interval=5, stdout=None):
+        self.batch_size = batch_size
+        self.refresh_interval = refresh_interval
+        self.poll_interval = poll_interval
+        self.stdout = stdout
+        self.queue = []  # heap of (scheduled_datetime, post_id)
+        self.next_refresh = None
+        self.last_poll = None
+
+    def log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def refresh(self, now):
+        """
+        Reloads the queue with every APPROVED post due before the next refresh.
+        """
+        self.next_refresh = now + datetime.timedelta(seconds=self.refresh_interval)
+        self.last_poll = now
+        self.queue = list(
+            Post.objects.filter(
+                status=Post.Status.APPROVED,
+                scheduled_datetime__lte=self.next_refresh
+            ).values_list('scheduled_datetime', 'id')
+        )
+        heapq.heapify(self.queue)
+
+    def poll_changes(self, now):
+        """
+        Queues APPROVED posts saved since the last check that are due before
+        the next refresh. Entries left behind by rescheduled posts are
+        harmless: publish_due_posts() checks the current schedule again.
+        """
+        changed = Post.objects.filter(
+            status=Post.Status.APPROVED,
+            updated_at__gte=self.last_poll - self.POLL_OVERLAP,
+            scheduled_datetime__lte=self.next_refresh
+        ).values_list('scheduled_datetime', 'id')
+        self.last_poll = now
+        queued = set(self.queue)
+        for entry in changed:
+            if entry not in queued:
+                heapq.heappush(self.queue, entry)
+
+    def pop_due(self, now):
+        """
+        Removes and returns the IDs of every queued post that is due.
+        """
+        due_ids = []
+        while self.queue and self.queue[0][0] <= now:
+            due_ids.append(heapq.heappop(self.queue)[1])
+        return due_ids
+
+    def seconds_until_next_wakeup(self, now):
+        wakeup = min(self.next_refresh, self.last_poll + datetime.timedelta(seconds=self.poll_interval))
+        if self.queue and self.queue[0][0] < wakeup:
+            wakeup = self.queue[0][0]
+        return max((wakeup - now).total_seconds(), 0)
+
+    def run_once(self):
+        """
+        Publishes everything that is due right now.
+        Returns the number of posts that were published.
+        """
+        now = timezone.now()
+        if self.next_refresh is None or now >= self.next_refresh:
+            self.refresh(now)
+        elif now >= self.last_poll + datetime.timedelta(seconds=self.poll_interval):
+            self.poll_changes(now)
+
+        due_ids = self.pop_due(now)
+        if not due_ids:
+            return 0
+
+        published = publish_due_posts(post_ids=due_ids, now=now, batch_size=self.batch_size)
+        if published:
+            self.log(f"Published {published} post(s).")
+        return published
+
+    def run_forever(self):
+        """
+        Runs until interrupted. A failed iteration (e.g. the database was
+        locked or restarted) is logged and retried after `poll_interval`
+        seconds with a freshly loaded queue.
+        """
+        while True:
+            # Like the request cycle: drop connections that broke or outlived CONN_MAX_AGE.
+            close_old_connections()
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Publish scheduler run failed; retrying in %s seconds.", self.poll_interval)
+                # Posts popped from the queue weren't published; reload them.
+                self.next_refresh = None
+                delay = self.poll_interval
+            else:
+                delay = self.seconds_until_next_wakeup(timezone.now())
+            time.sleep(delay)
@@ -0,0 +1,213 @@
+# posts/search.py
+
+"""
+Full-text search over posts, feedback and post requests.
+
+Each searchable table has an SQLite FTS5 external-content index
+(<table>_fts) that stores only the token index, not a second copy of the
+text. Triggers keep it in sync with every INSERT, UPDATE and DELETE,
+including bulk queryset operations. `manage.py rebuild_search_index`
+rebuilds it from scratch.
+
+On databases other than SQLite, search returns no results.
+"""
+
+import re
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.urls import reverse
+
+from users.models import User, ClientProfile
+from .models import Post, Feedback, PostRequest
+
+# model -> indexed text columns; bm25 weights follow the same order
+SEARCH_INDEXES = {
+    Post: {'columns': ['title', 'caption'], 'weights': [5.0, 1.0]},
+    Feedback: {'columns': ['comment'], 'weights': [1.0]},
+    PostRequest: {'columns': ['request_details'], 'weights': [1.0]},
+}
+
+# Longest query accepted, in words
+MAX_QUERY_TERMS = 10
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def _index_statements(model, spec):
+    table = model._meta.db_table
+    fts = fts_table(model)
+    columns = ', '.join(spec['columns'])
+    new_values = ', '.join(f'new.{column}' for column in spec['columns'])
+    old_values = ', '.join(f'old.{column}' for column in spec['columns'])
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{columns}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def _trigger_names():
+    return {f"{fts_table(model)}_{suffix}" for model in SEARCH_INDEXES for suffix in ('ai', 'ad', 'au')}
+
+
+def create_search_index(connection, rebuild=True):
+    """
+    Creates any missing FTS tables and triggers, then (optionally) rebuilds
+    the indexes from the content tables. No-op on other databases.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for model, spec in SEARCH_INDEXES.items():
+            for statement in _index_statements(model, spec):
+                cursor.execute(statement)
+            if rebuild:
+                cursor.execute(f"INSERT INTO {fts_table(model)}({fts_table(model)}) VALUES ('rebuild')")
+
+
+def drop_search_index(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in _trigger_names():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        for model in SEARCH_INDEXES:
+            cursor.execute(f"DROP TABLE IF EXISTS {fts_table(model)}")
+
+
+def ensure_search_index(using=DEFAULT_DB_ALIAS):
+    """
+    Recreates the triggers if something dropped them and rebuilds the index.
+    SQLite schema changes copy the table, which silently drops its triggers,
+    so this runs after every migrate.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+    if _trigger_names() <= existing:
+        return False
+    create_search_index(connection)
+    return True
+
+
+def fts_query(text):
+    """
+    Turns free text into an FTS5 query: every word must match, and the last
+    word also matches as a prefix so results appear while typing.
+    Returns None when there is nothing to search for.
+    """
+    terms = re.findall(r'\w+', text or '')[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _scope(user, client_column):
+    """
+    SQL condition (and params) limiting `client_column` to the user's clients.
+    """
+    if user.role == User.Role.SUPER_ADMIN:
+        return '', []
+    if user.role == User.Role.CLIENT:
+        # ClientProfile's primary key is its user
+        return f" AND {client_column} = %s", [user.pk]
+    field = ClientProfile.assigned_admins.field
+    return (
+        f" AND {client_column} IN (SELECT {field.m2m_column_name()} FROM {field.m2m_db_table()}"
+        f" WHERE {field.m2m_reverse_name()} = %s)",
+        [user.pk]
+    )
+
+
+def _ranked(cursor, model, select, joins, where, params, limit):
+    spec = SEARCH_INDEXES[model]
+    fts = fts_table(model)
+    weights = ', '.join(str(weight) for weight in spec['weights'])
+    cursor.execute(
+        f"SELECT {select}, snippet({fts}, -1, '', '', '…', 12), bm25({fts}, {weights}) AS rank "
+        f"FROM {fts} {joins} WHERE {fts} MATCH %s{where} ORDER BY rank LIMIT %s",
+        params + [limit]
+    )
+    return cursor.fetchall()
+
+
+def search(user, text, limit=20):
+    """
+    Ranked matches the user is allowed to see, best first, as dicts with
+    type, id, title, snippet, url and rank (lower is better, as in bm25).
+    """
+    query = fts_query(text)
+    connection = connections[DEFAULT_DB_ALIAS]
+    if query is None or connection.vendor != 'sqlite':
+        return []
+
+    is_client = user.role == User.Role.CLIENT
+    post_table = Post._meta.db_table
+    results = []
+
+    with connection.cursor() as cursor:
+        # Posts (clients never see drafts)
+        where, params = _scope(user, 'p.assigned_client_id')
+        if is_client:
+            where += " AND p.status != %s"
+            params.append(Post.Status.DRAFT)
+        rows = _ranked(
+            cursor, Post, 'p.id, p.title',
+            f"JOIN {post_table} p ON p.id = {fts_table(Post)}.rowid",
+            where, [query] + params, limit
+        )
+        for post_id, title, snippet, rank in rows:
+            results.append({'type': 'post', 'id': post_id, 'title': title, 'snippet': snippet, 'rank': rank})
+
+        # Feedback, shown as the post it was left on
+        where, params = _scope(user, 'p.assigned_client_id')
+        rows = _ranked(
+            cursor, Feedback, 'f.post_id, p.title',
+            f"JOIN {Feedback._meta.db_table} f ON f.id = {fts_table(Feedback)}.rowid "
+            f"JOIN {post_table} p ON p.id = f.post_id",
+            where, [query] + params, limit
+        )
+        for post_id, title, snippet, rank in rows:
+            results.append({'type': 'feedback', 'id': post_id, 'title': title, 'snippet': snippet, 'rank': rank})
+
+        # Post requests
+        where, params = _scope(user, 'r.client_id')
+        rows = _ranked(
+            cursor, PostRequest, 'r.id, c.company_name',
+            f"JOIN {PostRequest._meta.db_table} r ON r.id = {fts_table(PostRequest)}.rowid "
+            f"JOIN {ClientProfile._meta.db_table} c ON c.user_id = r.client_id",
+            where, [query] + params, limit
+        )
+        for request_id, company_name, snippet, rank in rows:
+            results.append({
+                'type': 'request', 'id': request_id, 'title': f"Request from {company_name}",
+                'snippet': snippet, 'rank': rank
+            })
+
+    results.sort(key=lambda result: result['rank'])
+    results = results[:limit]
+
+    # One reverse() per link type, not per result
+    if is_client:
+        post_url = reverse('posts:client_post_detail', args=[0]).replace('/0/', '/{}/')
+        request_url = None
+    else:
+        post_url = reverse('posts:edit_post', args=[0]).replace('/0/', '/{}/')
+        request_url = reverse('posts:create_post') + '?request_id={}'
+    for result in results:
+        url = request_url if result['type'] == 'request' else post_url
+        result['url'] = url.format(result['id']) if url else None
+    return results
@@ -0,0 +1,56 @@
+# posts/templatetags/post_images.py
+
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from posts.renditions import rendition_name
+
+register = template.Library()
+
+
+def _rendition(post, size, fmt):
+    """
+    Returns the file name of a rendition, or None if it isn't ready.
+    Renditions left over from a replaced image are ignored.
+    """
+    name = (post.image_renditions or {}).get(size, {}).get(fmt)
+    if name and name == rendition_name(post.image.name, size, fmt):
+        return name
+    return None
+
+
+@register.simple_tag
+def rendition_url(post, size, fmt='jpeg'):
+    """
+    URL of a post image rendition, falling back to the original upload.
+    Usage: {% rendition_url post 'thumb' %}
+    """
+    name = _rendition(post, size, fmt)
+    return default_storage.url(name) if name else post.image.url
+
+
+@register.simple_tag
+def post_picture(post, size, **attrs):
+    """
+    Renders a post image at the given rendition size: a <picture> with a
+    WebP source and JPEG fallback, or the original upload until the
+    renditions exist. Extra keyword arguments become <img> attributes.
+    Usage: {% post_picture post 'feed' alt=post.title class='rounded' %}
+    """
+    jpeg = _rendition(post, size, 'jpeg')
+    webp = _rendition(post, size, 'webp')
+
+    img = format_html(
+        '<img src="{}"{} />',
+        default_storage.url(jpeg) if jpeg else post.image.url,
+        flatatt(attrs)
+    )
+    if not webp:
+        return img
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" />{}</picture>',
+        default_storage.url(webp),
+        img
+    )
@@ -1,3 +1,490 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError
+from django.db.models import Count, Q
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.counters import compute_daily_stats
+from PIL import Image
+
+from posts import renditions, scheduler
+from posts.imaging import render_image
+from posts.search import search
+from posts.models import Post, PostRequest, PostStatusEvent, Feedback, Rating, ClientPostStats, ClientDailyStats
+from users.models import User, ClientProfile
+
+
+class PostTestMixin:
+
+    def setUp(self):
+        # Audit entries are written inline; rendition tests render explicitly
+        side_effects = override_settings(AUDIT_LOG_SYNC=True, IMAGE_RENDITIONS_ON_UPLOAD=False)
+        side_effects.enable()
+        self.addCleanup(side_effects.disable)
+        self.admin = User.objects.create_user('admin', password='pass', role=User.Role.ADMIN)
+        self.client_user = User.objects.create_user('client', password='pass', role=User.Role.CLIENT)
+        self.client_profile = ClientProfile.objects.create(user=self.client_user, company_name='Acme')
+        self.client_profile.assigned_admins.add(self.admin)
+
+    def create_post(self, title='Launch', status=Post.Status.DRAFT, client_profile=None, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            fields.setdefault('image', 'post_images/sale.jpg')
+            post = Post.objects.create(
+                title=title, caption='Caption',
+                created_by=self.admin, assigned_client=client_profile or self.client_profile,
+                status=status, **fields
+            )
+        # Reload like a view would, so the loaded status is known
+        return Post.objects.get(pk=post.pk)
+
+
+class PostCounterTests(PostTestMixin, TestCase):
+
+    def test_status_change_moves_the_counters(self):
+        post = self.create_post()
+        post.set_status(Post.Status.PENDING, actor=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+
+        stats = ClientPostStats.objects.get(client=self.client_profile)
+        self.assertEqual((stats.draft_count, stats.pending_count), (0, 1))
+
+    def test_failed_counter_write_rolls_back_the_status_change(self):
+        post = self.create_post()
+        post.set_status(Post.Status.PENDING, actor=self.admin)
+
+        with mock.patch.object(ClientPostStats.objects, 'adjust', side_effect=DatabaseError("disk I/O error")):
+            with self.assertRaises(DatabaseError):
+                post.save()
+
+        self.assertEqual(Post.objects.get(pk=post.pk).status, Post.Status.DRAFT)
+        self.assertFalse(PostStatusEvent.objects.filter(post=post, to_status=Post.Status.PENDING).exists())
+        stats = ClientPostStats.objects.get(client=self.client_profile)
+        self.assertEqual((stats.draft_count, stats.pending_count), (1, 0))
+
+
+class PostStatusEventTests(PostTestMixin, TestCase):
+
+    def test_failed_event_write_rolls_back_the_status_change(self):
+        post = self.create_post()
+        post.set_status(Post.Status.PENDING, actor=self.admin)
+
+        with mock.patch.object(PostStatusEvent.objects, 'create', side_effect=DatabaseError("disk I/O error")):
+            with self.assertRaises(DatabaseError):
+                post.save()
+
+        self.assertEqual(Post.objects.get(pk=post.pk).status, Post.Status.DRAFT)
+        self.assertEqual(
+            list(PostStatusEvent.objects.filter(post=post).values_list('to_status', flat=True)),
+            [Post.Status.DRAFT]
+        )
+
+    def test_events_cannot_be_rewritten(self):
+        post = self.create_post()
+        event = PostStatusEvent.objects.get(post=post)
+
+        for rewrite in [
+            event.save,
+            event.delete,
+            lambda: PostStatusEvent.objects.filter(post=post).update(to_status=Post.Status.APPROVED),
+            lambda: PostStatusEvent.objects.filter(post=post).delete(),
+        ]:
+            with self.assertRaises(ValueError):
+                rewrite()
+        self.assertEqual(PostStatusEvent.objects.get(post=post).to_status, Post.Status.DRAFT)
+
+    def test_deleting_the_post_or_actor_still_works(self):
+        post = self.create_post()
+        post.set_status(Post.Status.PENDING, actor=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+
+        self.admin.delete()
+        self.assertIsNone(PostStatusEvent.objects.get(post=post, to_status=Post.Status.PENDING).actor)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertFalse(PostStatusEvent.objects.exists())
+
+
+class DailyStatsTests(PostTestMixin, TestCase):
+
+    def move(self, post, *statuses):
+        for status in statuses:
+            post.set_status(status, actor=self.admin)
+            with self.captureOnCommitCallbacks(execute=True):
+                post.save()
+
+    def rollup(self):
+        return {
+            (row.client_id, row.date): {field: getattr(row, field) for field in ClientDailyStats.COUNTER_FIELDS}
+            for row in ClientDailyStats.objects.all()
+            if any(getattr(row, field) for field in ClientDailyStats.COUNTER_FIELDS)
+        }
+
+    def recomputed(self):
+        stats = compute_daily_stats(Post, Feedback, Rating, event_model=PostStatusEvent)
+        return {
+            key: {field: counters.get(field, 0) for field in ClientDailyStats.COUNTER_FIELDS}
+            for key, counters in stats.items()
+        }
+
+    def test_rollup_matches_the_backfill_after_deletes(self):
+        kept = self.create_post('Kept')
+        self.move(kept, Post.Status.PENDING, Post.Status.APPROVED)
+        rejected = self.create_post('Rejected')
+        self.move(rejected, Post.Status.PENDING, Post.Status.REJECTED, Post.Status.PENDING)
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(post=rejected, user=self.client_user, comment='Too long')
+            Rating.objects.create(post=rejected, user=self.client_user, score=2)
+        # A post from before the event log: only its current status is known
+        legacy = self.create_post('Legacy')
+        self.move(legacy, Post.Status.PENDING)
+        PostStatusEvent._base_manager.filter(post=legacy).delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rejected.delete()
+            legacy.delete()
+
+        self.assertEqual(self.rollup(), self.recomputed())
+        totals = ClientDailyStats.objects.totals()
+        self.assertEqual(
+            (totals['posts_created'], totals['posts_submitted'], totals['posts_approved'], totals['posts_rejected']),
+            (1, 1, 1, 0)
+        )
+
+        incremental = self.rollup()
+        call_command('backfill_daily_stats', stdout=io.StringIO())
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_client_analytics_counts_posts_and_submissions_separately(self):
+        resubmitted = self.create_post('Resubmitted')
+        self.move(resubmitted, Post.Status.PENDING, Post.Status.REJECTED, Post.Status.PENDING)
+        self.create_post('Draft')
+
+        self.client.force_login(self.client_user)
+        with self.settings(REPLICA_ENABLED=False):
+            response = self.client.get(reverse('core:client_analytics'))
+        self.assertEqual((response.context['total_posts_count'], response.context['submitted_count']), (1, 2))
+
+
+class PublishSchedulerTests(PostTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+
+    def at(self, seconds):
+        """Runs the code under the with block as if `seconds` had passed since setUp."""
+        return mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(seconds=seconds))
+
+    def create_approved_post(self, due_in):
+        return self.create_post(
+            status=Post.Status.APPROVED, scheduled_datetime=self.now + datetime.timedelta(seconds=due_in)
+        )
+
+    def publish(self, publish_scheduler):
+        with self.captureOnCommitCallbacks(execute=True):
+            return publish_scheduler.run_once()
+
+    def test_due_post_is_published(self):
+        post = self.create_approved_post(due_in=30)
+        publish_scheduler = scheduler.PublishScheduler()
+
+        with self.at(0):
+            self.assertEqual(self.publish(publish_scheduler), 0)
+        with self.at(31):
+            self.assertEqual(self.publish(publish_scheduler), 1)
+
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.Status.PUBLISHED)
+
+    def test_post_moved_earlier_is_published_before_the_next_refresh(self):
+        post = self.create_approved_post(due_in=2 * 3600)
+        publish_scheduler = scheduler.PublishScheduler(refresh_interval=3600, poll_interval=5)
+        with self.at(0):
+            self.publish(publish_scheduler)
+
+        with self.at(10):
+            post.scheduled_datetime = self.now + datetime.timedelta(seconds=20)
+            with self.captureOnCommitCallbacks(execute=True):
+                post.save()
+            self.assertEqual(publish_scheduler.seconds_until_next_wakeup(timezone.now()), 0)
+        with self.at(20):
+            self.assertEqual(self.publish(publish_scheduler), 1)
+
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.Status.PUBLISHED)
+
+    def test_failed_run_is_logged_and_retried(self):
+        post = self.create_approved_post(due_in=-60)
+        publish_scheduler = scheduler.PublishScheduler(poll_interval=7)
+
+        class Stop(Exception):
+            pass
+
+        errors = iter([OperationalError("database is locked")])
+        publish_due_posts = scheduler.publish_due_posts
+
+        def flaky_publish(**kwargs):
+            error = next(errors, None)
+            if error:
+                raise error
+            return publish_due_posts(**kwargs)
+
+        with mock.patch.object(scheduler, 'publish_due_posts', side_effect=flaky_publish), \
+                mock.patch.object(scheduler, 'close_old_connections') as close_old_connections, \
+                mock.patch.object(scheduler.time, 'sleep', side_effect=[None, Stop]) as sleep, \
+                self.assertLogs('posts.scheduler', 'ERROR'):
+            with self.assertRaises(Stop):
+                with self.captureOnCommitCallbacks(execute=True):
+                    publish_scheduler.run_forever()
+
+        self.assertEqual(sleep.call_args_list[0], mock.call(7))
+        self.assertEqual(close_old_connections.call_count, 2)
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.Status.PUBLISHED)
+
+
+class StatusCountsTests(PostTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for title, status in [
+            ('One', Post.Status.DRAFT), ('Two', Post.Status.PENDING),
+            ('Three', Post.Status.PENDING), ('Four', Post.Status.PUBLISHED),
+        ]:
+            self.create_post(title, status)
+
+    def test_every_status_is_counted_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = Post.objects.status_counts(captioned=Count('pk', filter=Q(caption='Caption')))
+
+        self.assertEqual(counts, {
+            'ALL': 4, 'DRAFT': 1, 'PENDING': 2, 'APPROVED': 0, 'REJECTED': 0,
+            'PUBLISHED': 1, 'ARCHIVED': 0, 'captioned': 4,
+        })
+        self.assertEqual(Post.objects.filter(title='Two').status_counts()['PENDING'], 1)
+
+    def test_post_requests_are_counted_by_their_own_statuses(self):
+        PostRequest.objects.create(client=self.client_profile, request_details='Launch teaser')
+        PostRequest.objects.create(
+            client=self.client_profile, request_details='Sale', status=PostRequest.Status.COMPLETED
+        )
+
+        self.assertEqual(
+            PostRequest.objects.status_counts(),
+            {'ALL': 2, 'PENDING': 1, 'VIEWED': 0, 'COMPLETED': 1}
+        )
+
+    def test_client_counters_give_the_same_counts(self):
+        expected = Post.objects.status_counts()
+        self.assertEqual(ClientPostStats.objects.filter(client=self.client_profile).status_counts(), expected)
+
+
+class VisibleToTests(PostTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.super_admin = User.objects.create_user('super', password='pass', role=User.Role.SUPER_ADMIN)
+        self.other_admin = User.objects.create_user('other-admin', password='pass', role=User.Role.ADMIN)
+        other_user = User.objects.create_user('other', password='pass', role=User.Role.CLIENT)
+        self.other_profile = ClientProfile.objects.create(user=other_user, company_name='Globex')
+        self.other_profile.assigned_admins.add(self.other_admin)
+        # A second admin on Acme must not duplicate Acme's rows
+        self.client_profile.assigned_admins.add(self.other_admin)
+
+        self.draft = self.create_post('Draft')
+        self.pending = self.create_post('Pending', status=Post.Status.PENDING)
+        self.other = self.create_post('Other', status=Post.Status.PENDING, client_profile=self.other_profile)
+        for post, user in ((self.pending, self.client_user), (self.other, other_user)):
+            Feedback.objects.create(post=post, user=user, comment='Comment')
+            Rating.objects.create(post=post, user=user, score=4)
+        self.request = PostRequest.objects.create(client=self.client_profile, request_details='Request')
+        self.other_request = PostRequest.objects.create(client=self.other_profile, request_details='Request')
+
+    def visible(self, queryset, user):
+        return sorted(queryset.visible_to(user).values_list('pk', flat=True))
+
+    def test_posts(self):
+        posts = Post.objects.all()
+        self.assertEqual(self.visible(posts, self.super_admin), sorted([self.draft.pk, self.pending.pk, self.other.pk]))
+        self.assertEqual(self.visible(posts, self.admin), sorted([self.draft.pk, self.pending.pk]))
+        self.assertEqual(self.visible(posts, self.other_admin), sorted([self.draft.pk, self.pending.pk, self.other.pk]))
+        # Clients never see drafts
+        self.assertEqual(self.visible(posts, self.client_user), [self.pending.pk])
+
+    def test_rows_reached_through_the_post(self):
+        for model in (Feedback, Rating, PostStatusEvent):
+            with self.subTest(model=model.__name__):
+                rows = model.objects.all()
+                own = sorted(rows.filter(post__assigned_client=self.client_profile).values_list('pk', flat=True))
+                self.assertTrue(own)
+                self.assertEqual(self.visible(rows, self.super_admin), sorted(rows.values_list('pk', flat=True)))
+                self.assertEqual(self.visible(rows, self.admin), own)
+                self.assertEqual(self.visible(rows, self.client_user), own)
+
+    def test_post_requests_and_client_profiles(self):
+        requests = PostRequest.objects.all()
+        self.assertEqual(self.visible(requests, self.admin), [self.request.pk])
+        self.assertEqual(self.visible(requests, self.other_admin), sorted([self.request.pk, self.other_request.pk]))
+        self.assertEqual(self.visible(requests, self.client_user), [self.request.pk])
+
+        profiles = ClientProfile.objects.all()
+        self.assertEqual(self.visible(profiles, self.admin), [self.client_profile.pk])
+        self.assertEqual(self.visible(profiles, self.client_user), [self.client_profile.pk])
+        self.assertEqual(len(self.visible(profiles, self.super_admin)), 2)
+
+    def test_admin_without_clients_sees_nothing(self):
+        lonely = User.objects.create_user('lonely', password='pass', role=User.Role.ADMIN)
+        for queryset in (Post.objects.all(), PostRequest.objects.all(), Feedback.objects.all(), ClientProfile.objects.all()):
+            self.assertEqual(self.visible(queryset, lonely), [])
+
+
+class SearchTests(PostTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.super_admin = User.objects.create_user('super', password='pass', role=User.Role.SUPER_ADMIN)
+        other_user = User.objects.create_user('other', password='pass', role=User.Role.CLIENT)
+        self.other_profile = ClientProfile.objects.create(user=other_user, company_name='Globex')
+
+        self.approved = self.create_post('Autumn harvest sale', status=Post.Status.APPROVED)
+        self.draft = self.create_post('Autumn draft teaser')
+        self.other = self.create_post('Autumn launch', status=Post.Status.APPROVED, client_profile=self.other_profile)
+        Feedback.objects.create(post=self.approved, user=self.client_user, comment='Use a pumpkin photo')
+        Feedback.objects.create(post=self.other, user=other_user, comment='Needs pumpkin spice')
+        PostRequest.objects.create(client=self.client_profile, request_details='Pumpkin giveaway')
+        PostRequest.objects.create(client=self.other_profile, request_details='Pumpkin contest')
+
+    def found(self, user, text):
+        return sorted((result['type'], result['id']) for result in search(user, text))
+
+    def test_super_admin_sees_every_client(self):
+        self.assertEqual(
+            self.found(self.super_admin, 'autumn'),
+            sorted(('post', post.pk) for post in (self.approved, self.draft, self.other))
+        )
+        self.assertEqual(len(self.found(self.super_admin, 'pumpkin')), 4)
+
+    def test_admin_sees_only_assigned_clients(self):
+        self.assertEqual(
+            self.found(self.admin, 'autumn'), sorted([('post', self.approved.pk), ('post', self.draft.pk)])
+        )
+        request = PostRequest.objects.get(client=self.client_profile)
+        self.assertEqual(
+            self.found(self.admin, 'pumpkin'), sorted([('feedback', self.approved.pk), ('request', request.pk)])
+        )
+
+    def test_client_sees_own_posts_without_drafts(self):
+        self.assertEqual(self.found(self.client_user, 'autumn'), [('post', self.approved.pk)])
+
+        self.client.force_login(self.client_user)
+        response = self.client.get(reverse('posts:search'), {'q': 'autumn'})
+        self.assertEqual(
+            [result['url'] for result in response.json()['results']],
+            [reverse('posts:client_post_detail', args=[self.approved.pk])]
+        )
+
+    def test_prefix_match_on_the_last_word(self):
+        self.assertEqual(self.found(self.client_user, 'autumn harv'), [('post', self.approved.pk)])
+        self.assertEqual(search(self.super_admin, '  !? '), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.approved.title = 'Winter clearance'
+        self.approved.save()
+        self.assertNotIn(('post', self.approved.pk), self.found(self.super_admin, 'autumn'))
+        self.assertEqual(self.found(self.super_admin, 'winter'), [('post', self.approved.pk)])
+
+        # Bulk queryset operations skip save(), but the triggers still run
+        Post.objects.filter(pk=self.other.pk).update(caption='Frost warning')
+        self.assertEqual(self.found(self.super_admin, 'frost'), [('post', self.other.pk)])
+        PostRequest.objects.filter(client=self.other_profile).delete()
+        self.assertEqual(len(self.found(self.super_admin, 'contest')), 0)
+
+        self.draft.delete()
+        self.assertEqual(self.found(self.super_admin, 'autumn'), [('post', self.other.pk)])
+        self.assertEqual(self.found(self.super_admin, 'winter'), [('post', self.approved.pk)])
+
+
+class RenditionTests(PostTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.directory = directory.name
+
+    def png(self, size=(800, 400), mode='RGBA'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30, 0) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue(), name='banner.png')
+
+    def test_render_image_crops_fits_and_flattens(self):
+        source = os.path.join(self.directory, 'source.png')
+        with open(source, 'wb') as f:
+            f.write(self.png().read())
+        thumb, feed = os.path.join(self.directory, 'thumb.jpg'), os.path.join(self.directory, 'feed.webp')
+
+        render_image(source, [
+            {'path': thumb, 'size': (160, 160), 'crop': True, 'format': 'JPEG', 'options': {}},
+            {'path': feed, 'size': (720, 720), 'crop': False, 'format': 'WEBP', 'options': {}},
+        ])
+
+        with Image.open(thumb) as image:
+            self.assertEqual((image.size, image.mode), ((160, 160), 'RGB'))
+            # Transparent pixels are pasted onto white
+            self.assertEqual(image.getpixel((80, 80)), (255, 255, 255))
+        with Image.open(feed) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (720, 360)))
+
+    def test_renditions_are_written_and_recorded(self):
+        post = self.create_post(image=self.png())
+
+        recorded = renditions.generate_renditions_now(post.pk, post.image.name)
+
+        post.refresh_from_db()
+        self.assertEqual(post.image_renditions, recorded)
+        self.assertEqual(set(recorded), set(renditions.RENDITIONS))
+        self.assertEqual(
+            recorded['thumb']['webp'], renditions.rendition_name(post.image.name, 'thumb', 'webp')
+        )
+        for formats in recorded.values():
+            for name in formats.values():
+                self.assertTrue(os.path.exists(os.path.join(self.directory, name)))
+
+        # Same content uploaded again: the existing renditions are reused without the pool
+        other = self.create_post('Again', image=self.png())
+        self.assertEqual(other.image.name, post.image.name)
+        with mock.patch.object(renditions, '_get_executor') as get_executor:
+            self.assertIsNone(renditions.generate_renditions(other.pk, other.image.name))
+        get_executor.assert_not_called()
+        other.refresh_from_db()
+        self.assertEqual(other.image_renditions, recorded)
+
+    def test_picture_falls_back_to_the_original_until_renditions_exist(self):
+        post = self.create_post(image=self.png())
+        template = Template("{% load post_images %}{% post_picture post 'feed' alt='Banner' %}")
+
+        html = template.render(Context({'post': post}))
+        self.assertNotIn('<picture>', html)
+        self.assertIn(post.image.url, html)
+
+        renditions.generate_renditions_now(post.pk, post.image.name)
+        post.refresh_from_db()
+        html = template.render(Context({'post': post}))
+        self.assertIn('<picture><source type="image/webp"', html)
+        self.assertIn(renditions.rendition_name(post.image.name, 'feed', 'jpeg'), html)
+        self.assertIn('alt="Banner"', html)
@@ -16,6 +16,7 @@ urlpatterns = [
     path('<int:post_id>/', views.client_post_detail_view, name='client_post_detail'),
     path('admin/requests/', views.admin_post_request_list_view, name='admin_request_list'),
     path('mark-pending/<int:post_id>/', views.mark_post_pending_view, name='mark_post_pending'),
+    path('search/', views.search_view, name='search'),
 
     
 ]
\ No newline at end of file
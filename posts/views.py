@@ -2,11 +2,17 @@
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.contrib.auth.decorators import user_passes_test
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
 from .forms import PostCreationForm, PostEditForm, PostRequestForm, RatingForm
 from .models import Post, Feedback, PostRequest
 from users.models import User, ClientProfile
-from django.utils import timezone
+from core.pagination import KeysetPaginator
+from core.permissions import can_access_client
+from .search import search
+
+# Rows per page on the admin post and request lists
+POSTS_PER_PAGE = 25
 
 # --- Role Check Functions ---
 def is_admin_or_superadmin(user):   
@@ -41,10 +47,9 @@ def create_post_view(request):
             }
             
             # Security check
-            if request.user.role == User.Role.ADMIN:
-                if client_profile not in ClientProfile.objects.filter(assigned_admins=request.user):
-                    messages.error(request, "You are not assigned to this client.")
-                    return redirect('posts:admin_request_list')
+            if not can_access_client(request.user, client_profile.pk):
+                messages.error(request, "You are not assigned to this client.")
+                return redirect('posts:admin_request_list')
 
             # --- FIX #2: Mark as "VIEWED" on GET (when you open the page) ---
             if post_request.status == PostRequest.Status.PENDING:
@@ -68,7 +73,7 @@ def create_post_view(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.created_by = request.user
-            post.status = Post.Status.DRAFT
+            post.set_status(Post.Status.DRAFT, request.user)
             post.save() 
             
             post_request_id = request.POST.get('post_request_id', None)
@@ -125,7 +130,7 @@ def client_review_post_view(request):
             return redirect('core:client_dashboard')
 
         if action == 'approve':
-            post.status = Post.Status.APPROVED
+            post.set_status(Post.Status.APPROVED, request.user)
             post.save()
             
             # --- ✅ NEW LOGIC: UPDATE THE POST REQUEST ---
@@ -156,7 +161,7 @@ def client_review_post_view(request):
                 # Go back to the page they were on
                 return redirect(request.META.get('HTTP_REFERER', 'core:client_dashboard'))
 
-            post.status = Post.Status.REJECTED
+            post.set_status(Post.Status.REJECTED, request.user)
             post.save()
             
             Feedback.objects.create(post=post, user=request.user, comment=comment_text)
@@ -182,11 +187,9 @@ def view_post_view(request, post_id):
     feedbacks = post.feedback.all().order_by('-created_at')
 
     # Check if admin is allowed to see this post
-    if request.user.role == User.Role.ADMIN:
-        admin_clients = ClientProfile.objects.filter(assigned_admins=request.user)
-        if post.assigned_client not in admin_clients:
-            messages.error(request, "You are not authorized to view this post.")
-            return redirect('posts:post_list')
+    if not can_access_client(request.user, post.assigned_client_id):
+        messages.error(request, "You are not authorized to view this post.")
+        return redirect('posts:post_list')
 
     context = {
         'post': post,
@@ -201,17 +204,15 @@ def edit_post_view(request, post_id):
     """
     post = get_object_or_404(Post, id=post_id)
 
-    if request.user.role == User.Role.ADMIN:
-        admin_clients = ClientProfile.objects.filter(assigned_admins=request.user)
-        if post.assigned_client not in admin_clients:
-            messages.error(request, "You do not have permission to edit this post.")
-            return redirect('core:dashboard')
+    if not can_access_client(request.user, post.assigned_client_id):
+        messages.error(request, "You do not have permission to edit this post.")
+        return redirect('core:dashboard')
 
     if request.method == 'POST':
         form = PostEditForm(request.POST, request.FILES, instance=post)
         if form.is_valid():
             edited_post = form.save(commit=False)
-            edited_post.status = Post.Status.PENDING
+            edited_post.set_status(Post.Status.PENDING, request.user)
             edited_post.save()
             messages.success(request, f'Post "{edited_post.title}" has been updated and resubmitted for approval.')
             return redirect('core:dashboard')
@@ -237,14 +238,12 @@ def mark_post_pending_view(request, post_id):
     post = get_object_or_404(Post, id=post_id)
 
     # ✅ Permission check (only assigned admin or super_admin)
-    if request.user.role == User.Role.ADMIN:
-        admin_clients = ClientProfile.objects.filter(assigned_admins=request.user)
-        if post.assigned_client not in admin_clients:
-            messages.error(request, "You do not have permission to modify this post.")
-            return redirect('posts:post_list')
+    if not can_access_client(request.user, post.assigned_client_id):
+        messages.error(request, "You do not have permission to modify this post.")
+        return redirect('posts:post_list')
 
     if post.status == Post.Status.DRAFT:
-        post.status = Post.Status.PENDING
+        post.set_status(Post.Status.PENDING, request.user)
         post.save()
         messages.success(request, f'Post "{post.title}" is now marked as ready for client review.')
     else:
@@ -259,11 +258,9 @@ def delete_post_view(request, post_id):
     """
     post = get_object_or_404(Post, id=post_id)
 
-    if request.user.role == User.Role.ADMIN:
-        allowed_clients = ClientProfile.objects.filter(assigned_admins=request.user)
-        if post.assigned_client not in allowed_clients:
-            messages.error(request, "You don't have permission to delete this post.")
-            return redirect('posts:post_list')
+    if not can_access_client(request.user, post.assigned_client_id):
+        messages.error(request, "You don't have permission to delete this post.")
+        return redirect('posts:post_list')
 
     if request.method == 'POST':
         post_title = post.title
@@ -280,36 +277,26 @@ def post_list_view(request):
     """
     Displays a list of all posts, filterable by status.
     """
-    Post.objects.filter(status=Post.Status.APPROVED, scheduled_datetime__lte=timezone.now()).update(status=Post.Status.PUBLISHED)
-
     user = request.user
     
     status_filter = request.GET.get('status', 'ALL')
 
-    if user.role == User.Role.SUPER_ADMIN:
-        base_queryset = Post.objects.all()
-    else:
-        admin_clients = ClientProfile.objects.filter(assigned_admins=user)
-        base_queryset = Post.objects.filter(assigned_client__in=admin_clients)
+    base_queryset = Post.objects.visible_to(user)
 
     if status_filter == 'ALL' or not status_filter:
-        filtered_posts = base_queryset.all()
+        filtered_posts = base_queryset.for_list()
     else:
-        filtered_posts = base_queryset.filter(status=status_filter)
+        filtered_posts = base_queryset.for_list().filter(status=status_filter)
         
-    filtered_posts = filtered_posts.order_by('-updated_at')
+    # Cursor pagination: every page is one indexed range scan, no COUNT/OFFSET
+    posts_page = KeysetPaginator(
+        filtered_posts, ('-updated_at', '-id'), per_page=POSTS_PER_PAGE
+    ).get_page(request.GET.get('cursor'))
     
-    status_counts = {
-        'ALL': base_queryset.count(),
-        'DRAFT': base_queryset.filter(status=Post.Status.DRAFT).count(),
-        'PENDING': base_queryset.filter(status=Post.Status.PENDING).count(),
-        'APPROVED': base_queryset.filter(status=Post.Status.APPROVED).count(),
-        'REJECTED': base_queryset.filter(status=Post.Status.REJECTED).count(),
-        'PUBLISHED': base_queryset.filter(status=Post.Status.PUBLISHED).count(),
-    }
+    status_counts = base_queryset.status_counts()
 
     context = {
-        'posts': filtered_posts,
+        'posts': posts_page,
         'status_counts': status_counts,
         'current_status': status_filter,
     }
@@ -325,44 +312,33 @@ def admin_post_request_list_view(request):
     user = request.user
     status_filter = request.GET.get('status', 'ALL')
 
-    # 1. --- Role-Based Base Queryset (Mirrors your logic) ---
-    if user.role == User.Role.SUPER_ADMIN:
-        # SuperAdmin sees all requests
-        base_queryset = PostRequest.objects.all()
-    else:
-        # Admin only sees requests from their assigned clients
-        try:
-            admin_clients = ClientProfile.objects.filter(assigned_admins=user)
-            base_queryset = PostRequest.objects.filter(client__in=admin_clients)
-        except ClientProfile.DoesNotExist:
-            base_queryset = PostRequest.objects.none()
+    # 1. --- Role-Based Base Queryset ---
+    # SuperAdmin sees all requests, Admin only those from their assigned clients
+    base_queryset = PostRequest.objects.visible_to(user)
 
     # 2. --- Apply Status Filter (Mirrors your logic) ---
     if status_filter == 'ALL' or not status_filter:
-        filtered_requests = base_queryset.all()
+        filtered_requests = base_queryset.for_list()
     else:
         # Ensure the status is valid before filtering
         valid_statuses = [PostRequest.Status.PENDING, PostRequest.Status.VIEWED, PostRequest.Status.COMPLETED]
         if status_filter in valid_statuses:
-            filtered_requests = base_queryset.filter(status=status_filter)
+            filtered_requests = base_queryset.for_list().filter(status=status_filter)
         else:
-            filtered_requests = base_queryset.all() # Default to all if filter is invalid
+            filtered_requests = base_queryset.for_list() # Default to all if filter is invalid
             
-    # Order by most recent
-    filtered_requests = filtered_requests.order_by('-created_at')
+    # Most recent first, one page at a time
+    requests_page = KeysetPaginator(
+        filtered_requests, ('-created_at', '-id'), per_page=POSTS_PER_PAGE
+    ).get_page(request.GET.get('cursor'))
     
     # 3. --- Get Status Counts (Mirrors your logic) ---
     # Counts are based on the user's base_queryset (SuperAdmin sees all, Admin sees theirs)
-    status_counts = {
-        'ALL': base_queryset.count(),
-        'PENDING': base_queryset.filter(status=PostRequest.Status.PENDING).count(),
-        'VIEWED': base_queryset.filter(status=PostRequest.Status.VIEWED).count(),
-        'COMPLETED': base_queryset.filter(status=PostRequest.Status.COMPLETED).count(),
-    }
+    status_counts = base_queryset.status_counts()
 
     # 4. --- Prepare Context (Mirrors your logic) ---
     context = {
-        'requests': filtered_requests,
+        'requests': requests_page,
         'status_counts': status_counts,
         'current_status': status_filter,
     }
@@ -384,7 +360,7 @@ def request_post_view(request):
         # Get the client profile associated with the logged-in user
         client_profile = request.user.client_profile
         # Fetch all requests for this client, most recent first
-        existing_requests = PostRequest.objects.filter(client=client_profile).order_by('-created_at')
+        existing_requests = PostRequest.objects.visible_to(request.user).order_by('-created_at')
     except ClientProfile.DoesNotExist:
         messages.error(request, 'Your client profile could not be found.')
         existing_requests = PostRequest.objects.none() # Return an empty list
@@ -426,11 +402,7 @@ def client_post_detail_view(request, post_id):
     Displays a single published post for rating and viewing comments.
     """
     # 1. Get the post, ensuring it belongs to this client
-    post = get_object_or_404(
-        Post, 
-        id=post_id, 
-        assigned_client=request.user.client_profile
-    )
+    post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
     
     # 2. Get all existing ratings/comments for this post
     all_ratings = post.ratings.all().order_by('-created_at')
@@ -465,4 +437,16 @@ def client_post_detail_view(request, post_id):
         'user_rating': user_rating, # This will be None or a Rating object
     }
     
-    return render(request, 'posts/client_post_detail.html', context)
\ No newline at end of file
+    return render(request, 'posts/client_post_detail.html', context)
+
+
+# --- SEARCH VIEW ---
+
+@login_required
+def search_view(request):
+    """
+    JSON full-text search across the posts, feedback and requests the user can see.
+    """
+    query = request.GET.get('q', '').strip()
+    results = search(request.user, query) if len(query) >= 2 else []
+    return JsonResponse({'query': query, 'results': results})
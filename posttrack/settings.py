@@ -50,6 +50,9 @@ LOGIN_URL = 'core:login_admin'
 LOGIN_REDIRECT_URL = 'core:dashboard'
 
 MIDDLEWARE = [
+    'core.instrumentation.RequestStatsMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.replica.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'posttrack.urls'
@@ -83,13 +87,75 @@ WSGI_APPLICATION = 'posttrack.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite connection profile, applied as PRAGMAs to every new connection.
+# WAL lets readers keep reading while a writer commits; synchronous=NORMAL is
+# crash-safe in WAL mode and only syncs at checkpoints. WAL is recorded in the
+# database file itself, so a development checkout that wants to keep the committed
+# db.sqlite3 unchanged can set SQLITE_JOURNAL_MODE=DELETE. The other values can be
+# overridden with the matching SQLITE_* environment variable.
+# `manage.py benchmark_sqlite` compares this profile with SQLite's defaults.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20000)),  # ms
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),  # bytes
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),  # negative = KiB
+}
+
+# Read-only snapshot of the primary used by report views (core/replica.py).
+SQLITE_REPLICA_PATH = os.environ.get('SQLITE_REPLICA_PATH', str(BASE_DIR / 'db.replica.sqlite3'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Reuse connections across requests instead of reopening (and
+        # re-running the PRAGMAs) every time; 0 closes them after each request.
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so a transaction that
+            # reads before it writes can't deadlock against another writer
+            # (e.g. the background audit log writer).
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'init_command': ';'.join(
+                f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()
+            ),
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # Opened read-only; the snapshot file is swapped out on every refresh,
+        # so connections are not kept between requests.
+        'NAME': f'file:{SQLITE_REPLICA_PATH}?mode=ro',
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'init_command': ';'.join(
+                f'PRAGMA {name} = {SQLITE_PRAGMAS[name]}' for name in ('mmap_size', 'cache_size')
+            ),
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['core.replica.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per-process; use a shared backend (e.g. Redis) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Sessions are read from the cache and only fall back to the database on a miss.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,9 +200,118 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Request profiles (core/profiling.py); kept beside media/, never served directly
+PROFILE_ROOT = Path(os.environ.get('PROFILE_ROOT', BASE_DIR / 'profiles'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Audit log writer (core/audit.py)
+# Entries are buffered and bulk-inserted off the request path; AUDIT_LOG_SYNC writes
+# each one as it is logged instead.
+AUDIT_LOG_SYNC = False
+AUDIT_LOG_BATCH_SIZE = 100
+AUDIT_LOG_FLUSH_INTERVAL = 2.0
+# Flushes an entry is retried for while the database is locked before it is dropped.
+AUDIT_LOG_MAX_RETRIES = 5
+
+# Image renditions (posts/renditions.py)
+# Thumb/feed/full JPEG + WebP copies of each upload, rendered in a process pool.
+IMAGE_RENDITIONS_ON_UPLOAD = True
+IMAGE_RENDITION_WORKERS = 2
+
+# Report jobs (reports/jobs.py)
+# CSV reports are generated in a thread pool, or inline with REPORT_JOBS_SYNC. Jobs queued
+# or without a progress heartbeat for REPORT_STALE_AFTER seconds are failed, not reused.
+REPORT_JOBS_SYNC = False
+REPORT_WORKERS = 2
+REPORT_STALE_AFTER = 600
+
+# Read replica (core/replica.py)
+# `manage.py refresh_replica` snapshots the primary every REPLICA_REFRESH_INTERVAL
+# seconds. Report views read from the snapshot while it is at most REPLICA_MAX_LAG
+# seconds old, except for a browser that wrote in the last REPLICA_PIN_SECONDS.
+REPLICA_ENABLED = os.environ.get('REPLICA_ENABLED', '1') == '1'
+REPLICA_REFRESH_INTERVAL = int(os.environ.get('REPLICA_REFRESH_INTERVAL', 30))
+REPLICA_MAX_LAG = int(os.environ.get('REPLICA_MAX_LAG', 300))
+REPLICA_PIN_SECONDS = 2 * REPLICA_REFRESH_INTERVAL
+
+# Request instrumentation (core/instrumentation.py)
+# Query count, SQL/render time, peak memory and N+1 warnings for a sample of
+# requests, written as JSON lines to logs/requests.log. Peak memory needs tracemalloc,
+# which slows every thread in the process while a request is traced, so it is off
+# by default outside DEBUG.
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 1.0 if DEBUG else 0.05))
+INSTRUMENTATION_TRACE_MEMORY = os.environ.get('INSTRUMENTATION_TRACE_MEMORY', '1' if DEBUG else '0') == '1'
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 5
+INSTRUMENTATION_HEADER = DEBUG
+LOG_DIR = Path(os.environ.get('LOG_DIR', BASE_DIR / 'logs'))
+LOG_DIR.mkdir(exist_ok=True)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'request_log': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': LOG_DIR / 'requests.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'posttrack.requests': {
+            'handlers': ['request_log'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Prometheus metrics (core/metrics.py)
+# Served at /metrics to super admins, or to scrapers sending "Authorization: Bearer
+# <METRICS_TOKEN>". Each process writes its counters to its own file in METRICS_DIR
+# every METRICS_FLUSH_INTERVAL seconds and a scrape adds them up; clear the directory
+# when the service restarts.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+# Request profiler (core/profiling.py)
+# A request is profiled when it carries a valid signed PROFILING_HEADER (tokens are
+# handed out on the super admin Profiles page and expire after PROFILING_TOKEN_MAX_AGE
+# seconds), or for 1 in PROFILING_SAMPLE_EVERY requests (0 = never). Sampled profiles
+# are only kept when the request took at least PROFILING_MIN_DURATION seconds.
+PROFILING_HEADER = 'X-Profile-Token'
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_SAMPLE_EVERY = int(os.environ.get('PROFILING_SAMPLE_EVERY', 0))
+PROFILING_MIN_DURATION = float(os.environ.get('PROFILING_MIN_DURATION', 0.5))
+PROFILING_MAX_PROFILES = 500
+
+# Cached users (core/user_cache.py)
+# The signed-in user and their client profile are loaded from the cache for up to
+# USER_CACHE_TIMEOUT seconds. Saves in this process drop the entry at once; with the
+# per-process locmem cache other processes may serve the old user (and an old
+# password hash) for up to this long, so use a shared cache with several workers.
+# ModelBackend stays listed so sessions created before the cached backend existed
+# (which store its path) remain signed in; new logins go through the cached backend.
+AUTHENTICATION_BACKENDS = [
+    'core.user_cache.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 60))
+
+# Admin-to-client permissions (core/permissions.py)
+# Seconds an admin's assigned client IDs stay cached; 0 loads them once per request.
+# Changes made in this process invalidate the cache at once; other processes may
+# see the old assignments for up to this long.
+CLIENT_PERMISSION_CACHE_TIMEOUT = 60
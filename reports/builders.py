@@ -0,0 +1,204 @@
+# reports/builders.py
+
+"""
+Report builders used by the job runner (reports/jobs.py) and the streaming
+exports (reports/exports.py).
+
+Each builder knows how to scope its data from the job parameters, how to
+describe the current "version" of that data (so an unchanged report can be
+served again instead of rebuilt), and which CSV rows to write.
+"""
+
+import datetime
+
+from django.db.models import F, Max, Count
+
+from users.models import User, ClientProfile
+from posts.models import Post, ClientDailyStats
+from core.forms import DateRangeForm
+from core.models import AuditLog
+
+
+def clients_in_scope(admin_id=None):
+    """
+    All clients for a super admin (admin_id=None), else the admin's assigned clients.
+    """
+    if admin_id is None:
+        return ClientProfile.objects.all()
+    return ClientProfile.objects.filter(assigned_admins=admin_id)
+
+
+def clients_by_rejection(clients, start=None, end=None):
+    """
+    Annotates clients with reviewed_posts (approvals + rejections between the
+    two dates), rejected_posts and rejection_rate, highest rate first.
+    Clients with no reviews in the range are left out.
+    """
+    return clients.annotate(
+        rejected_posts=ClientDailyStats.sum_between('posts_rejected', start, end),
+        reviewed_posts=(
+            ClientDailyStats.sum_between('posts_approved', start, end)
+            + ClientDailyStats.sum_between('posts_rejected', start, end)
+        )
+    ).filter(reviewed_posts__gt=0).annotate(
+        rejection_rate=(F('rejected_posts') * 100.0 / F('reviewed_posts'))
+    ).order_by('-rejection_rate')
+
+
+def _isoformat(value):
+    return value.isoformat() if value else ''
+
+
+class ReportBuilder:
+    title = "Report"
+    header = []
+    super_admin_only = False
+
+    @classmethod
+    def parameters_for(cls, request):
+        """
+        Job parameters for a request: the user's client scope plus any filters.
+        """
+        user = request.user
+        return {'admin_id': None if user.role == User.Role.SUPER_ADMIN else user.id}
+
+    def data_version(self):
+        raise NotImplementedError
+
+    def queryset(self):
+        raise NotImplementedError
+
+    def row(self, obj):
+        raise NotImplementedError
+
+
+class ClientStatsReport(ReportBuilder):
+    """
+    Base for the per-client reports that read the ClientDailyStats rollup,
+    optionally between two dates (ISO strings in the job parameters).
+    """
+
+    @classmethod
+    def parameters_for(cls, request):
+        parameters = super().parameters_for(request)
+        start, end = DateRangeForm(request.GET).get_range()
+        parameters['start'] = start.isoformat() if start else None
+        parameters['end'] = end.isoformat() if end else None
+        return parameters
+
+    def __init__(self, admin_id=None, start=None, end=None):
+        self.clients = clients_in_scope(admin_id)
+        self.start = datetime.date.fromisoformat(start) if start else None
+        self.end = datetime.date.fromisoformat(end) if end else None
+
+    def data_version(self):
+        # Rollup rows bump updated_at whenever they change;
+        # the client list covers renames and (re)assignments.
+        stats = ClientDailyStats.objects.filter(client__in=self.clients).between(self.start, self.end).aggregate(
+            last_change=Max('updated_at'), rows=Count('pk')
+        )
+        return {
+            'last_change': _isoformat(stats['last_change']),
+            'rows': stats['rows'],
+            'clients': list(self.clients.order_by('pk').values_list('pk', 'company_name')),
+        }
+
+
+class RejectionRatesReport(ClientStatsReport):
+    title = "Rejection Report"
+    header = ['Client Name', 'Rejection Rate (%)', 'Rejected Posts', 'Reviewed Posts']
+
+    def queryset(self):
+        return clients_by_rejection(self.clients, self.start, self.end)
+
+    def row(self, client):
+        return [
+            client.company_name,
+            f"{client.rejection_rate:.1f}",
+            client.rejected_posts,
+            client.reviewed_posts
+        ]
+
+
+class ClientActivityReport(ClientStatsReport):
+    title = "Client Activity Report"
+    header = ['Client Name', 'Feedback', 'Ratings', 'Average Rating']
+
+    def queryset(self):
+        return self.clients.annotate(
+            feedback=ClientDailyStats.sum_between('feedback_count', self.start, self.end),
+            ratings=ClientDailyStats.sum_between('rating_count', self.start, self.end),
+            rating_total=ClientDailyStats.sum_between('rating_sum', self.start, self.end),
+        ).values_list('company_name', 'feedback', 'ratings', 'rating_total').order_by('company_name')
+
+    def row(self, values):
+        company_name, feedback_count, rating_count, rating_sum = values
+        average = f"{rating_sum / rating_count:.2f}" if rating_count else ''
+        return [company_name, feedback_count, rating_count, average]
+
+
+class PostListReport(ReportBuilder):
+    title = "Post List"
+    header = ['ID', 'Title', 'Client', 'Status', 'Scheduled For', 'Created By', 'Created At', 'Updated At']
+
+    @classmethod
+    def parameters_for(cls, request):
+        parameters = super().parameters_for(request)
+        status = request.GET.get('status', 'ALL')
+        parameters['status'] = status if status in Post.Status.values else 'ALL'
+        return parameters
+
+    def __init__(self, admin_id=None, status='ALL'):
+        self.posts = Post.objects.all()
+        if admin_id is not None:
+            self.posts = self.posts.filter(assigned_client__assigned_admins=admin_id)
+        if status != 'ALL':
+            self.posts = self.posts.filter(status=status)
+
+    def data_version(self):
+        stats = self.posts.aggregate(last_change=Max('updated_at'), rows=Count('pk'))
+        return {'last_change': _isoformat(stats['last_change']), 'rows': stats['rows']}
+
+    def queryset(self):
+        return self.posts.values_list(
+            'id', 'title', 'assigned_client__company_name', 'status',
+            'scheduled_datetime', 'created_by__username', 'created_at', 'updated_at'
+        ).order_by('-updated_at', '-id')
+
+    def row(self, values):
+        post_id, title, client, status, scheduled, author, created_at, updated_at = values
+        return [
+            post_id, title, client, Post.Status(status).label,
+            _isoformat(scheduled), author or '', _isoformat(created_at), _isoformat(updated_at)
+        ]
+
+
+class AuditLogReport(ReportBuilder):
+    title = "Audit Log"
+    header = ['Timestamp', 'User', 'Action', 'Details']
+    super_admin_only = True
+
+    @classmethod
+    def parameters_for(cls, request):
+        return {}
+
+    def data_version(self):
+        # The log is append-only, so the newest id identifies its contents.
+        return AuditLog.objects.aggregate(last_id=Max('pk'), rows=Count('pk'))
+
+    def queryset(self):
+        return AuditLog.objects.values_list(
+            'timestamp', 'user__username', 'action', 'details'
+        ).order_by('-timestamp', '-id')
+
+    def row(self, values):
+        timestamp, username, action, details = values
+        return [_isoformat(timestamp), username or 'System', action, details or '']
+
+
+BUILDERS = {
+    'rejection_rates': RejectionRatesReport,
+    'client_activity': ClientActivityReport,
+    'posts': PostListReport,
+    'audit_log': AuditLogReport,
+}
@@ -0,0 +1,138 @@
+# reports/exports.py
+
+"""
+Single-pass CSV exports.
+
+CSVExport reads a builder's queryset with iterator(chunk_size) and yields the
+CSV in encoded blocks, so memory use stays flat however many rows there are.
+stream_export() sends those blocks to the client and copies each one into a
+temp file that becomes the GeneratedReport file once the last row is sent.
+
+Under WSGI the body is a plain iterator. Under ASGI it is an async iterator
+that fetches each block in a worker thread; a sync iterator there would be
+read completely into memory before the first byte is sent.
+"""
+
+import csv
+import logging
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import GeneratedReport
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per database round trip and written per block.
+CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer produced."""
+
+    def write(self, value):
+        return value
+
+
+class CSVExport:
+
+    def __init__(self, builder, chunk_size=CHUNK_SIZE):
+        self.builder = builder
+        self.chunk_size = chunk_size
+        self.row_count = 0
+
+    def chunks(self, on_progress=None):
+        """
+        Yields the CSV as UTF-8 blocks of up to `chunk_size` rows.
+        `on_progress(row_count)` is called after each block.
+        """
+        writer = csv.writer(_Echo())
+        lines = [writer.writerow(self.builder.header)]
+        for obj in self.builder.queryset().iterator(chunk_size=self.chunk_size):
+            lines.append(writer.writerow(self.builder.row(obj)))
+            self.row_count += 1
+            if len(lines) >= self.chunk_size:
+                yield ''.join(lines).encode('utf-8')
+                lines = []
+                if on_progress:
+                    on_progress(self.row_count)
+        if lines:
+            yield ''.join(lines).encode('utf-8')
+
+
+class _ExportBody:
+    """
+    Base of the stream_export() response bodies. Django calls close() once
+    the response is over, whether it was sent in full, cut off by the client
+    or never read at all. That is where the report is completed or failed,
+    so it never stays RUNNING.
+    """
+
+    def __init__(self, report, export):
+        self.report = report
+        self.export = export
+        self.tmp = tempfile.TemporaryFile()
+        self.sent_all = False
+        self.error = None
+        self.closed = False
+
+    def chunks(self):
+        try:
+            for chunk in self.export.chunks(on_progress=self.heartbeat):
+                self.tmp.write(chunk)
+                yield chunk
+        except Exception as exc:
+            self.error = str(exc)
+            raise
+        self.sent_all = True
+
+    def heartbeat(self, row_count):
+        # Keeps find_reusable_report from treating the download as abandoned (see reports/jobs.py).
+        GeneratedReport.objects.filter(pk=self.report.pk).update(heartbeat_at=timezone.now())
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.sent_all:
+                self.tmp.seek(0)
+                self.report.complete(self.tmp, self.export.row_count)
+            else:
+                self.report.fail(self.error or "The download was cancelled before the last row was sent.")
+        except Exception:
+            # The job is failed as stale later; the response itself is already over.
+            logger.exception("Failed to record the result of export %s.", self.report.pk)
+        finally:
+            self.tmp.close()
+
+
+class _SyncExportBody(_ExportBody):
+
+    def __iter__(self):
+        return self.chunks()
+
+
+class _AsyncExportBody(_ExportBody):
+    # No __iter__: StreamingHttpResponse prefers a sync iterator when there is one.
+
+    async def __aiter__(self):
+        # The same thread for every block, as the queryset iterator needs its connection.
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+        chunks = self.chunks()
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+
+
+def stream_export(report, builder, asynchronous=False):
+    """
+    Streams `builder`'s CSV to the client and saves the same bytes as
+    `report`'s file. The report must already be RUNNING. Pass
+    `asynchronous=True` when serving over ASGI.
+    """
+    body_class = _AsyncExportBody if asynchronous else _SyncExportBody
+    response = StreamingHttpResponse(body_class(report, CSVExport(builder)), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{report.download_name}"'
+    return response
@@ -0,0 +1,177 @@
+# reports/jobs.py
+
+"""
+Background report generation.
+
+submit_report() records a GeneratedReport job and hands it to a thread pool;
+the page then polls reports:report_status until the file is ready. Jobs are
+fingerprinted by report type, parameters and the builder's data version, so
+asking again for a report whose data hasn't changed returns the existing job
+(finished or still running) instead of computing it again.
+
+Running jobs update heartbeat_at after every block of rows. A job that is
+still QUEUED, or RUNNING without a heartbeat, after REPORT_STALE_AFTER seconds
+lost its worker (e.g. the process restarted); it is marked FAILED rather than
+reused, so the next request starts a fresh one.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.metrics import REPORT_DURATION
+from core.replica import replica_reads
+
+from .builders import BUILDERS
+from .exports import CSVExport
+from .models import GeneratedReport
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'REPORT_WORKERS', 2),
+            thread_name_prefix='report-jobs',
+        )
+    return _executor
+
+
+def fingerprint(report_type, parameters, data_version):
+    payload = json.dumps([report_type, parameters, data_version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def fail_stale_reports(reports=None):
+    """
+    Marks jobs in `reports` (default: all) that have been QUEUED or silent
+    for REPORT_STALE_AFTER seconds as FAILED. Returns how many were marked.
+    """
+    if reports is None:
+        reports = GeneratedReport.objects.all()
+    now = timezone.now()
+    cutoff = now - datetime.timedelta(seconds=settings.REPORT_STALE_AFTER)
+    return reports.alias(
+        last_seen=Coalesce('heartbeat_at', 'started_at', 'created_at')
+    ).filter(
+        Q(status=GeneratedReport.Status.QUEUED, created_at__lt=cutoff)
+        | Q(status=GeneratedReport.Status.RUNNING, last_seen__lt=cutoff)
+    ).update(
+        status=GeneratedReport.Status.FAILED,
+        error=f"The job stopped making progress for {settings.REPORT_STALE_AFTER} seconds.",
+        completed_at=now
+    )
+
+
+def find_reusable_report(report_type, report_fingerprint, statuses=None):
+    """
+    The newest report with this fingerprint that is completed or still
+    making progress, or None. Stale jobs are failed first, so they're skipped.
+    """
+    reports = GeneratedReport.objects.filter(report_type=report_type, fingerprint=report_fingerprint)
+    if statuses:
+        reports = reports.filter(status__in=statuses)
+    else:
+        fail_stale_reports(reports)
+        reports = reports.exclude(status=GeneratedReport.Status.FAILED)
+    return reports.order_by('-created_at').first()
+
+
+def create_report(builder, report_type, parameters, user, report_fingerprint, **fields):
+    timestamp = timezone.localtime().strftime("%Y-%m-%d-%H%M")
+    return GeneratedReport.objects.create(
+        title=f"{builder.title} - {timestamp}",
+        report_type=report_type,
+        generated_by=user,
+        parameters=parameters,
+        fingerprint=report_fingerprint,
+        **fields
+    )
+
+
+def submit_report(report_type, parameters, user):
+    """
+    Queues a report job, or returns the existing one when nothing relevant
+    has changed since it was requested. Returns (report, reused).
+    """
+    builder = BUILDERS[report_type](**parameters)
+    report_fingerprint = fingerprint(report_type, parameters, builder.data_version())
+
+    existing = find_reusable_report(report_type, report_fingerprint)
+    if existing:
+        return existing, True
+
+    report = create_report(builder, report_type, parameters, user, report_fingerprint)
+    transaction.on_commit(lambda: _start(report.pk))
+    return report, False
+
+
+def _start(report_id):
+    if getattr(settings, 'REPORT_JOBS_SYNC', False):
+        run_report(report_id)
+    else:
+        _get_executor().submit(_run_in_worker, report_id)
+
+
+def _run_in_worker(report_id):
+    # Worker threads keep their own DB connections between jobs.
+    close_old_connections()
+    try:
+        run_report(report_id)
+    except Exception:
+        logger.exception("Report job %s crashed.", report_id)
+    finally:
+        close_old_connections()
+
+
+def run_report(report_id):
+    """
+    Generates the CSV for a QUEUED job and stores it on the report.
+    """
+    claimed = GeneratedReport.objects.filter(
+        pk=report_id, status=GeneratedReport.Status.QUEUED
+    ).update(
+        status=GeneratedReport.Status.RUNNING, started_at=timezone.now(), heartbeat_at=timezone.now(), progress=0
+    )
+    report = GeneratedReport.objects.get(pk=report_id)
+    if not claimed:
+        # Already picked up by another worker.
+        return report
+
+    try:
+        builder = BUILDERS[report.report_type](**report.parameters)
+        export = CSVExport(builder)
+
+        def on_progress(row_count):
+            GeneratedReport.objects.filter(pk=report_id).update(
+                progress=min(99, row_count * 100 // total), heartbeat_at=timezone.now()
+            )
+
+        with tempfile.TemporaryFile() as tmp:
+            # The report rows are read from the replica; progress and the
+            # finished file are written to the primary.
+            with replica_reads():
+                total = builder.queryset().count()
+                for chunk in export.chunks(on_progress=on_progress):
+                    tmp.write(chunk)
+            tmp.seek(0)
+            report.complete(tmp, export.row_count)
+    except Exception as exc:
+        logger.exception("Report job %s failed.", report_id)
+        report.fail(str(exc))
+    REPORT_DURATION.observe(report.duration.total_seconds(), report_type=report.report_type, status=report.status)
+    return report
+
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:48
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='generatedreport',
+            name='file',
+            field=models.FileField(storage=core.storage.ContentAddressedStorage(), upload_to='generated_reports/'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:50
+
+import core.storage
+from django.db import migrations, models
+
+
+def mark_existing_reports_completed(apps, schema_editor):
+    # Reports made before jobs existed were generated inline, so they're done.
+    GeneratedReport = apps.get_model('reports', 'GeneratedReport')
+    GeneratedReport.objects.exclude(file='').update(status='COMPLETED', progress=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_content_addressed_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedreport',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='duration',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, help_text='Hash of the report type, parameters and data version; equal fingerprints give equal files.', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='parameters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Percent complete.'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='row_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='status',
+            field=models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], db_index=True, default='QUEUED', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='generatedreport',
+            name='file',
+            field=models.FileField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='generated_reports/'),
+        ),
+        migrations.RunPython(mark_existing_reports_completed, migrations.RunPython.noop),
+    ]
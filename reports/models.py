@@ -1,14 +1,104 @@
 # reports/models.py
 
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from django.utils.text import slugify
+from core.storage import content_storage
+
+
+class GeneratedReportQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Every report for a super admin; otherwise reports the user generated
+        or that cover their own clients.
+        """
+        if user.role == user.Role.SUPER_ADMIN:
+            return self
+        return self.filter(models.Q(generated_by=user) | models.Q(parameters__admin_id=user.id))
+
 
 class GeneratedReport(models.Model):
+    """
+    A report generation job. Jobs are queued by the views and run in the
+    worker pool in reports/jobs.py; `file` is filled in once COMPLETED.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        RUNNING = 'RUNNING', 'Running'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
     title = models.CharField(max_length=255)
     report_type = models.CharField(max_length=100, help_text="e.g., 'rejection_rates', 'engagement_trends'")
     generated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
-    file = models.FileField(upload_to='generated_reports/')
+    file = models.FileField(upload_to='generated_reports/', storage=content_storage, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # --- Job fields ---
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    parameters = models.JSONField(default=dict, blank=True)
+    fingerprint = models.CharField(
+        max_length=64, blank=True, db_index=True,
+        help_text="Hash of the report type, parameters and data version; equal fingerprints give equal files."
+    )
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete.")
+    row_count = models.PositiveIntegerField(null=True, blank=True)
+    duration = models.DurationField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, help_text="Last sign of life from the worker generating the report."
+    )
+    completed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    # File name as last loaded from / saved to the database, for reference counting.
+    _loaded_file = None
+
+    objects = GeneratedReportQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_file = instance.__dict__.get('file')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_file = self.file.name
+
+    def complete(self, fileobj, row_count):
+        """
+        Stores the finished CSV from `fileobj` and marks the job COMPLETED.
+        """
+        # One transaction, so the blob stays locked until the reference is saved (core/storage.py).
+        with transaction.atomic():
+            self.file.save(self.download_name, File(fileobj), save=False)
+            self.status = self.Status.COMPLETED
+            self.row_count = row_count
+            self.progress = 100
+            return self._finish()
+
+    def fail(self, error):
+        self.status = self.Status.FAILED
+        self.error = error
+        return self._finish()
+
+    def _finish(self):
+        self.completed_at = timezone.now()
+        self.duration = self.completed_at - self.started_at
+        self.save()
+        return self
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.COMPLETED, self.Status.FAILED)
+
+    @property
+    def download_name(self):
+        return f"{slugify(self.title)}.csv"
+
     def __str__(self):
-        return f"{self.title} ({self.created_at.strftime('%Y-%m-%d')})"
\ No newline at end of file
+        return f"{self.title} ({self.created_at.strftime('%Y-%m-%d')})"
@@ -1,3 +1,131 @@
-from django.test import TestCase
+import datetime
+import tempfile
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import AuditLog
+from reports.builders import AuditLogReport
+from reports.exports import stream_export
+from reports.jobs import submit_report, fail_stale_reports, create_report
+from reports.models import GeneratedReport
+from users.models import User
+
+
+class ReportTestMixin:
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Jobs run inline instead of in the worker pool
+        overrides = override_settings(MEDIA_ROOT=directory.name, REPORT_JOBS_SYNC=True, AUDIT_LOG_SYNC=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.super_admin = User.objects.create_user('super', password='pass', role=User.Role.SUPER_ADMIN)
+
+    def submit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            report, reused = submit_report('audit_log', {}, self.super_admin)
+        # The job ran on commit, on its own copy of the row
+        report.refresh_from_db()
+        return report, reused
+
+
+@override_settings(REPORT_STALE_AFTER=600)
+class ReportReuseTests(ReportTestMixin, TestCase):
+
+    def test_completed_report_is_reused(self):
+        report, reused = self.submit()
+        self.assertFalse(reused)
+        self.assertEqual(report.status, GeneratedReport.Status.COMPLETED)
+
+        again, reused = self.submit()
+        self.assertTrue(reused)
+        self.assertEqual(again, report)
+
+    def test_running_report_with_a_recent_heartbeat_is_reused(self):
+        report, _ = self.submit()
+        GeneratedReport.objects.filter(pk=report.pk).update(
+            status=GeneratedReport.Status.RUNNING, heartbeat_at=timezone.now()
+        )
+
+        again, reused = self.submit()
+        self.assertTrue(reused)
+        self.assertEqual(again, report)
+
+    def test_silent_running_report_is_failed_and_rebuilt(self):
+        report, _ = self.submit()
+        past = timezone.now() - datetime.timedelta(minutes=20)
+        GeneratedReport.objects.filter(pk=report.pk).update(
+            status=GeneratedReport.Status.RUNNING, started_at=past, heartbeat_at=past
+        )
+
+        again, reused = self.submit()
+        self.assertFalse(reused)
+        self.assertEqual(again.status, GeneratedReport.Status.COMPLETED)
+        report.refresh_from_db()
+        self.assertEqual(report.status, GeneratedReport.Status.FAILED)
+        self.assertIn('600 seconds', report.error)
+
+    def test_report_queued_too_long_is_failed(self):
+        report, _ = self.submit()
+        GeneratedReport.objects.filter(pk=report.pk).update(
+            status=GeneratedReport.Status.QUEUED, created_at=timezone.now() - datetime.timedelta(minutes=20)
+        )
+        fresh = GeneratedReport.objects.create(title='Fresh', report_type='audit_log')
+
+        self.assertEqual(fail_stale_reports(), 1)
+        report.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(report.status, GeneratedReport.Status.FAILED)
+        self.assertEqual(fresh.status, GeneratedReport.Status.QUEUED)
+
+
+class StreamExportTests(ReportTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        AuditLog.objects.create(user=self.super_admin, action='user_login', details='Logged in.')
+
+    def export(self, asynchronous=False):
+        builder = AuditLogReport()
+        report = create_report(
+            builder, 'audit_log', {}, self.super_admin, 'fingerprint',
+            status=GeneratedReport.Status.RUNNING, started_at=timezone.now()
+        )
+        return report, stream_export(report, builder, asynchronous=asynchronous)
+
+    def test_finished_download_completes_the_report(self):
+        self.client.force_login(self.super_admin)
+        response = self.client.get('/reports/export/audit_log/')
+        content = b''.join(response.streaming_content)
+        response.close()
+
+        report = GeneratedReport.objects.get()
+        self.assertEqual(report.status, GeneratedReport.Status.COMPLETED)
+        self.assertEqual(report.row_count, AuditLog.objects.count())
+        with report.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_unread_body_fails_the_report(self):
+        report, response = self.export()
+        response.close()
+
+        report.refresh_from_db()
+        self.assertEqual(report.status, GeneratedReport.Status.FAILED)
+        self.assertIn('cancelled', report.error)
+
+    def test_async_body_streams_for_asgi(self):
+        report, response = self.export(asynchronous=True)
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        content = async_to_sync(read)()
+        response.close()
+
+        self.assertTrue(content.startswith(b'Timestamp,User,Action,Details'))
+        report.refresh_from_db()
+        self.assertEqual(report.status, GeneratedReport.Status.COMPLETED)
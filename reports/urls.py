@@ -0,0 +1,11 @@
+# reports/urls.py
+from django.urls import path
+from . import views
+
+app_name = 'reports'
+
+urlpatterns = [
+    path('export/<slug:report_type>/', views.report_export_view, name='report_export'),
+    path('<int:report_id>/status/', views.report_status_view, name='report_status'),
+    path('<int:report_id>/download/', views.report_download_view, name='report_download'),
+]
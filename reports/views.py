@@ -1,3 +1,71 @@
-from django.shortcuts import render
+# reports/views.py
 
-# Create your views here.
+from django.contrib.auth.decorators import user_passes_test
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+
+from core.views import is_admin_or_superadmin
+from users.models import User
+from .builders import BUILDERS
+from .exports import stream_export
+from .jobs import fingerprint, find_reusable_report, create_report
+from .models import GeneratedReport
+
+
+@user_passes_test(is_admin_or_superadmin, login_url='core:login_admin')
+def report_status_view(request, report_id):
+    """Polled by the report pages while a job runs."""
+    report = get_object_or_404(GeneratedReport.objects.visible_to(request.user), pk=report_id)
+    return JsonResponse({
+        'id': report.id,
+        'title': report.title,
+        'status': report.status,
+        'progress': report.progress,
+        'row_count': report.row_count,
+        'duration': report.duration.total_seconds() if report.duration else None,
+        'error': report.error,
+        'download_url': (
+            reverse('reports:report_download', args=[report.id])
+            if report.status == GeneratedReport.Status.COMPLETED else None
+        ),
+    })
+
+
+@user_passes_test(is_admin_or_superadmin, login_url='core:login_admin')
+def report_download_view(request, report_id):
+    report = get_object_or_404(GeneratedReport.objects.visible_to(request.user), pk=report_id)
+    if report.status != GeneratedReport.Status.COMPLETED or not report.file:
+        raise Http404
+    return FileResponse(report.file.open('rb'), as_attachment=True, filename=report.download_name)
+
+
+@user_passes_test(is_admin_or_superadmin, login_url='core:login_admin')
+def report_export_view(request, report_type):
+    """
+    Streams a CSV export straight to the browser while saving it as a
+    GeneratedReport. An unchanged export is served from the saved file.
+    """
+    builder_class = BUILDERS.get(report_type)
+    if builder_class is None:
+        raise Http404
+    if builder_class.super_admin_only and request.user.role != User.Role.SUPER_ADMIN:
+        raise PermissionDenied
+
+    parameters = builder_class.parameters_for(request)
+    builder = builder_class(**parameters)
+    report_fingerprint = fingerprint(report_type, parameters, builder.data_version())
+
+    existing = find_reusable_report(report_type, report_fingerprint, statuses=[GeneratedReport.Status.COMPLETED])
+    if existing and existing.file:
+        return FileResponse(existing.file.open('rb'), as_attachment=True, filename=existing.download_name)
+
+    report = create_report(
+        builder, report_type, parameters, request.user, report_fingerprint,
+        status=GeneratedReport.Status.RUNNING,
+        started_at=timezone.now()
+    )
+    return stream_export(report, builder, asynchronous=isinstance(request, ASGIRequest))
@@ -17,6 +17,43 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
 
+class ClientScopedQuerySet(models.QuerySet):
+    """
+    Queryset for rows that belong to a client. visible_to(user) scopes it by
+    role: super admins see every row, admins the rows of their assigned
+    clients (a JOIN through the assignment table, no subquery) and clients
+    their own rows.
+
+    Subclasses set `client_path`, the lookup from the model to its
+    ClientProfile ('' on ClientProfile itself), and the select_related()
+    and only() sets that for_list() applies for list pages.
+    """
+    client_path = ''
+    list_related = ()
+    list_fields = ()
+
+    def _client_lookup(self, lookup):
+        return f'{self.client_path}__{lookup}' if self.client_path else lookup
+
+    def visible_to(self, user):
+        if user.role == User.Role.SUPER_ADMIN:
+            return self.all()
+        if user.role == User.Role.ADMIN:
+            return self.filter(**{self._client_lookup('assigned_admins'): user})
+        if user.role == User.Role.CLIENT:
+            # ClientProfile's primary key is its user
+            return self.filter(**{self._client_lookup('pk'): user.pk})
+        return self.none()
+
+    def for_list(self):
+        queryset = self
+        if self.list_related:
+            queryset = queryset.select_related(*self.list_related)
+        if self.list_fields:
+            queryset = queryset.only(*self.list_fields)
+        return queryset
+
+
 class ClientProfile(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -34,5 +71,7 @@ class ClientProfile(models.Model):
         blank=True
     )
 
+    objects = ClientScopedQuerySet.as_manager()
+
     def __str__(self):
         return self.company_name
\ No newline at end of file